@@ -0,0 +1,268 @@
+"""
+Version 3.5 — Safety Alert Bus Module
+Dual Portal Stargate Simulation System
+
+In-process event bus for safety transitions. Portal.floor_sensor (floor over
+FLOOR_TEMP_THRESH, contact lost), the floor temperature/contact sensors and TeslaBattery
+failsafe engagement report condition edges the moment they happen, to the bus the object
+is attached to: the live session's ALERTS bus, a what-if branch's own bus, or (for pooled,
+replay, thermal and sweep objects that were never attached) a detached bus nothing acts on. Raises publish on the leading edge; further edges of the same condition within
+the debounce window are coalesced and the settled state is published when it ends.
+Subscribers are either synchronous callbacks, run inline (e.g. the FailsafeBlock
+interlock), or async queues, drained in priority order (critical before warning before
+cleared) by push channels such as the alert WebSocket and the webhook. Each delivery
+records its latency from detection. The failsafe interlock latches: the FailsafeBlock
+stays engaged until reset_failsafe() is called with no interlocked condition still raised.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from revision import REVISION
+
+SEVERITY_PRIORITY = {"critical": 0, "warning": 1, "info": 2}
+
+class AlertEvent:
+    """A published safety transition."""
+    def __init__(self, seq, kind, source, active, severity, message, data):
+        self.seq = seq
+        self.kind = kind                  # e.g. floor_contact_lost, floor_temp_high, battery_failsafe
+        self.source = source              # Portal, sensor or battery name
+        self.active = active              # True when the condition was raised, False when cleared
+        self.severity = severity if active else "info"
+        self.priority = SEVERITY_PRIORITY.get(self.severity, 1)
+        self.message = message
+        self.data = data
+        self.timestamp = time.time()
+        self.raised_ns = time.perf_counter_ns()
+
+    def to_dict(self):
+        return {"type": "alert", "seq": self.seq, "kind": self.kind, "source": self.source,
+                "active": self.active, "severity": self.severity, "message": self.message,
+                "timestamp": self.timestamp, **self.data}
+
+class AlertSubscription:
+    """Priority queue of events for one async consumer."""
+    def __init__(self, bus, channel, loop):
+        self.bus = bus
+        self.channel = channel
+        self.loop = loop
+        self._heap = []
+        self._ready = asyncio.Event()
+
+    def _push(self, event):
+        heapq.heappush(self._heap, (event.priority, event.seq, event))
+        self._ready.set()
+
+    def put(self, event):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._push(event)
+        else:
+            self.loop.call_soon_threadsafe(self._push, event)
+
+    async def get(self, timeout=None):
+        """Next event by priority, or None after `timeout` seconds."""
+        if not self._heap:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return heapq.heappop(self._heap)[2]
+
+    def delivered(self, event):
+        self.bus.record_latency(self.channel, event)
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class AlertBus:
+    """
+    Edge-triggered safety event bus.
+    debounce: seconds after a published edge during which further edges of the same
+    (source, kind) are coalesced.
+    """
+    def __init__(self, debounce=0.25, history=200, clock=time.monotonic):
+        self.debounce = debounce
+        self.clock = clock
+        self.history = deque(maxlen=history)
+        self.latencies = {}                      # channel -> recent delivery latencies (s)
+        self.counts = {"published": 0, "coalesced": 0, "delivery_failures": 0}
+        self._state = {}                         # (source, kind) -> last reported state
+        self._published = {}                     # (source, kind) -> (state, time) last published
+        self._pending = {}                       # (source, kind) -> (severity, message, data)
+        self._callbacks = []
+        self._subscriptions = []
+        self._seq = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def subscribe(self, callback, channel="callback"):
+        """Registers a synchronous callback(event), run inline at publish time."""
+        self._callbacks.append((callback, channel))
+
+    def subscribe_async(self, channel):
+        """Returns an AlertSubscription bound to the running event loop."""
+        subscription = AlertSubscription(self, channel, asyncio.get_running_loop())
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def transition(self, source, kind, active, severity="critical", message="", **data):
+        """
+        Reports the current state of a safety condition. Publishes on a change of state
+        (subject to debouncing); repeated reports of the same state are ignored.
+        Returns the published event or None.
+        """
+        key = (source, kind)
+        with self._lock:
+            if self._state.get(key, False) == active:
+                return None
+            self._state[key] = active
+            last = self._published.get(key)
+            now = self.clock()
+            if last is not None and now - last[1] < self.debounce:
+                if active == last[0]:
+                    self._pending.pop(key, None)     # Flapped back to the published state
+                else:
+                    self._pending[key] = (severity, message, data)
+                    self._schedule_flush(key, self.debounce - (now - last[1]))
+                self.counts["coalesced"] += 1
+                return None
+            self._pending.pop(key, None)
+            return self._publish(key, active, severity, message, data, now)
+
+    def _schedule_flush(self, key, delay):
+        try:
+            asyncio.get_running_loop().call_later(delay, self.flush, key)
+        except RuntimeError:
+            pass                                     # No loop: flushed by the next transition()/flush()
+
+    def flush(self, key=None):
+        """Publishes coalesced states whose debounce window has ended."""
+        with self._lock:
+            now = self.clock()
+            for k in [key] if key is not None else list(self._pending):
+                pending = self._pending.get(k)
+                last = self._published.get(k)
+                if pending is None or (last is not None and now - last[1] < self.debounce):
+                    continue
+                del self._pending[k]
+                self._publish(k, self._state[k], *pending, now)
+
+    def _publish(self, key, active, severity, message, data, now):
+        event = AlertEvent(next(self._seq), key[1], key[0], active, severity, message, data)
+        self._published[key] = (active, now)
+        self.history.append(event)
+        self.counts["published"] += 1
+        for callback, channel in list(self._callbacks):
+            callback(event)
+            self.record_latency(channel, event)
+        for subscription in list(self._subscriptions):
+            subscription.put(event)
+        return event
+
+    def record_latency(self, channel, event):
+        self.latencies.setdefault(channel, deque(maxlen=1000)).append(
+            (time.perf_counter_ns() - event.raised_ns) / 1e9)
+
+    def active(self):
+        """Conditions currently raised, as (source, kind) pairs."""
+        return [key for key, state in self._state.items() if state]
+
+    def summary(self):
+        latency = {}
+        for channel, samples in self.latencies.items():
+            ms = np.array(samples) * 1e3
+            latency[channel] = {"deliveries": len(ms), "p50_ms": float(np.percentile(ms, 50)),
+                                "p95_ms": float(np.percentile(ms, 95)), "max_ms": float(ms.max())}
+        return dict(self.counts, active=[{"source": s, "kind": k} for s, k in self.active()],
+                    subscribers=len(self._subscriptions) + len(self._callbacks), latency=latency)
+
+ALERTS = AlertBus()
+DETACHED_ALERTS = AlertBus(debounce=0.0, history=0)    # For objects outside any session; nobody subscribes
+
+class Alerting:
+    """
+    Mixin (listed before Versioned) for objects that report safety transitions. Instances
+    start on DETACHED_ALERTS; attach() binds them to a session's bus with its revision.
+    """
+    _alerts = DETACHED_ALERTS
+
+    def attach(self, revision=REVISION, alerts=ALERTS):
+        object.__setattr__(self, "_alerts", alerts)
+        return super().attach(revision)
+
+    def detach(self):
+        self.__dict__.pop("_alerts", None)
+        super().detach()
+
+FAILSAFE_KINDS = ("floor_contact_lost", "floor_temp_high", "battery_failsafe")
+
+def failsafe_interlock(failsafe, kinds=FAILSAFE_KINDS):
+    """Callback engaging a FailsafeBlock when a critical condition is raised (latching)."""
+    def trigger(event):
+        if event.active and event.kind in kinds and not failsafe.engaged:
+            failsafe.test()
+    return trigger
+
+def reset_failsafe(failsafe, bus, kinds=FAILSAFE_KINDS):
+    """
+    Releases a latched FailsafeBlock. Raises ValueError, leaving it engaged, while any
+    interlocked condition is still raised on `bus`.
+    """
+    active = [f"{source}: {kind}" for source, kind in bus.active() if kind in kinds]
+    if active:
+        raise ValueError(f"Failsafe conditions still active: {', '.join(active)}")
+    failsafe.reset()
+
+async def deliver_webhook(subscription, url, timeout=2.0):
+    """Drains a subscription, POSTing each event as JSON to `url`."""
+    import httpx
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        while True:
+            event = await subscription.get()
+            try:
+                await client.post(url, json=event.to_dict())
+                subscription.delivered(event)
+            except httpx.HTTPError:
+                subscription.bus.counts["delivery_failures"] += 1
+
+if __name__ == "__main__":
+    from hardware import FailsafeBlock, ContactSensor
+    from alerts import ALERTS, failsafe_interlock, reset_failsafe    # The bus instance hardware.py binds to
+
+    async def demo():
+        failsafe = FailsafeBlock()
+        ALERTS.subscribe(failsafe_interlock(failsafe), channel="failsafe")
+        channel = ALERTS.subscribe_async("demo")
+        sensor = ContactSensor("Portal1_Contact", True).attach()
+
+        sensor.update(False)                     # Contact lost: published immediately
+        sensor.update(True)                      # Flaps within the debounce window: coalesced
+        sensor.update(False)
+        event = await channel.get()
+        channel.delivered(event)
+        print("Alert:", event.to_dict())
+        print("Failsafe engaged by interlock:", failsafe.engaged)
+        sensor.update(True)                      # Cleared: held until the window ends
+        event = await channel.get(timeout=1.0)
+        channel.delivered(event)
+        print("Cleared:", event.kind, event.active)
+        reset_failsafe(failsafe, ALERTS)
+        print("Failsafe after reset:", failsafe.engaged)
+        print(ALERTS.summary())
+
+    asyncio.run(demo())
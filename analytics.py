@@ -0,0 +1,287 @@
+"""
+Version 3.1 — Online Run Analytics Module
+Dual Portal Stargate Simulation System
+
+Streaming aggregates over SimulationLogger records, updated as each event is logged:
+event counts, transfer success ratio, stability excursions, running mean/variance/min/max
+(Welford) of portal frequencies, stabilities, energies and bridge strength, and
+time-bucketed record/transfer histograms, kept globally and per run_id. Queries read
+the aggregates directly, so their cost does not depend on how many records exist.
+Per-run aggregates are kept for the most recently logged max_runs runs only.
+"""
+
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from safetyrules import SAFETY_RULES
+
+METRICS = ("portal1_freq", "portal1_stab", "portal1_energy",
+           "portal2_freq", "portal2_stab", "portal2_energy", "bridge_strength")
+
+def stability_excursions(stability1, stability2):
+    """
+    Where the "bridge" stage safety rules would degrade a bridge between portals with
+    these stabilities (both portals safe), as DualPortal.form_bridge applies them.
+    """
+    return SAFETY_RULES.evaluate("bridge", stability1=stability1, stability2=stability2,
+                                 safety1=True, safety2=True, strength=1.0)["strength"] < 1.0
+
+def stability_excursion(stability1, stability2):
+    """stability_excursions() for one record's Python float stabilities, without building arrays."""
+    return SAFETY_RULES.check("bridge", stability1=stability1, stability2=stability2,
+                              safety1=True, safety2=True, strength=1.0)[0]["strength"] < 1.0
+
+# Field positions in a raw RecordTable row (RECORD_DTYPE order)
+_TS, _EVENT, _RUN = 0, 1, 2
+_VALUES = slice(4, 11)
+_SAFE1, _SAFE2, _RESULT = 11, 12, 13
+
+class RunningStats:
+    """Welford running mean/variance with min/max; NaN (missing portal) values are skipped."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add(self, x):
+        if x != x:
+            return
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def add_array(self, values):
+        """Merges a batch of values (Chan et al. parallel update)."""
+        values = values[~np.isnan(values)]
+        n = len(values)
+        if not n:
+            return
+        mean = float(values.mean())
+        total = self.count + n
+        delta = mean - self.mean
+        self.m2 += float(((values - mean) ** 2).sum()) + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0, "mean": None, "variance": None, "std": None, "min": None, "max": None}
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        return {"count": self.count, "mean": self.mean, "variance": variance,
+                "std": variance ** 0.5, "min": self.min, "max": self.max}
+
+class RunAggregates:
+    """Aggregates for one scope (a single run or all records)."""
+    def __init__(self, bucket_seconds=60, max_buckets=1440):
+        self.bucket_us = int(bucket_seconds * 1e6)
+        self.max_buckets = max_buckets
+        self.records = 0
+        self.events = Counter()
+        self.transfers = 0
+        self.transfer_successes = 0
+        self.stability_excursions = 0    # Records whose stabilities the bridge rules degrade
+        self.unsafe_records = 0          # Records with either present portal unsafe
+        self.first_us = None
+        self.last_us = None
+        self.stats = {name: RunningStats() for name in METRICS}
+        self.buckets = OrderedDict()     # bucket start (µs) -> [records, transfers, successes]
+
+    def _bucket(self, start):
+        counts = self.buckets.get(start)
+        if counts is None:
+            counts = self.buckets[start] = [0, 0, 0]
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        return counts
+
+    def add(self, row, event, excursion):
+        """Adds one raw row tuple (RecordTable.raw(i).item()); excursion as from stability_excursion()."""
+        ts, values, result = row[_TS], row[_VALUES], row[_RESULT]
+        self.records += 1
+        self.events[event] += 1
+        if self.first_us is None:
+            self.first_us = ts
+        self.last_us = ts
+        for stats, value in zip(self.stats.values(), values):
+            stats.add(value)
+        if excursion:
+            self.stability_excursions += 1
+        if (not row[_SAFE1] and values[0] == values[0]) or (not row[_SAFE2] and values[3] == values[3]):
+            self.unsafe_records += 1
+        counts = self._bucket(ts - ts % self.bucket_us)
+        counts[0] += 1
+        if result >= 0:
+            self.transfers += 1
+            self.transfer_successes += result
+            counts[1] += 1
+            counts[2] += result
+
+    def add_rows(self, rows, table):
+        """Adds a block of raw structured rows in one vectorized pass."""
+        if not len(rows):
+            return
+        ts = rows["timestamp"]
+        self.records += len(rows)
+        codes, counts = np.unique(rows["event"], return_counts=True)
+        for code, count in zip(codes.tolist(), counts.tolist()):
+            self.events[table.string(code)] += count
+        if self.first_us is None:
+            self.first_us = int(ts[0])
+        self.last_us = int(ts[-1])
+        for name, stats in self.stats.items():
+            stats.add_array(rows[name].astype(float))
+        self.stability_excursions += int(stability_excursions(rows["portal1_stab"], rows["portal2_stab"]).sum())
+        self.unsafe_records += int(((~rows["portal1_safety"] & ~np.isnan(rows["portal1_freq"])) |
+                                    (~rows["portal2_safety"] & ~np.isnan(rows["portal2_freq"]))).sum())
+        result = rows["transfer_result"].astype(np.int64)
+        transfer = result >= 0
+        self.transfers += int(transfer.sum())
+        self.transfer_successes += int((result == 1).sum())
+        starts = ts - ts % self.bucket_us
+        keys, inverse = np.unique(starts, return_inverse=True)
+        totals = np.stack([np.bincount(inverse, minlength=len(keys)),
+                           np.bincount(inverse, weights=transfer, minlength=len(keys)),
+                           np.bincount(inverse, weights=result == 1, minlength=len(keys))], axis=1)
+        for start, (n, t, s) in zip(keys.tolist(), totals.astype(np.int64).tolist()):
+            counts = self._bucket(start)
+            counts[0] += n
+            counts[1] += t
+            counts[2] += s
+
+    def summary(self, histogram=True):
+        result = {
+            "records": self.records,
+            "events": dict(self.events),
+            "transfers": self.transfers,
+            "transfer_successes": self.transfer_successes,
+            "transfer_success_ratio": self.transfer_successes / self.transfers if self.transfers else None,
+            "stability_excursions": self.stability_excursions,
+            "unsafe_records": self.unsafe_records,
+            "first_timestamp_us": self.first_us,
+            "last_timestamp_us": self.last_us,
+            "metrics": {name: stats.summary() for name, stats in self.stats.items()}
+        }
+        if histogram:
+            result["histogram"] = {
+                "bucket_seconds": self.bucket_us / 1e6,
+                "buckets": [{"start_us": start, "records": n, "transfers": t, "successes": s}
+                            for start, (n, t, s) in self.buckets.items()]
+            }
+        return result
+
+class RunAnalytics:
+    """
+    RecordTable listener maintaining global and per-run aggregates for a SimulationLogger.
+    Rows logged before the listener was attached (e.g. a restored snapshot) are folded in
+    with one vectorized pass on the first query. Per-run aggregates are evicted least
+    recently logged first once more than max_runs runs are tracked; the global totals
+    still include their records, and a run logged again after eviction starts afresh.
+    """
+    def __init__(self, logger, bucket_seconds=60, max_buckets=1440, max_runs=1024):
+        self.logger = logger
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.max_runs = max_runs
+        self._reset(logger.table)
+        logger.table.listeners.append(self)
+
+    def _reset(self, table):
+        self._table = table
+        self._seen = table.start         # Records folded into the aggregates (compacted ones are gone)
+        self.totals = RunAggregates(self.bucket_seconds, self.max_buckets)
+        self.runs = OrderedDict()        # run_id -> RunAggregates, least recently logged first
+        self.evicted_runs = 0
+
+    def _run(self, run_id):
+        aggregates = self.runs.get(run_id)
+        if aggregates is None:
+            aggregates = self.runs[run_id] = RunAggregates(self.bucket_seconds, self.max_buckets)
+            if len(self.runs) > self.max_runs:
+                self.runs.popitem(last=False)
+                self.evicted_runs += 1
+        else:
+            self.runs.move_to_end(run_id)
+        return aggregates
+
+    def on_append(self, table, index):
+        if table is self._table and index == self._seen:
+            row = table.raw(index).item()
+            event = table.string(row[_EVENT])
+            values = row[_VALUES]
+            excursion = stability_excursion(values[1], values[4])
+            self.totals.add(row, event, excursion)
+            self._run(table.string(row[_RUN])).add(row, event, excursion)
+            self._seen += 1
+
+    def on_clear(self, table):
+        self._reset(table)
+
+    def on_compact(self, table, upto):
+        self.sync()
+
+    def sync(self):
+        """Folds in any records not yet aggregated."""
+        table = self.logger.table
+        if table is not self._table:
+            self._reset(table)
+        if self._seen < len(table):
+            rows = table.rows_since(self._seen)
+            self.totals.add_rows(rows, table)
+            run_codes = rows["run_id"]
+            for code in np.unique(run_codes).tolist():
+                self._run(table.string(code)).add_rows(rows[run_codes == code], table)
+            self._seen = len(table)
+
+    def query(self, run_id=None, histogram=True):
+        """Aggregates for one run (or all records); None for an unknown run."""
+        self.sync()
+        if run_id is None:
+            return self.totals.summary(histogram)
+        aggregates = self.runs.get(run_id)
+        return aggregates.summary(histogram) if aggregates is not None else None
+
+    def run_overview(self):
+        """Record count, transfer counts and success ratio for every run."""
+        self.sync()
+        return {run_id: {"records": a.records, "transfers": a.transfers,
+                         "transfer_successes": a.transfer_successes,
+                         "transfer_success_ratio": a.transfer_successes / a.transfers if a.transfers else None,
+                         "stability_excursions": a.stability_excursions}
+                for run_id, a in self.runs.items()}
+
+if __name__ == "__main__":
+    import time
+    from dualportal import DualPortal
+    from logger import SimulationLogger
+
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=2.0)
+    dp.portal2.update_energy(dt=2.0)
+    dp.form_bridge(t=2.0)
+
+    logger = SimulationLogger()
+    analytics = RunAnalytics(logger)
+    start = time.perf_counter()
+    for i in range(200000):
+        dp.portal1.stability = 0.85 if i % 50 == 0 else 1.0
+        logger.log_event("Transfer" if i % 10 == 0 else "Tick", f"run_{i // 50000}", dp.portal1, dp.portal2,
+                         dp.bridge_strength, (i % 30 != 0) if i % 10 == 0 else None)
+    print(f"Logged 200000 records with live aggregates in {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    summary = analytics.query("run_1", histogram=False)
+    print(f"Query in {(time.perf_counter() - start) * 1e6:.0f} µs:",
+          summary["records"], "records, success ratio", round(summary["transfer_success_ratio"], 3),
+          "excursions", summary["stability_excursions"])
+    print("Bridge strength:", analytics.query(histogram=False)["metrics"]["bridge_strength"])
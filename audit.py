@@ -0,0 +1,433 @@
+"""
+Version 3.0 — Audit Integrity Module
+Dual Portal Stargate Simulation System
+
+Tamper-evident audit trail for SimulationLogger records. Each record is hashed as it is
+logged (SHA-256 over its canonical JSON form) into an append-only Merkle tree in the
+RFC 6962 / RFC 9162 layout, so appends and roots cost O(log n). Roots are checkpointed at
+a fixed interval to an append-only JSON-lines file. Inclusion proofs show a single
+exported record belongs to a checkpointed log, and consistency proofs show a later
+checkpoint extends an earlier one; both verify in O(log n) hashes, without the log.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+AUDIT_DIR = os.environ.get("STARGATE_AUDIT_DIR", "audit")
+
+def canonical_record(record):
+    """Canonical byte form of a log dict (as exported by export_json)."""
+    return json.dumps(record, sort_keys=True, separators=(",", ":")).encode()
+
+def leaf_hash(record):
+    """Merkle leaf hash of a log dict."""
+    return hashlib.sha256(LEAF_PREFIX + canonical_record(record)).digest()
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def _split(n):
+    """Largest power of two strictly below n (n > 1)."""
+    return 1 << ((n - 1).bit_length() - 1)
+
+class MerkleLog:
+    """
+    Append-only Merkle tree over leaf hashes. Complete aligned subtrees are kept per level
+    (about 64 bytes per leaf in total), so any root, inclusion proof or consistency proof
+    needs only O(log n) node lookups. A tree resumed from a frontier (the complete
+    subtrees covering its first `floor` leaves), or pruned to one, holds no nodes below
+    it, yet roots and proofs for every size from `floor` on need only those frontier nodes.
+    """
+    def __init__(self):
+        self._levels = [np.zeros((1024, 32), dtype=np.uint8)]
+        self._counts = [0]
+        self._first = [0]                   # Index of the first node held at each level
+        self.floor = 0
+
+    @classmethod
+    def from_frontier(cls, size, nodes):
+        """Resumes a tree of `size` leaves from frontier(size) of the original tree."""
+        tree = cls()
+        tree.floor = size
+        levels = max(1, size.bit_length())
+        tree._levels += [np.zeros((64, 32), dtype=np.uint8) for _ in range(levels - 1)]
+        tree._counts = [size >> level for level in range(levels)]
+        tree._first = [count - (count & 1) for count in tree._counts]
+        nodes = iter(nodes)
+        for level in reversed(range(levels)):
+            if tree._counts[level] & 1:             # Frontier node: held in slot 0 of its level
+                tree._levels[level][0] = np.frombuffer(next(nodes), dtype=np.uint8)
+        return tree
+
+    def __len__(self):
+        return self._counts[0]
+
+    @property
+    def nodes_held(self):
+        return sum(count - first for count, first in zip(self._counts, self._first))
+
+    def prune(self, size):
+        """Drops the nodes below frontier(size): the tree then holds what from_frontier(size) plus later appends would."""
+        if not self.floor <= size <= len(self):
+            raise ValueError(f"Tree size {size} outside {self.floor}..{len(self)}")
+        for level, first in enumerate(self._first):
+            keep = (size >> level) - ((size >> level) & 1)
+            if keep > first:
+                held = self._levels[level][keep - first:self._counts[level] - first]
+                nodes = np.zeros((max(64, 2 * len(held)), 32), dtype=np.uint8)
+                nodes[:len(held)] = held
+                self._levels[level], self._first[level] = nodes, keep
+        self.floor = size
+
+    def _push(self, level, digest):
+        if level == len(self._levels):
+            self._levels.append(np.zeros((64, 32), dtype=np.uint8))
+            self._counts.append(0)
+            self._first.append(0)
+        nodes, count = self._levels[level], self._counts[level]
+        slot = count - self._first[level]
+        if slot == len(nodes):
+            nodes = self._levels[level] = np.concatenate([nodes, np.zeros_like(nodes)])
+        nodes[slot] = np.frombuffer(digest, dtype=np.uint8)
+        self._counts[level] = count + 1
+        return count
+
+    def _node(self, level, index):
+        if index < self._first[level]:
+            raise ValueError(f"Subtree {index} at level {level} lies below the frontier the tree resumed from")
+        return self._levels[level][index - self._first[level]].tobytes()
+
+    def append(self, digest):
+        """Appends a leaf hash; completes parent subtrees as they fill. Returns the leaf index."""
+        index = self._push(0, digest)
+        i, level = index, 0
+        while i & 1:
+            digest = node_hash(self._node(level, i - 1), digest)
+            level += 1
+            i = self._push(level, digest)
+        return index
+
+    def frontier(self, size=None):
+        """Roots of the complete subtrees covering the first `size` leaves, largest first."""
+        size = len(self) if size is None else size
+        if not self.floor <= size <= len(self):
+            raise ValueError(f"Tree size {size} outside {self.floor}..{len(self)}")
+        return [self._node(level, (size >> level) - 1)
+                for level in reversed(range(size.bit_length())) if size >> level & 1]
+
+    def leaf(self, index):
+        return self._node(0, index)
+
+    def subtree(self, lo, hi):
+        """Hash of leaves [lo, hi), where lo is aligned as in the RFC 6962 recursion."""
+        n = hi - lo
+        if n & (n - 1) == 0:
+            level = n.bit_length() - 1
+            return self._node(level, lo >> level)
+        k = _split(n)
+        return node_hash(self.subtree(lo, lo + k), self.subtree(lo + k, hi))
+
+    def root(self, size=None):
+        size = len(self) if size is None else size
+        if not self.floor <= size <= len(self):
+            raise ValueError(f"Tree size {size} outside {self.floor}..{len(self)}")
+        return hashlib.sha256(b"").digest() if size == 0 else self.subtree(0, size)
+
+    def inclusion_proof(self, index, size=None):
+        """Audit path for leaf `index` in the tree of the first `size` leaves."""
+        size = len(self) if size is None else size
+        if not 0 <= index < size <= len(self):
+            raise ValueError(f"Leaf {index} not in a tree of size {size}")
+        path, lo, hi = [], 0, size
+        while hi - lo > 1:
+            k = _split(hi - lo)
+            if index < lo + k:
+                path.append(self.subtree(lo + k, hi))
+                hi = lo + k
+            else:
+                path.append(self.subtree(lo, lo + k))
+                lo += k
+        return path[::-1]
+
+    def consistency_proof(self, old_size, size=None):
+        """Proof that the tree of `old_size` leaves is a prefix of the tree of `size` leaves."""
+        size = len(self) if size is None else size
+        if not 0 < old_size <= size <= len(self):
+            raise ValueError(f"Cannot prove {old_size} -> {size}")
+        path, lo, hi, m, complete = [], 0, size, old_size, True
+        while m != hi - lo:
+            k = _split(hi - lo)
+            if m <= k:
+                path.append(self.subtree(lo + k, hi))
+                hi = lo + k
+            else:
+                path.append(self.subtree(lo, lo + k))
+                lo, m, complete = lo + k, m - k, False
+        if not complete:
+            path.append(self.subtree(lo, hi))
+        return path[::-1]
+
+def verify_inclusion(digest, index, size, proof, root):
+    """Checks an inclusion proof (RFC 9162 section 2.1.3.2) in O(len(proof))."""
+    if index >= size:
+        return False
+    fn, sn, r = index, size - 1, digest
+    for p in proof:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            r = node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r == root
+
+def verify_consistency(old_size, size, old_root, root, proof):
+    """Checks a consistency proof (RFC 9162 section 2.1.4.2) in O(len(proof))."""
+    if old_size == size:
+        return old_root == root and not proof
+    if not 0 < old_size < size or not proof:
+        return False
+    if old_size & (old_size - 1) == 0:
+        proof = [old_root] + list(proof)
+    fn, sn = old_size - 1, size - 1
+    while fn & 1:
+        fn >>= 1
+        sn >>= 1
+    fr = sr = proof[0]
+    for c in proof[1:]:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            fr = node_hash(c, fr)
+            sr = node_hash(c, sr)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            sr = node_hash(sr, c)
+        fn >>= 1
+        sn >>= 1
+    return fr == old_root and sr == root and sn == 0
+
+class AuditTrail:
+    """
+    RecordTable listener keeping a MerkleLog in step with a SimulationLogger.
+    Roots are checkpointed every `checkpoint_every` records to `checkpoint_path`
+    (JSON lines). Records that are already logged when the trail is attached (e.g. after
+    a snapshot restore) are hashed lazily on the first query rather than up front.
+    Leaf j is record base + j; base is only non-zero when an epoch had to start after
+    earlier records were compacted away unhashed. Before records are compacted the trail
+    seals the tree's frontier there, with consistency proofs to it from the checkpoints
+    since the previous seal, so a restored, compacted session resumes the same tree and
+    its earlier checkpoints stay verifiable. The seal also prunes the in-memory tree to
+    that frontier and drops the checkpoints it covers, so memory follows the retained
+    records rather than the whole history (the checkpoint file keeps every entry).
+    """
+    def __init__(self, logger, checkpoint_path=None, checkpoint_every=1024):
+        self.logger = logger
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.tree = MerkleLog()
+        self.base = 0
+        self.checkpoints = []
+        self.frontiers = []                 # Sealed frontiers of this epoch, oldest first
+        self.epoch = 0                      # Incremented each time the logger is cleared
+        self._load_checkpoints()
+        logger.table.listeners.append(self)
+
+    def _load_checkpoints(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            if entries:
+                self.epoch = entries[-1]["epoch"]
+                epoch = [e for e in entries if e["epoch"] == self.epoch]
+                self.base = epoch[0].get("base", 0)
+                self.checkpoints = [e for e in epoch if "size" in e]
+                self.frontiers = [e for e in epoch if "frontier" in e]
+
+    def on_append(self, table, index):
+        if index == self.base + len(self.tree):     # Otherwise a lazy catch-up is pending
+            self.tree.append(leaf_hash(table.row(index)))
+            if len(self.tree) % self.checkpoint_every == 0:
+                self.checkpoint()
+
+    def on_clear(self, table):
+        self.start_epoch()
+
+    def on_compact(self, table, upto):
+        self.sync()                         # Hash rows before they leave memory
+        self.seal(upto - self.base)
+
+    def start_epoch(self, base=0):
+        """Starts a new, empty tree (the logger was cleared or a fresh session began)."""
+        self.tree = MerkleLog()
+        self.base = base
+        self.epoch += 1
+        self.checkpoints = []
+        self.frontiers = []
+        self._write({"epoch": self.epoch, "started": time.time(), "base": base})
+
+    def sync(self):
+        """Hashes any records not yet in the tree; returns the tree size."""
+        table = self.logger.table
+        if self.base + len(self.tree) < table.start and not self._resume(table.start):
+            self.start_epoch(table.start)   # Unhashed records were compacted: cannot extend this tree
+        elif not len(self.tree) and self.base > len(table):
+            self.start_epoch(table.start)   # The loaded epoch belongs to a longer, unrestored session
+        for i in range(self.base + len(self.tree), len(table)):
+            self.tree.append(leaf_hash(table.row(i)))
+        return len(self.tree)
+
+    def _resume(self, start):
+        """Resumes an empty tree from the frontier sealed at record `start`; False if there is none."""
+        if len(self.tree):
+            return False
+        for i, entry in enumerate(self.frontiers):
+            if self.base + entry["frontier"] == start:
+                tree = MerkleLog.from_frontier(entry["frontier"], [bytes.fromhex(n) for n in entry["nodes"]])
+                if tree.root().hex() != entry["root"]:
+                    return False
+                self.tree = tree
+                del self.frontiers[i + 1:]  # Sealed later by a session that was not saved
+                return True
+        return False
+
+    def seal(self, size):
+        """
+        Persists the frontier at tree size `size` with consistency proofs to it from the
+        previous seal and every checkpoint since, then prunes the tree and the in-memory
+        checkpoints to it; returns the entry.
+        """
+        previous = self.frontiers[-1]["frontier"] if self.frontiers else 0
+        sizes = ([previous] if previous else []) + \
+            [c["size"] for c in self.checkpoints if previous < c["size"] <= size]
+        entry = {"epoch": self.epoch, "frontier": size, "root": self.tree.root(size).hex(),
+                 "nodes": [n.hex() for n in self.tree.frontier(size)],
+                 "proofs": {str(s): [p.hex() for p in self.tree.consistency_proof(s, size)] for s in sizes},
+                 "timestamp": time.time()}
+        self._write(entry)
+        self.tree.prune(size)
+        self.checkpoints = [c for c in self.checkpoints if c["size"] >= size]
+        self.frontiers = [entry]
+        return entry
+
+    def _write(self, entry):
+        if self.checkpoint_path:
+            os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+            with open(self.checkpoint_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def checkpoint(self):
+        """Records the current root; returns the checkpoint dict."""
+        size = self.sync()
+        entry = {"epoch": self.epoch, "size": size, "root": self.tree.root(size).hex(),
+                 "timestamp": time.time()}
+        if not self.checkpoints or self.checkpoints[-1]["size"] != size:
+            self.checkpoints.append(entry)
+            self._write(entry)
+        return entry
+
+    def verify_checkpoints(self):
+        """
+        Recomputes every stored checkpoint root; returns the sizes whose roots differ.
+        Checkpoints below a resumed tree's floor are checked against the sealed frontiers.
+        """
+        size = self.sync()
+        floor = self.tree.floor
+        sealed = self._sealed_roots(floor) if floor else {}
+        return [c["size"] for c in self.checkpoints
+                if (sealed.get(c["size"]) != bytes.fromhex(c["root"]) if c["size"] < floor else
+                    c["size"] > size or self.tree.root(c["size"]).hex() != c["root"])]
+
+    def _sealed_roots(self, floor):
+        """Roots of sizes below `floor` proven consistent with the tree, following the seals down from it."""
+        roots = {c["size"]: bytes.fromhex(c["root"]) for c in self.checkpoints}
+        roots.update((f["frontier"], bytes.fromhex(f["root"])) for f in self.frontiers)
+        proven = {floor: self.tree.root(floor)}
+        for entry in reversed(self.frontiers):
+            size = entry["frontier"]
+            if proven.get(size) != bytes.fromhex(entry["root"]):
+                continue
+            for old, proof in entry["proofs"].items():
+                old = int(old)
+                if old in roots and verify_consistency(old, size, roots[old], proven[size],
+                                                       [bytes.fromhex(p) for p in proof]):
+                    proven[old] = roots[old]
+        return proven
+
+    def inclusion(self, index, size=None):
+        """Inclusion proof bundle for record `index` against the tree of `size` records."""
+        self.sync()
+        size = len(self.tree) if size is None else size
+        return {
+            "index": index - self.base,
+            "size": size,
+            "record": self.logger.table.row(index),
+            "leaf_hash": self.tree.leaf(index - self.base).hex(),
+            "proof": [p.hex() for p in self.tree.inclusion_proof(index - self.base, size)],
+            "root": self.tree.root(size).hex()
+        }
+
+    def consistency(self, old_size, size=None):
+        """Consistency proof bundle between two tree sizes."""
+        self.sync()
+        size = len(self.tree) if size is None else size
+        return {
+            "old_size": old_size,
+            "size": size,
+            "old_root": self.tree.root(old_size).hex(),
+            "root": self.tree.root(size).hex(),
+            "proof": [p.hex() for p in self.tree.consistency_proof(old_size, size)]
+        }
+
+    def summary(self):
+        size = self.sync()
+        return {"epoch": self.epoch, "base": self.base, "size": size, "root": self.tree.root(size).hex(),
+                "floor": self.tree.floor, "nodes_held": self.tree.nodes_held,
+                "checkpoints": len(self.checkpoints), "frontiers": len(self.frontiers),
+                "last_checkpoint": self.checkpoints[-1] if self.checkpoints else None}
+
+def verify_bundle(bundle):
+    """Verifies an inclusion bundle as returned by AuditTrail.inclusion (e.g. from the API)."""
+    digest = leaf_hash(bundle["record"])
+    return digest.hex() == bundle["leaf_hash"] and verify_inclusion(
+        digest, bundle["index"], bundle["size"],
+        [bytes.fromhex(p) for p in bundle["proof"]], bytes.fromhex(bundle["root"]))
+
+if __name__ == "__main__":
+    from logger import SimulationLogger
+
+    logger = SimulationLogger()
+    trail = AuditTrail(logger, checkpoint_every=10000)
+    start = time.perf_counter()
+    for i in range(100000):
+        logger.log_event("Tick", "run_demo", None, None, i / 100000)
+    print(f"Logged and hashed 100000 records in {time.perf_counter() - start:.2f} s")
+    print("Checkpoints:", len(trail.checkpoints), "root:", trail.summary()["root"][:16])
+
+    start = time.perf_counter()
+    bundle = trail.inclusion(54321)
+    ok = verify_bundle(bundle)
+    print(f"Inclusion proof ({len(bundle['proof'])} hashes) verified={ok} "
+          f"in {(time.perf_counter() - start) * 1e3:.2f} ms")
+    first = trail.checkpoints[0]
+    proof = trail.consistency(first["size"])
+    print("Consistency with first checkpoint:", verify_consistency(
+        proof["old_size"], proof["size"], bytes.fromhex(first["root"]),
+        bytes.fromhex(proof["root"]), [bytes.fromhex(p) for p in proof["proof"]]))
+    bundle["record"]["bridge_strength"] = 1.0
+    print("Tampered record verifies:", verify_bundle(bundle))
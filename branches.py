@@ -0,0 +1,255 @@
+"""
+Version 4.3 — Copy-on-Write Session Branches Module
+Dual Portal Stargate Simulation System
+
+Forks the live session (DualPortal and both portals, bridge state, hardware, logger
+position) into what-if branches that run independently of it and of each other.
+Object state is a few dozen attributes and is copied; the logger history, which can be
+megabytes, is shared: a branch's RecordTable.fork() references the parent's rows and
+appends its own, so a fork costs the same whatever the history length. Branch objects
+are detached from the live session: attribute changes bump the branch's own revision
+counter and safety transitions go to the branch's own AlertBus (interlocked with the
+branch's failsafe), so a what-if floor excursion never trips the live failsafe.
+Branches can be forked again, driven through a small set of operations, compared
+against each other and the live session, and discarded.
+
+A branch pins the history it shares for as long as it lives: when retention compacts
+the live logger, rows a branch still references stay in memory (and a restored
+snapshot's record file stays mapped) until the branch is discarded. At most
+`max_branches` are open at once, and pinned_records() reports how many compacted rows
+they still hold, so discard branches that are no longer needed.
+"""
+
+import itertools
+import time
+
+import numpy as np
+
+from alerts import AlertBus, failsafe_interlock
+from dualportal import DualPortal
+from logger import SimulationLogger
+from revision import RevisionCounter
+from scheduler import transfer_cost
+
+COMPARE_METRICS = ("bridge_strength", "detune", "portal1_energy", "portal2_energy",
+                   "portal1_stability", "portal2_stability", "battery_charge_pct")
+
+def _detached(obj, revision, alerts, **overrides):
+    """Copies an object's attributes (containers shallow-copied) into a detached instance."""
+    copy = type(obj).__new__(type(obj))
+    state = {k: (v.copy() if isinstance(v, (list, dict)) else v) for k, v in vars(obj).items()}
+    state.update(overrides)
+    state["_revision"] = revision
+    if hasattr(type(obj), "_alerts"):
+        state["_alerts"] = alerts
+    copy.__dict__.update(state)
+    return copy
+
+def session_metrics(dp, hardware):
+    """The compared quantities for one session (live or branch)."""
+    return {"bridge_strength": dp.bridge_strength, "detune": dp.detune,
+            "portal1_energy": dp.portal1.energy, "portal2_energy": dp.portal2.energy,
+            "portal1_stability": dp.portal1.stability, "portal2_stability": dp.portal2.stability,
+            "battery_charge_pct": hardware["battery"].charge_pct}
+
+class Branch:
+    """An independent what-if copy of a session (transfers draw portal power over `transfer_seconds`)."""
+    def __init__(self, branch_id, label, parent, dp, hardware, logger, transfer_seconds=1.0):
+        self.id = branch_id
+        self.label = label
+        self.parent = parent                    # Branch id it was forked from, None for the live session
+        self.created = time.time()
+        self.revision = RevisionCounter()
+        self.alerts = AlertBus(debounce=0.0)
+        # Portals first so the DualPortal copy references the detached ones
+        portals = {name: _detached(getattr(dp, name), self.revision, self.alerts) for name in ("portal1", "portal2")}
+        self.dual_portal = _detached(dp, self.revision, self.alerts, **portals)
+        self.hardware = {name: _detached(obj, self.revision, self.alerts) for name, obj in hardware.items()}
+        if "failsafe" in self.hardware:
+            self.alerts.subscribe(failsafe_interlock(self.hardware["failsafe"]), channel="failsafe")
+        self.logger = SimulationLogger(logger.csv_filename, logger.json_filename)
+        self.logger.use_table(logger.table.fork())
+        self.logger.table.listeners = []        # Audit, analytics and retention follow the live logger only
+        self.fork_index = len(self.logger.table)
+        self.transfer_seconds = transfer_seconds
+        self.operations = 0
+
+    def _log(self, event, result=None, extra=None):
+        dp = self.dual_portal
+        self.logger.log_event(event, dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, result,
+                              extra or f"branch {self.id}")
+
+    def _portals(self, portal):
+        dp = self.dual_portal
+        return (dp.portal1, dp.portal2) if portal is None else ((dp.portal1,) if int(portal) == 1 else (dp.portal2,))
+
+    def update_energy(self, dt=1.0):
+        for p in self._portals(None):
+            p.update_energy(dt=dt)
+        return {"portal1_energy": self.dual_portal.portal1.energy, "portal2_energy": self.dual_portal.portal2.energy}
+
+    def form_bridge(self, t=1.0):
+        self.update_energy(dt=t)
+        self.dual_portal.form_bridge(t=t)
+        self._log("Branch Bridge Update")
+        return {"bridge_strength": self.dual_portal.bridge_strength}
+
+    def transfer_payload(self):
+        dp = self.dual_portal
+        result = dp.transfer_payload()
+        cost = transfer_cost(dp, 1, self.transfer_seconds)
+        if result:
+            self.hardware["battery"].supply_power(cost)     # Only completed transfers use energy
+        self._log("Branch Transfer", result)
+        return {"success": result, "bridge_strength": dp.bridge_strength, "energy_used": cost if result else 0.0}
+
+    def set_detune(self, detune):
+        dp = self.dual_portal
+        dp.detune = detune
+        dp.portal2.freq = dp.portal1.freq + detune
+        self._log("Branch Detune", extra=f"branch {self.id}: detune={detune}")
+        return {"detune": detune, "portal2_freq": dp.portal2.freq}
+
+    def set_power(self, power, portal=None):
+        for p in self._portals(portal):
+            p.power = power
+        return {"power": power}
+
+    def floor_sensor(self, portal=None, temp=None, contact=None):
+        for p in self._portals(portal):
+            p.floor_sensor(temp=temp, contact=contact)
+        return {"portal1_safety": self.dual_portal.portal1.safety_status,
+                "portal2_safety": self.dual_portal.portal2.safety_status}
+
+    def sense_payload(self, volume=None, mass=None, material=None, portal=None):
+        for p in self._portals(portal):
+            p.sense_payload(volume=volume, mass=mass, material=material)
+        return {"portal1_freq": self.dual_portal.portal1.freq, "portal2_freq": self.dual_portal.portal2.freq}
+
+    OPERATIONS = ("update_energy", "form_bridge", "transfer_payload", "set_detune", "set_power",
+                  "floor_sensor", "sense_payload")
+
+    def apply(self, op, **params):
+        """Runs one named operation on the branch; returns its result dict."""
+        if op not in self.OPERATIONS:
+            raise ValueError(f"Unknown branch operation {op!r}; expected one of {list(self.OPERATIONS)}")
+        result = getattr(self, op)(**params)
+        self.operations += 1
+        return result
+
+    def metrics(self):
+        return session_metrics(self.dual_portal, self.hardware)
+
+    def pinned_records(self, table):
+        """Shared records this branch keeps in memory that `table` (the one it was forked from) has compacted."""
+        return max(0, min(table.start, self.fork_index) - self.logger.table.start)
+
+    def transfers(self):
+        """Transfer attempts and successes logged on the branch since the fork."""
+        results = self.logger.table.rows_since(self.fork_index)["transfer_result"]
+        return {"transfers": int(np.count_nonzero(results >= 0)), "transfer_successes": int(np.count_nonzero(results == 1))}
+
+    def summary(self):
+        table = self.logger.table
+        return {"id": self.id, "label": self.label, "parent": self.parent, "created": self.created,
+                "operations": self.operations, "revision": self.revision.value,
+                "shared_records": self.fork_index - table.start, "branch_records": len(table) - self.fork_index,
+                "alerts": [{"source": s, "kind": k} for s, k in self.alerts.active()],
+                "failsafe_engaged": self.hardware["failsafe"].engaged if "failsafe" in self.hardware else None,
+                **self.metrics(), **self.transfers()}
+
+class BranchManager:
+    """
+    Forks, holds and compares what-if branches (at most `max_branches` at a time);
+    branch transfers cost the same `transfer_seconds` of portal power as live ones.
+    """
+    def __init__(self, max_branches=64, transfer_seconds=1.0):
+        self.max_branches = max_branches
+        self.transfer_seconds = transfer_seconds
+        self.branches = {}
+        self._ids = itertools.count(1)
+
+    def fork(self, dp, hardware, logger, label=None, parent=None):
+        """Forks a session given as its DualPortal, hardware dict and logger."""
+        if dp is None:
+            raise ValueError("Simulation not initialized")
+        if len(self.branches) >= self.max_branches:
+            raise ValueError(f"Branch limit reached ({self.max_branches}); discard some branches first")
+        branch_id = f"b{next(self._ids)}"
+        branch = Branch(branch_id, label or branch_id, parent, dp, hardware, logger, self.transfer_seconds)
+        self.branches[branch_id] = branch
+        return branch
+
+    def fork_branch(self, branch_id, label=None):
+        source = self.get(branch_id)
+        return self.fork(source.dual_portal, source.hardware, source.logger, label, parent=branch_id)
+
+    def get(self, branch_id):
+        try:
+            return self.branches[branch_id]
+        except KeyError:
+            raise ValueError(f"Unknown branch {branch_id!r}") from None
+
+    def discard(self, branch_id):
+        self.get(branch_id)
+        del self.branches[branch_id]
+
+    def clear(self):
+        self.branches.clear()
+
+    def compare(self, branch_ids=None, baseline=None):
+        """
+        Metrics of the given branches (default: all) side by side, with each metric's
+        difference from `baseline` (e.g. session_metrics of the live session) if given.
+        """
+        ids = list(self.branches) if branch_ids is None else list(branch_ids)
+        rows = []
+        for branch_id in ids:
+            branch = self.get(branch_id)
+            row = {"id": branch.id, "label": branch.label, **branch.metrics(), **branch.transfers()}
+            if baseline is not None:
+                row["delta"] = {m: row[m] - baseline[m] for m in COMPARE_METRICS}
+            rows.append(row)
+        best = max(rows, key=lambda r: r["bridge_strength"])["id"] if rows else None
+        return {"baseline": baseline, "branches": rows, "best_bridge_strength": best}
+
+    def pinned_records(self, table):
+        """
+        Records compacted from the live `table` that branches forked from it still hold
+        (summed per branch, so branches sharing the same rows count them more than once).
+        """
+        return sum(branch.pinned_records(table) for branch in self.branches.values() if branch.parent is None)
+
+    def summary(self):
+        return {"branches": len(self.branches), "max_branches": self.max_branches,
+                "ids": list(self.branches)}
+
+if __name__ == "__main__":
+    from hardware import TemperatureSensor, ContactSensor, TeslaBattery, FailsafeBlock
+
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    hardware = {"temp_sensor_1": TemperatureSensor("Portal1_Temp", -196.0),
+                "contact_sensor_1": ContactSensor("Portal1_Contact", True),
+                "battery": TeslaBattery(), "failsafe": FailsafeBlock()}
+    logger = SimulationLogger()
+    for i in range(500_000):
+        logger.table.append_values(i, "Tick", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength)
+    manager = BranchManager()
+    start = time.perf_counter()
+    forks = [manager.fork(dp, hardware, logger, f"detune {d:.2f}") for d in np.linspace(0.0, 0.5, 24)]
+    elapsed = time.perf_counter() - start
+    print(f"24 branches of a {len(logger.records):,}-record session in {elapsed * 1e3:.1f} ms "
+          f"({logger.table.nbytes() / 1e6:.0f} MB of history shared, not copied)")
+    for branch, detune in zip(forks, np.linspace(0.0, 0.5, 24)):
+        branch.apply("set_detune", detune=float(detune))
+        branch.apply("form_bridge", t=1.0)
+        branch.apply("transfer_payload")
+    hot = manager.fork_branch(forks[0].id, "hot floor")
+    hot.apply("floor_sensor", portal=1, temp=-190.0)
+    hot.apply("form_bridge", t=1.0)
+    comparison = manager.compare(baseline=session_metrics(dp, hardware))
+    for row in comparison["branches"][:-1:6] + comparison["branches"][-1:]:
+        print(f"{row['label']:>10}: bridge {row['bridge_strength']:.3f}, transfers {row['transfer_successes']}/{row['transfers']}")
+    print("Live portal1 energy untouched:", dp.portal1.energy, "| live failsafe:", hardware["failsafe"].engaged,
+          "| hot branch failsafe:", hot.summary()["failsafe_engaged"], hot.summary()["alerts"])
@@ -10,24 +10,61 @@ stability auditing. Each action is empirical, stateful, and transparently logged
 import numpy as np
 from portal import Portal
 from config import SimulationConfig
+from revision import Versioned, REVISION, SESSION_BINDINGS
+from alerts import ALERTS
+from safetyrules import SAFETY_RULES
 
-class DualPortal:
+def bridge_strength(energy1, energy2, stability1, stability2, safety1, safety2, detune,
+                    energy_input=None):
+    """
+    Vectorized form of the DualPortal.form_bridge strength formula.
+    Accepts scalars or NumPy arrays (broadcast together) for the source (1) and
+    destination (2) portal states; energy_input defaults to min(energy1, energy2).
+    A zero denominator (no energy, or zero source stability) yields strength 0.
+    Degradation and blocking come from the "bridge" stage safety rules.
+    """
+    energy1 = np.asarray(energy1, dtype=float)
+    energy2 = np.asarray(energy2, dtype=float)
+    stability1 = np.asarray(stability1, dtype=float)
+    stability2 = np.asarray(stability2, dtype=float)
+    if energy_input is None:
+        energy_input = np.minimum(energy1, energy2)
+    min_energy = energy1 * (1 + np.abs(detune) / SimulationConfig["resonance_frequency"])
+    denom = min_energy * stability1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strength = np.where(min_energy > 0, np.clip(energy_input / denom, 0.0, 1.0), 0.0)
+    strength = np.where(denom > 0, strength, 0.0)
+    return SAFETY_RULES.evaluate("bridge", stability1=stability1, stability2=stability2,
+                                 safety1=safety1, safety2=safety2, strength=strength)["strength"]
+
+class DualPortal(Versioned):
     """
     Class to manage dual-portals, their bridge formation, resonance detuning,
     power transfer, stability, and audit trail for every transfer run.
     """
 
-    def __init__(self, freq1=SimulationConfig["resonance_frequency"], 
-                 detune=SimulationConfig["detune_default"],
-                 power=SimulationConfig["energy_rate"]):
-        self.portal1 = Portal(freq=freq1, power=power)
-        self.portal2 = Portal(freq=freq1 + detune, power=power)
+    def __init__(self, freq1=None, detune=None, power=None):
+        freq1 = SimulationConfig["resonance_frequency"] if freq1 is None else freq1
+        detune = SimulationConfig["detune_default"] if detune is None else detune
+        self.portal1 = Portal(freq=freq1, power=power, name="portal1")
+        self.portal2 = Portal(freq=freq1 + detune, power=power, name="portal2")
         self.detune = detune                         # Empirical detune (Hz)
         self.bridge_strength = 0.0                   # Bridge strength metric (0-1)
         self.transfer_energy = 0.0
         self.status_log = []
         self.run_id = None
 
+    def attach(self, revision=REVISION, alerts=ALERTS):
+        """Attaches the pair and both portals to a session's revision counter and alert bus."""
+        self.portal1.attach(revision, alerts)
+        self.portal2.attach(revision, alerts)
+        return super().attach(revision)
+
+    def detach(self):
+        self.portal1.detach()
+        self.portal2.detach()
+        super().detach()
+
     def initialize_run(self, payload_volume=None, payload_mass=None, 
                        floor_temp1=None, floor_contact1=None,
                        floor_temp2=None, floor_contact2=None):
@@ -57,12 +94,11 @@ class DualPortal:
             self.bridge_strength = max(0.0, min(1.0, energy_input / (min_energy * self.portal1.stability)))
         else:
             self.bridge_strength = 0.0
-        if self.portal1.stability < 0.9 or self.portal2.stability < 0.9:
-            self.bridge_strength *= 0.7
-            self.status_log.append("[WARN] Portal stability below threshold—bridge degraded.")
-        if not (self.portal1.safety_status and self.portal2.safety_status):
-            self.bridge_strength = 0.0
-            self.status_log.append("[ERROR] Safety failure—bridge formation blocked.")
+        values, fired = SAFETY_RULES.check("bridge", stability1=self.portal1.stability, stability2=self.portal2.stability,
+                                           safety1=self.portal1.safety_status, safety2=self.portal2.safety_status,
+                                           strength=self.bridge_strength)
+        self.bridge_strength = values["strength"]
+        self.status_log.extend(message for _, message in fired if message)
         if self.bridge_strength >= 0.95:
             self.status_log.append("[INFO] Bridge formed at maximum strength.")
         else:
@@ -71,19 +107,12 @@ class DualPortal:
     def transfer_payload(self):
         """
         Attempts a transfer across the bridge. Success/failure is calculated 
-        empirically from bridge strength and portal stabilities.
+        empirically from bridge strength ("transfer" stage safety rules).
         Returns True if transfer succeeds, or False if blocked/unstable.
         """
-        if self.bridge_strength >= 0.98:
-            self.status_log.append("[SUCCESS] Payload transferred—maximum bridge stability.")
-            result = True
-        elif self.bridge_strength >= 0.90:
-            self.status_log.append("[SUCCESS] Payload transferred—acceptable bridge stability.")
-            result = True
-        else:
-            self.status_log.append("[FAIL] Payload transfer blocked/unreliable (bridge too weak).")
-            result = False
-        return result
+        values, fired = SAFETY_RULES.check("transfer", strength=self.bridge_strength)
+        self.status_log.extend(message for _, message in fired if message)
+        return values["allowed"]
 
     def full_status(self):
         """
@@ -100,10 +129,25 @@ class DualPortal:
         report += self.status_log
         return report
 
-    def reset(self):
+    def reset(self, freq1=None, detune=None, power=None):
         """
         Resets bridge state, energy, and logs for next run.
+        Given any construction parameter, restores the pair to the state of a freshly
+        constructed DualPortal(freq1, detune, power) instead, for pooled reuse.
         """
+        if freq1 is not None or detune is not None or power is not None:
+            freq1 = SimulationConfig["resonance_frequency"] if freq1 is None else freq1
+            detune = SimulationConfig["detune_default"] if detune is None else detune
+            power = SimulationConfig["energy_rate"] if power is None else power
+            self.portal1.reset(freq=freq1, power=power)
+            self.portal2.reset(freq=freq1 + detune, power=power)
+            fresh = {"portal1": self.portal1, "portal2": self.portal2, "detune": detune,
+                     "bridge_strength": 0.0, "transfer_energy": 0.0, "status_log": [], "run_id": None}
+            fresh.update((k, v) for k, v in vars(self).items() if k in SESSION_BINDINGS)
+            self.__dict__.clear()
+            self.__dict__.update(fresh)
+            self._revision.bump()
+            return
         self.portal1.reset()
         self.portal2.reset()
         self.bridge_strength = 0.0
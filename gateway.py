@@ -0,0 +1,320 @@
+"""
+Version 3.3 — Hardware Gateway Client & Stand-in Server Module
+Dual Portal Stargate Simulation System
+
+I/O layer between the simulation and lab hardware. GatewayClient keeps a pool of
+persistent TCP connections to a hardware gateway and sends batched requests (many
+sensor reads or commands in one round trip) with per-request timeouts and retries.
+GatewayServer is a local stand-in that emulates sensors, batteries and failsafes with
+the hardware.py classes and configurable latency, so the client can be exercised without
+lab hardware. HardwareMirror copies batched gateway readings into the local hardware
+objects the API serves from.
+
+Wire format: one JSON object per line.
+Request {"id": n, "ops": [{"op": "read", "device": name}, {"op": "call", "device": name,
+"method": m, "args": [...]}]}; response {"id": n, "results": [{"ok": true, "value": v}, ...]}.
+"""
+
+import asyncio
+import contextlib
+import itertools
+import json
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+from hardware import TemperatureSensor, ContactSensor, TeslaBattery, FailsafeBlock, EnvironmentMonitor
+
+READ_OPS = ("read", "status")
+CALLABLE_METHODS = ("read", "update", "status", "supply_power", "test", "reset", "read_all")
+
+class GatewayError(Exception):
+    """Raised when a gateway request fails after all retries."""
+
+def device_value(device):
+    """Current reading of an emulated device, as sent over the wire."""
+    if isinstance(device, (TemperatureSensor, ContactSensor)):
+        return device.read()
+    if isinstance(device, TeslaBattery):
+        return device.status()
+    if isinstance(device, FailsafeBlock):
+        return {"engaged": device.engaged}
+    if isinstance(device, EnvironmentMonitor):
+        return device.read_all()
+    raise TypeError(f"Unsupported device type {type(device).__name__}")
+
+def default_devices():
+    """The device set main.simulation_state uses, plus the environment monitor."""
+    return {"temp_sensor_1": TemperatureSensor("Portal1_Temp", -196.0),
+            "temp_sensor_2": TemperatureSensor("Portal2_Temp", -196.0),
+            "contact_sensor_1": ContactSensor("Portal1_Contact", True),
+            "contact_sensor_2": ContactSensor("Portal2_Contact", True),
+            "battery": TeslaBattery(),
+            "failsafe": FailsafeBlock(),
+            "environment": EnvironmentMonitor()}
+
+class GatewayServer:
+    """
+    Local TCP stand-in for a hardware gateway.
+    latency/jitter: seconds added to every round trip (one batched request = one delay).
+    """
+    def __init__(self, devices=None, host="127.0.0.1", port=0, latency=0.002, jitter=0.0):
+        self.devices = devices if devices is not None else default_devices()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.connections = 0
+        self._server = None
+        self._handlers = {}              # Handler task -> writer, for a clean stop()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in self._handlers.values():
+                writer.close()          # Idle handlers see EOF and return
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def _execute(self, op):
+        device = self.devices.get(op.get("device"))
+        if device is None:
+            return {"ok": False, "error": f"Unknown device: {op.get('device')}"}
+        try:
+            if op.get("op") in READ_OPS:
+                return {"ok": True, "value": device_value(device)}
+            if op.get("op") == "call" and op.get("method") in CALLABLE_METHODS:
+                value = getattr(device, op["method"])(*op.get("args", []))
+                return {"ok": True, "value": value}
+            return {"ok": False, "error": f"Unsupported operation: {op.get('op')} {op.get('method', '')}".strip()}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._handlers[asyncio.current_task()] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                self.requests += 1
+                delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+                if delay:
+                    await asyncio.sleep(delay)
+                results = [self._execute(op) for op in request.get("ops", [])]
+                writer.write(json.dumps({"id": request.get("id"), "results": results}).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            self._handlers.pop(asyncio.current_task(), None)
+            writer.close()
+
+class GatewayClient:
+    """
+    Pooled, persistent-connection client for a hardware gateway.
+    pool_size: max open connections; timeout: seconds per round trip;
+    retries: extra attempts for requests that are safe to repeat (reads only, or a
+    connection failure before the request was sent).
+    """
+    def __init__(self, host="127.0.0.1", port=8765, pool_size=4, timeout=1.0, retries=2, backoff=0.05):
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._idle = []
+        self._open = 0
+        self._available = None
+        self._ids = itertools.count(1)
+        self.stats = {"requests": 0, "round_trips": 0, "ops": 0, "connects": 0,
+                      "retries": 0, "timeouts": 0, "failures": 0}
+        self.latencies = deque(maxlen=1000)      # Recent round-trip times (s)
+
+    async def _acquire(self):
+        if self._available is None:
+            self._available = asyncio.Semaphore(self.pool_size)
+        await self._available.acquire()
+        if self._idle:
+            return self._idle.pop()
+        try:
+            conn = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        except BaseException:
+            self._available.release()
+            raise
+        self._open += 1
+        self.stats["connects"] += 1
+        return conn
+
+    def _release(self, conn, healthy):
+        if healthy:
+            self._idle.append(conn)
+        else:
+            self._open -= 1
+            conn[1].close()
+        self._available.release()
+
+    async def request(self, ops):
+        """Sends a batch of operations in one round trip; returns the per-op results."""
+        self.stats["requests"] += 1
+        self.stats["ops"] += len(ops)
+        repeatable = all(op.get("op") in READ_OPS for op in ops)
+        for attempt in range(self.retries + 1):
+            sent = False
+            try:
+                conn = await self._acquire()
+            except (OSError, asyncio.TimeoutError) as e:
+                error = e
+            else:
+                reader, writer = conn
+                request_id = next(self._ids)
+                start = time.perf_counter()
+                try:
+                    writer.write(json.dumps({"id": request_id, "ops": ops}).encode() + b"\n")
+                    sent = True
+                    await writer.drain()
+                    line = await asyncio.wait_for(reader.readline(), self.timeout)
+                    if not line:
+                        raise ConnectionError("Gateway closed the connection")
+                    response = json.loads(line)
+                    if response.get("id") != request_id:
+                        raise ConnectionError("Out-of-sequence gateway response")
+                except asyncio.CancelledError:
+                    self._release(conn, healthy=False)     # Response may still arrive on it
+                    raise
+                except (OSError, asyncio.TimeoutError, ValueError) as e:
+                    self._release(conn, healthy=False)
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.stats["timeouts"] += 1
+                    error = e
+                else:
+                    self._release(conn, healthy=True)
+                    self.stats["round_trips"] += 1
+                    self.latencies.append(time.perf_counter() - start)
+                    return response["results"]
+            if attempt == self.retries or (sent and not repeatable):
+                break
+            self.stats["retries"] += 1
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+        self.stats["failures"] += 1
+        raise GatewayError(f"Gateway request failed: {error!r}")
+
+    async def read_many(self, devices):
+        """Reads several devices in one round trip; returns {device: value}."""
+        results = await self.request([{"op": "read", "device": name} for name in devices])
+        values = {}
+        for name, result in zip(devices, results):
+            if not result.get("ok"):
+                raise GatewayError(f"{name}: {result.get('error')}")
+            values[name] = result["value"]
+        return values
+
+    async def call(self, device, method, *args):
+        """Invokes one device method on the gateway and returns its value."""
+        result = (await self.request([{"op": "call", "device": device, "method": method,
+                                       "args": list(args)}]))[0]
+        if not result.get("ok"):
+            raise GatewayError(f"{device}.{method}: {result.get('error')}")
+        return result["value"]
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+            self._open -= 1
+
+    def summary(self):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return dict(self.stats, open_connections=self._open, idle_connections=len(self._idle),
+                    latency_mean=float(latencies.mean()),
+                    latency_p95=float(np.percentile(latencies, 95)))
+
+class HardwareMirror:
+    """
+    Refreshes local hardware objects (main.simulation_state["hardware"]) from the gateway
+    with one batched read per poll. Objects are only touched when a reading changes, so
+    unchanged hardware does not bump the state revision. Readings go through the devices'
+    own update methods, so sensor and battery conditions raise alerts (and trip the
+    failsafe interlock) as local changes do.
+    lock: optional asyncio.Lock held while readings are applied (not during the read).
+    """
+    def __init__(self, client, hardware, interval=0.5, lock=None):
+        self.client = client
+        self.hardware = hardware
+        self.interval = interval
+        self.lock = lock
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+
+    def apply(self, values):
+        for name, value in values.items():
+            device = self.hardware.get(name)
+            if isinstance(device, TemperatureSensor) and device.value != value:
+                device.update(value)
+            elif isinstance(device, ContactSensor) and device.contact != value:
+                device.update(value)
+            elif isinstance(device, TeslaBattery) and device.status() != value:
+                device.set_state(value["capacity_kWh"], value["charge_pct"], value["failsafe_engaged"])
+            elif isinstance(device, FailsafeBlock) and value["engaged"] and not device.engaged:
+                device.test()           # Engage only: a latched block is released by reset_failsafe
+            elif isinstance(device, EnvironmentMonitor) and device.read_all() != value:
+                device.update(**value)
+
+    async def poll(self):
+        """One batched read of every mirrored device."""
+        values = await self.client.read_many(list(self.hardware))
+        async with self.lock or contextlib.nullcontext():
+            self.apply(values)
+        self.polls += 1
+        return values
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll()
+            except GatewayError as e:
+                self.errors += 1
+                self.last_error = str(e)
+            await asyncio.sleep(self.interval)
+
+if __name__ == "__main__":
+    async def demo():
+        server = await GatewayServer(latency=0.005).start()
+        client = GatewayClient(port=server.port, pool_size=4)
+        names = list(server.devices)
+
+        start = time.perf_counter()
+        for _ in range(20):
+            for name in names:
+                await client.read_many([name])
+        per_device = (time.perf_counter() - start) / 20
+        start = time.perf_counter()
+        for _ in range(20):
+            await client.read_many(names)
+        batched = (time.perf_counter() - start) / 20
+        print(f"Status read of {len(names)} devices: one-by-one {per_device * 1e3:.1f} ms, "
+              f"batched {batched * 1e3:.1f} ms")
+
+        server.devices["temp_sensor_1"].update(-150.0)
+        hardware = {name: dev for name, dev in default_devices().items() if name != "environment"}
+        await HardwareMirror(client, hardware).poll()
+        print("Mirrored temp_sensor_1:", hardware["temp_sensor_1"].read(), hardware["temp_sensor_1"].status)
+        print("Battery after remote draw:", await client.call("battery", "supply_power", 13500.0),
+              (await client.read_many(["battery"]))["battery"]["charge_pct"])
+        print(client.summary())
+        await client.close()
+        await server.stop()
+
+    asyncio.run(demo())
@@ -8,12 +8,17 @@ and basic environment reading. Each class includes API, status, and update metho
 demonstration/test routines.
 """
 
-class TemperatureSensor:
+from config import SimulationConfig
+from revision import Versioned
+from alerts import Alerting
+
+class TemperatureSensor(Alerting, Versioned):
     """Interface for ambient or floor temperature sensors"""
-    def __init__(self, name="TempSensor", initial=-196.0):
+    def __init__(self, name="TempSensor", initial=-196.0, threshold=None):
         self.name = name
         self.value = initial  # °C
         self.status = "OK"
+        self.threshold = threshold  # Alert above this reading (°C); None follows the configured threshold
 
     def read(self):
         """Read temperature value (override for hardware API)"""
@@ -23,8 +28,11 @@ class TemperatureSensor:
         """Update sim/hardware temperature value"""
         self.value = new_value
         self.status = "OK" if new_value < -100 else "WARN"
+        threshold = SimulationConfig["floor_temp_threshold"] if self.threshold is None else self.threshold
+        self._alerts.transition(self.name, "floor_temp_high", new_value > threshold, "critical",
+                          f"{self.name} reads {new_value:.2f} °C, above {threshold:.2f} °C", value=new_value)
 
-class ContactSensor:
+class ContactSensor(Alerting, Versioned):
     """Interface for solid floor contact (True/False)"""
     def __init__(self, name="ContactSensor", initial=True):
         self.name = name
@@ -38,8 +46,9 @@ class ContactSensor:
     def update(self, state):
         self.contact = state
         self.status = "OK" if state else "FAIL"
+        self._alerts.transition(self.name, "floor_contact_lost", not state, "critical", f"{self.name} lost floor contact")
 
-class TeslaBattery:
+class TeslaBattery(Alerting, Versioned):
     """Stub/API for Tesla battery management"""
     def __init__(self, capacity_kwh=13.5, charge_pct=100.0):
         self.capacity = capacity_kwh      # kWh
@@ -51,9 +60,27 @@ class TeslaBattery:
         used_kWh = rate_W / 1000.0 / 3600.0
         self.capacity -= used_kWh
         self.charge_pct = max(0.0, self.charge_pct - (used_kWh / 13.5) * 100)
-        self.failsafe_engaged = self.charge_pct < 10.0
+        self._set_failsafe(self.charge_pct < 10.0)
         return rate_W if not self.failsafe_engaged else 0.0
 
+    def recharge(self, energy_J):
+        """Returns energy (J) to the battery, e.g. from a charger, up to full charge"""
+        added_kWh = energy_J / 1000.0 / 3600.0
+        self.capacity = min(13.5, self.capacity + added_kWh)
+        self.charge_pct = min(100.0, self.charge_pct + (added_kWh / 13.5) * 100)
+        self._set_failsafe(self.charge_pct < 10.0)
+
+    def set_state(self, capacity_kwh, charge_pct, failsafe_engaged=None):
+        """Applies a reading from the real battery (e.g. via the hardware gateway)"""
+        self.capacity = capacity_kwh
+        self.charge_pct = charge_pct
+        self._set_failsafe(charge_pct < 10.0 if failsafe_engaged is None else failsafe_engaged)
+
+    def _set_failsafe(self, engaged):
+        self.failsafe_engaged = engaged
+        self._alerts.transition("battery", "battery_failsafe", engaged, "critical",
+                          f"Battery failsafe engaged at {self.charge_pct:.1f}% charge", charge_pct=self.charge_pct)
+
     def status(self):
         return {
             "capacity_kWh": self.capacity,
@@ -65,8 +92,9 @@ class TeslaBattery:
         self.capacity = 13.5
         self.charge_pct = 100.0
         self.failsafe_engaged = False
+        self._alerts.transition("battery", "battery_failsafe", False)
 
-class FailsafeBlock:
+class FailsafeBlock(Versioned):
     """Simulates a failsafe system, can be extended to real cutover logic."""
     def __init__(self):
         self.engaged = False
@@ -77,7 +105,7 @@ class FailsafeBlock:
     def reset(self):
         self.engaged = False
 
-class EnvironmentMonitor:
+class EnvironmentMonitor(Versioned):
     """Stub for site environment: can hold pressure, humidity, ELF field, etc."""
     def __init__(self, temp=-196, humidity=0.5, pressure=101.3):
         self.temp = temp
@@ -0,0 +1,309 @@
+"""
+Version 3.4 — Dashboard Load Testing Harness Module
+Dual Portal Stargate Simulation System
+
+Emulates operator and monitor traffic against a Stargate API instance to size deployments.
+Each stage runs a number of WebSocket monitors (on /ws and /ws/logs, expecting one tick per
+second) and HTTP operators that cycle through a dashboard script of status polls and
+control calls. Per stage it reports per-route latency percentiles, error counts, late and
+dropped WebSocket ticks, and server CPU/memory (read from /proc for a server started by
+the harness). The saturation point is the first stage that breaks the latency, tick or
+error objectives. The generator shares the machine with a local server, so its own CPU
+use is reported alongside.
+
+Usage: python loadtest.py --levels 10 50 100 200 --stage-seconds 15 [--url http://host:port]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+import websockets
+
+TICK_INTERVAL = 1.0              # Server push period of /ws and /ws/logs (s)
+LATE_TICK = 0.25                 # A tick arriving this much later than expected is late (s)
+
+# Operator dashboard script: cycled by every HTTP operator, one request per think interval
+OPERATOR_SCRIPT = (
+    ("GET", "/api/status"),
+    ("POST", "/api/update_energy"),
+    ("GET", "/api/safety_status"),
+    ("POST", "/api/form_bridge"),
+    ("GET", "/api/analytics?histogram=false"),
+    ("POST", "/api/transfer_payload"),
+    ("GET", "/api/status"),
+    ("GET", "/api/transfer_queue"),
+)
+
+class ProcessSampler:
+    """CPU and resident memory of a process from /proc (Linux); None elsewhere."""
+    def __init__(self, pid):
+        self.pid = pid
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._last = None
+
+    def _cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._ticks
+        except OSError:
+            return None
+
+    def _rss_mb(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024.0
+        except OSError:
+            pass
+        return None
+
+    def start(self):
+        self._last = (time.monotonic(), self._cpu_seconds())
+
+    def sample(self):
+        """CPU percent since start() (or the previous sample) and current RSS in MB."""
+        now, cpu = time.monotonic(), self._cpu_seconds()
+        cpu_pct = None
+        if cpu is not None and self._last and self._last[1] is not None:
+            cpu_pct = (cpu - self._last[1]) / max(now - self._last[0], 1e-9) * 100.0
+        self._last = (now, cpu)
+        return {"cpu_pct": cpu_pct, "rss_mb": self._rss_mb()}
+
+class StageRecorder:
+    """Latency samples per route and tick arrivals per WebSocket path for one stage."""
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.ticks = defaultdict(int)
+        self.late = defaultdict(int)
+        self.dropped = defaultdict(int)
+        self.gaps = defaultdict(list)
+        self.connect_failures = defaultdict(int)
+
+    def tick(self, path, gap):
+        self.ticks[path] += 1
+        if gap is None:
+            return
+        self.gaps[path].append(gap)
+        if gap > TICK_INTERVAL + LATE_TICK:
+            self.late[path] += 1
+            self.dropped[path] += int((gap + LATE_TICK) // TICK_INTERVAL) - 1
+
+    def report(self, seconds):
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            ms = np.array(samples) * 1e3 if samples else np.zeros(1)
+            routes[route] = {
+                "requests": len(samples), "errors": self.errors[route],
+                "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)), "max_ms": float(ms.max())
+            }
+        sockets = {}
+        for path in sorted(set(self.ticks) | set(self.connect_failures)):
+            gaps = np.array(self.gaps[path]) if self.gaps[path] else np.zeros(1)
+            sockets[path] = {
+                "ticks": self.ticks[path], "late": self.late[path], "dropped": self.dropped[path],
+                "late_pct": 100.0 * self.late[path] / max(len(self.gaps[path]), 1),
+                "gap_p95_s": float(np.percentile(gaps, 95)),
+                "connect_failures": self.connect_failures[path]
+            }
+        requests = sum(r["requests"] for r in routes.values())
+        errors = sum(r["errors"] for r in routes.values())
+        return {"routes": routes, "websockets": sockets, "requests": requests, "errors": errors,
+                "throughput_rps": requests / seconds,
+                "error_pct": 100.0 * errors / max(requests, 1)}
+
+async def operator(client, recorder, stop, think_time, offset):
+    """HTTP operator cycling through OPERATOR_SCRIPT."""
+    step = offset
+    while not stop.is_set():
+        method, route = OPERATOR_SCRIPT[step % len(OPERATOR_SCRIPT)]
+        step += 1
+        key = f"{method} {route.split('?')[0]}"
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, route)
+            ok = response.status_code < 400 and response.json().get("status") != "error"
+        except (httpx.HTTPError, ValueError):
+            ok = False
+        recorder.latencies[key].append(time.perf_counter() - start)
+        if not ok:
+            recorder.errors[key] += 1
+        try:
+            await asyncio.wait_for(stop.wait(), think_time)
+        except asyncio.TimeoutError:
+            pass
+
+async def monitor(ws_url, path, recorder, stop):
+    """WebSocket monitor recording tick gaps until stopped."""
+    try:
+        async with websockets.connect(ws_url + path, open_timeout=10, close_timeout=1,
+                                      max_size=None) as ws:
+            last = None
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(ws.recv(), 0.5)
+                except asyncio.TimeoutError:
+                    continue
+                now = time.monotonic()
+                recorder.tick(path, None if last is None else now - last)
+                last = now
+    except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+        if not stop.is_set():
+            recorder.connect_failures[path] += 1
+
+async def run_stage(base_url, clients, seconds, think_time=1.0, monitor_share=0.5,
+                    sampler=None, logs_share=0.25):
+    """
+    Runs one load level: `clients` simulated users, split into WebSocket monitors
+    (monitor_share, of which logs_share watch /ws/logs) and HTTP operators.
+    """
+    monitors = int(round(clients * monitor_share))
+    log_monitors = int(round(monitors * logs_share))
+    operators = clients - monitors
+    ws_url = "ws" + base_url[len("http"):]
+    recorder, stop = StageRecorder(), asyncio.Event()
+    limits = httpx.Limits(max_connections=max(operators, 1), max_keepalive_connections=max(operators, 1))
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=limits) as client:
+        own = ProcessSampler(os.getpid())
+        own.start()
+        if sampler:
+            sampler.start()
+        tasks = [asyncio.create_task(monitor(ws_url, "/ws/logs" if i < log_monitors else "/ws", recorder, stop))
+                 for i in range(monitors)]
+        tasks += [asyncio.create_task(operator(client, recorder, stop, think_time, i))
+                  for i in range(operators)]
+        await asyncio.sleep(seconds)
+        server = sampler.sample() if sampler else {"cpu_pct": None, "rss_mb": None}
+        generator = own.sample()
+        stop.set()
+        await asyncio.gather(*tasks)
+    report = recorder.report(seconds)
+    report.update(clients=clients, monitors=monitors, operators=operators,
+                  server_cpu_pct=server["cpu_pct"], server_rss_mb=server["rss_mb"],
+                  generator_cpu_pct=generator["cpu_pct"])
+    return report
+
+def saturated(stage, slo_p95_ms=250.0, max_late_pct=5.0, max_error_pct=1.0):
+    """Reasons a stage breaks the service objectives (empty list if it meets them)."""
+    reasons = [f"{route} p95 {r['p95_ms']:.0f} ms" for route, r in stage["routes"].items()
+               if r["p95_ms"] > slo_p95_ms]
+    reasons += [f"{path} {s['late_pct']:.1f}% late ticks" for path, s in stage["websockets"].items()
+                if s["late_pct"] > max_late_pct]
+    reasons += [f"{path} {s['connect_failures']} failed connections" for path, s in stage["websockets"].items()
+                if s["connect_failures"]]
+    if stage["error_pct"] > max_error_pct:
+        reasons.append(f"{stage['error_pct']:.1f}% errors")
+    return reasons
+
+def start_server(port, workdir=None):
+    """Starts main:app under uvicorn with throwaway state directories; returns the process."""
+    state = tempfile.mkdtemp(prefix="stargate-load-")
+    env = dict(os.environ,
+               STARGATE_SNAPSHOT_DIR=os.path.join(state, "snapshots"),
+               STARGATE_CACHE_DIR=os.path.join(state, "cache"),
+               STARGATE_AUDIT_DIR=os.path.join(state, "audit"))
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--log-level", "warning"],
+                            cwd=workdir or os.path.dirname(os.path.abspath(__file__)), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_ready(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api/status")).status_code == 200:
+                    await client.post("/api/initialize")
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+async def run_load_test(base_url, levels, stage_seconds, think_time=1.0, monitor_share=0.5,
+                        sampler=None, slo_p95_ms=250.0, max_late_pct=5.0, max_error_pct=1.0, log=print):
+    """Ramps through `levels` and returns {"stages": [...], "saturation": {...} | None}."""
+    await wait_ready(base_url)
+    stages, saturation = [], None
+    for clients in levels:
+        stage = await run_stage(base_url, clients, stage_seconds, think_time, monitor_share, sampler)
+        stage["violations"] = saturated(stage, slo_p95_ms, max_late_pct, max_error_pct)
+        stages.append(stage)
+        log(format_stage(stage))
+        if stage["violations"] and saturation is None:
+            saturation = {"clients": clients, "violations": stage["violations"]}
+            break
+    return {"stages": stages, "saturation": saturation,
+            "max_sustained_clients": max([s["clients"] for s in stages if not s["violations"]], default=0)}
+
+def format_stage(stage):
+    worst = max(stage["routes"].items(), key=lambda kv: kv[1]["p95_ms"], default=(None, None))
+    lines = [f"{stage['clients']:>5} clients ({stage['operators']} operators, {stage['monitors']} monitors): "
+             f"{stage['throughput_rps']:.1f} req/s, {stage['error_pct']:.1f}% errors, "
+             f"server CPU {_fmt(stage['server_cpu_pct'], '%')}, RSS {_fmt(stage['server_rss_mb'], ' MB')}, "
+             f"generator CPU {_fmt(stage['generator_cpu_pct'], '%')}"]
+    if worst[0]:
+        lines.append(f"      slowest route {worst[0]}: p50 {worst[1]['p50_ms']:.1f} / "
+                     f"p95 {worst[1]['p95_ms']:.1f} / p99 {worst[1]['p99_ms']:.1f} ms")
+    for path, s in stage["websockets"].items():
+        lines.append(f"      {path}: {s['ticks']} ticks, {s['late']} late, {s['dropped']} dropped, "
+                     f"gap p95 {s['gap_p95_s']:.2f} s")
+    if stage["violations"]:
+        lines.append("      SATURATED: " + "; ".join(stage["violations"]))
+    return "\n".join(lines)
+
+def _fmt(value, unit):
+    return "n/a" if value is None else f"{value:.1f}{unit}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stargate API dashboard load test")
+    parser.add_argument("--url", help="Target an existing server instead of starting one locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--levels", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    parser.add_argument("--stage-seconds", type=float, default=15.0)
+    parser.add_argument("--think-time", type=float, default=1.0, help="Seconds between an operator's requests")
+    parser.add_argument("--monitor-share", type=float, default=0.5, help="Fraction of clients on WebSockets")
+    parser.add_argument("--slo-p95-ms", type=float, default=250.0)
+    parser.add_argument("--max-late-pct", type=float, default=5.0)
+    parser.add_argument("--max-error-pct", type=float, default=1.0)
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args(argv)
+
+    server, sampler = None, None
+    base_url = args.url
+    if base_url is None:
+        server = start_server(args.port)
+        sampler = ProcessSampler(server.pid)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        report = asyncio.run(run_load_test(
+            base_url.rstrip("/"), args.levels, args.stage_seconds, args.think_time, args.monitor_share,
+            sampler, args.slo_p95_ms, args.max_late_pct, args.max_error_pct))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+    if report["saturation"]:
+        print(f"Saturation at {report['saturation']['clients']} clients; "
+              f"max sustained {report['max_sustained_clients']}")
+    else:
+        print(f"No saturation up to {args.levels[-1]} clients")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
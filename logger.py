@@ -5,13 +5,18 @@ Dual Portal Stargate Simulation System
 Provides full logging of all portal/bridge actions, simulation parameters, state changes, 
 transfers, warnings, and failures. Supports export to CSV and JSON for compliance, audit, 
 and peer review. Logging is modular and can be attached to all simulation orchestration scripts.
+Exports can also be streamed as CSV or NDJSON text chunks (optionally gzip-compressed),
+filtered by run and time range, without building the whole export in memory.
 """
 
+import io
 import json
 import csv
 import os
 import time
-from datetime import datetime
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
 
 def make_log_entry(timestamp, event, run_id, portal1, portal2, bridge_strength, transfer_result=None, extra=None):
     """Create a unified log dictionary for all major simulation events."""
@@ -33,29 +38,455 @@ def make_log_entry(timestamp, event, run_id, portal1, portal2, bridge_strength,
     }
     return entry
 
+LOG_FIELDS = ("timestamp", "event", "run_id",
+              "portal1_freq", "portal1_stab", "portal1_energy", "portal1_safety",
+              "portal2_freq", "portal2_stab", "portal2_energy", "portal2_safety",
+              "bridge_strength", "transfer_result", "extra")
+
+RECORD_DTYPE = np.dtype([
+    ("timestamp", np.int64),        # Epoch microseconds (UTC)
+    ("event", np.int32),            # Interned string codes
+    ("run_id", np.int32),
+    ("extra", np.int32),
+    ("portal1_freq", np.float64),
+    ("portal1_stab", np.float64),
+    ("portal1_energy", np.float64),
+    ("portal2_freq", np.float64),
+    ("portal2_stab", np.float64),
+    ("portal2_energy", np.float64),
+    ("bridge_strength", np.float64),
+    ("portal1_safety", np.bool_),
+    ("portal2_safety", np.bool_),
+    ("transfer_result", np.int8),   # -1 = None, 0 = False, 1 = True
+])
+
+EXTRA_DEDUPE = 4096                                 # Recent distinct `extra` strings reused without a new entry
+
+_EPOCH = datetime(1970, 1, 1)
+_MISSING_PORTAL = (np.nan, np.nan, np.nan, False)   # Error paths may log without portals
+
+def _float(value):
+    """Python float for a stored value, or None for the NaN written when a portal was missing."""
+    value = float(value)
+    return None if value != value else value
+
+def format_timestamp(epoch_us):
+    """ISO-8601 UTC timestamp (naive, as datetime.utcnow().isoformat()) for epoch microseconds."""
+    return (_EPOCH + timedelta(microseconds=int(epoch_us))).isoformat()
+
+class RecordTable:
+    """
+    Compact, array-backed store of log records: one growable NumPy structured array
+    holding numeric columns, with the low-cardinality event/run_id strings interned into a
+    shared table. Free-form `extra` messages go to a separate append-only pool (recent
+    repeats reuse their entry), so unique messages never grow the interned table.
+    Records are materialized as log dicts only when read. Read-only shared segments
+    (a memory-mapped snapshot, or the rows of the table a fork was taken from) may
+    precede the live rows; record indices span them all. compact() drops aged leading
+    records (after listeners have seen them) and the pool entries only they used; indices
+    stay global, so the first retained record is `start` rather than 0, but string and
+    `extra` codes are renumbered.
+    """
+    def __init__(self, capacity=1024):
+        self._data = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self._size = 0
+        self._shared = []            # Read-only leading row segments
+        self._shared_rows = 0
+        self._strings = [None]       # Code 0 is reserved for None
+        self._codes = {None: 0}
+        self._extras = [""]          # `extra` pool; code 0 is the empty message
+        self._extra_codes = {"": 0}  # Recent messages only (reset every EXTRA_DEDUPE)
+        self._extras_shared = False  # Pool belongs to the table this one was forked from
+        self.start = 0               # Index of the first retained record (earlier ones compacted)
+        self.generation = 0          # Bumped by clear() so persisted copies can detect resets
+        self.listeners = []          # Objects with on_append(table, index) / on_clear(table)
+
+    @classmethod
+    def from_segments(cls, base, strings, start=0, extras=None):
+        """
+        Builds a table over existing rows (not copied, first at index `start`), a string
+        table and an `extra` pool.
+        """
+        table = cls()
+        table.start = start
+        table._share([base])
+        table._strings = list(strings)
+        table._codes = {value: code for code, value in enumerate(table._strings)}
+        if extras is not None:
+            table._extras = list(extras)
+        return table
+
+    def _share(self, segments):
+        self._shared = [segment for segment in segments if len(segment)]
+        self._shared_rows = sum(len(segment) for segment in self._shared)
+
+    def fork(self):
+        """
+        Copy-on-write copy: the new table shares every current row (no copying) and
+        appends its own rows independently. Listeners are not carried over.
+        """
+        start, segments, strings, extras = self.segments()
+        table = type(self)()
+        table.start = start
+        table._share(segments)
+        table._strings = list(strings)
+        table._codes = dict(self._codes)
+        table._extras, table._extras_shared = extras, True
+        return table
+
+    def intern(self, value):
+        """Returns the integer code for a string, adding it to the string table if new."""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._strings)
+            self._strings.append(value)
+            self._codes[value] = code
+        return code
+
+    def lookup(self, value):
+        """Returns the code of an already interned string, or -1 (matching no rows) without adding it."""
+        return self._codes.get(value, -1)
+
+    def intern_extra(self, value):
+        """Returns the pool code for an `extra` message, adding an entry unless it was seen recently."""
+        if not value:
+            return 0
+        code = self._extra_codes.get(value)
+        if code is None:
+            if self._extras_shared:
+                self._extras, self._extras_shared = list(self._extras), False
+            code = len(self._extras)
+            self._extras.append(value)
+            if len(self._extra_codes) >= EXTRA_DEDUPE:
+                self._extra_codes = {"": 0}
+            self._extra_codes[value] = code
+        return code
+
+    def _grow(self):
+        data = np.zeros(max(1024, 2 * len(self._data)), dtype=RECORD_DTYPE)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def append_values(self, timestamp_us, event, run_id, portal1, portal2, bridge_strength,
+                      transfer_result=None, extra=None):
+        """Appends one record from live portal objects without building a dict."""
+        if self._size == len(self._data):
+            self._grow()
+        p1 = (portal1.freq, portal1.stability, portal1.energy, portal1.safety_status) if portal1 is not None else _MISSING_PORTAL
+        p2 = (portal2.freq, portal2.stability, portal2.energy, portal2.safety_status) if portal2 is not None else _MISSING_PORTAL
+        self._data[self._size] = (
+            timestamp_us, self.intern(event), self.intern(run_id), self.intern_extra(extra),
+            p1[0], p1[1], p1[2], p2[0], p2[1], p2[2], bridge_strength, p1[3], p2[3],
+            -1 if transfer_result is None else int(bool(transfer_result)))
+        self._size += 1
+        for listener in self.listeners:
+            listener.on_append(self, len(self) - 1)
+
+    def append(self, entry):
+        """Appends a log dict as produced by make_log_entry (ISO or epoch-µs timestamp)."""
+        if self._size == len(self._data):
+            self._grow()
+        row = self._data[self._size]
+        ts = entry["timestamp"]
+        if isinstance(ts, str):
+            ts = (datetime.fromisoformat(ts) - _EPOCH) // timedelta(microseconds=1)
+        row["timestamp"] = ts
+        row["event"] = self.intern(entry["event"])
+        row["run_id"] = self.intern(entry["run_id"])
+        row["extra"] = self.intern_extra(entry["extra"])
+        for key in ("portal1_freq", "portal1_stab", "portal1_energy", "portal1_safety",
+                    "portal2_freq", "portal2_stab", "portal2_energy", "portal2_safety",
+                    "bridge_strength"):
+            row[key] = entry[key]
+        result = entry["transfer_result"]
+        row["transfer_result"] = -1 if result is None else int(bool(result))
+        self._size += 1
+        for listener in self.listeners:
+            listener.on_append(self, len(self) - 1)
+
+    def row(self, i):
+        """Materializes record i as a log dict."""
+        r = self.raw(i)
+        s = self._strings
+        result = int(r["transfer_result"])
+        return {
+            "timestamp": format_timestamp(r["timestamp"]),
+            "event": s[r["event"]],
+            "run_id": s[r["run_id"]],
+            "portal1_freq": _float(r["portal1_freq"]),
+            "portal1_stab": _float(r["portal1_stab"]),
+            "portal1_energy": _float(r["portal1_energy"]),
+            "portal1_safety": bool(r["portal1_safety"]),
+            "portal2_freq": _float(r["portal2_freq"]),
+            "portal2_stab": _float(r["portal2_stab"]),
+            "portal2_energy": _float(r["portal2_energy"]),
+            "portal2_safety": bool(r["portal2_safety"]),
+            "bridge_strength": _float(r["bridge_strength"]),
+            "transfer_result": None if result < 0 else bool(result),
+            "extra": self._extras[r["extra"]]
+        }
+
+    def raw(self, i):
+        """Raw structured row i (string columns hold interned codes)."""
+        if i < self.start:
+            raise IndexError(f"Record {i} has been compacted into rollups")
+        i -= self.start
+        for segment in self._shared:
+            if i < len(segment):
+                return segment[i]
+            i -= len(segment)
+        return self._data[i]
+
+    def column(self, name):
+        """
+        Read-only NumPy view of one raw column over the retained records (element 0 is
+        record `start`; string columns hold interned codes).
+        """
+        view = self._data[name][:self._size]
+        if self._shared:
+            view = np.concatenate([segment[name] for segment in self._shared] + [view])
+        view.flags.writeable = False
+        return view
+
+    def rows_since(self, start):
+        """Raw structured rows from record index `start` to the end."""
+        if start < self.start:
+            raise IndexError(f"Records {start}-{self.start - 1} have been compacted into rollups")
+        start -= self.start
+        if start >= self._shared_rows:
+            return self._data[start - self._shared_rows:self._size]
+        pieces = []
+        for segment in self._shared:
+            if start < len(segment):
+                pieces.append(segment[start:])
+            start = max(0, start - len(segment))
+        return np.concatenate(pieces + [self._data[:self._size]])
+
+    def segments(self):
+        """
+        Stable views of the retained rows (start index, [row segments in order]), the
+        string table and the `extra` pool, for readers and forks that outlive later
+        appends, compaction or clear(): written rows and pool entries never change, and
+        those operations replace the arrays rather than modifying them.
+        """
+        return self.start, self._shared + [self._data[:self._size]], self._strings, self._extras
+
+    def strings_since(self, start):
+        """Interned strings added at or after code `start`."""
+        return self._strings[start:]
+
+    def extras_since(self, start):
+        """`extra` pool entries added at or after code `start`."""
+        return self._extras[start:]
+
+    @property
+    def string_count(self):
+        return len(self._strings)
+
+    def string(self, code):
+        """Looks up an interned string by code."""
+        return self._strings[code]
+
+    def compact(self, upto):
+        """
+        Drops records before index `upto` from memory. Listeners get on_compact(table, upto)
+        first, so lazily synced ones can catch up on the rows about to go.
+        """
+        upto = min(upto, len(self))
+        if upto <= self.start:
+            return 0
+        for listener in self.listeners:
+            listener.on_compact(self, upto)
+        retained = self.rows_since(upto)
+        data = np.zeros(max(1024, 2 * len(retained)), dtype=RECORD_DTYPE)
+        data[:len(retained)] = retained
+        self._compact_pools(data[:len(retained)])
+        dropped = upto - self.start
+        self._data, self._size = data, len(retained)
+        self._share([])
+        self.start = upto
+        return dropped
+
+    def _compact_pools(self, rows):
+        """
+        Rebuilds the string table and `extra` pool with only the entries `rows` still use,
+        rewriting their codes in place. The lists are replaced, not modified, so segments()
+        views and forks keep the pools their rows refer to.
+        """
+        used = np.union1d(np.union1d(rows["event"], rows["run_id"]), [0])
+        remap = np.zeros(len(self._strings), dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        rows["event"], rows["run_id"] = remap[rows["event"]], remap[rows["run_id"]]
+        self._strings = [self._strings[code] for code in used.tolist()]
+        self._codes = {value: code for code, value in enumerate(self._strings)}
+        used = np.union1d(rows["extra"], [0])
+        remap = np.zeros(len(self._extras), dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        rows["extra"] = remap[rows["extra"]]
+        self._extras = [self._extras[code] for code in used.tolist()]
+        self._extra_codes, self._extras_shared = {"": 0}, False
+
+    def nbytes(self):
+        """Approximate bytes held by the record columns (excluding the string table and `extra` pool)."""
+        return (len(self) - self.start) * RECORD_DTYPE.itemsize
+
+    def clear(self):
+        self._data = np.zeros(1024, dtype=RECORD_DTYPE)
+        self._size = 0
+        self._share([])
+        self._strings = [None]
+        self._codes = {None: 0}
+        self._extras, self._extra_codes, self._extras_shared = [""], {"": 0}, False
+        self.start = 0
+        self.generation += 1
+        for listener in self.listeners:
+            listener.on_clear(self)
+
+    def __len__(self):
+        return self.start + self._shared_rows + self._size
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+_RESULTS = (None, False, True)                      # transfer_result -1/0/1
+
+def _export_columns(rows, strings, extras):
+    """Raw rows as per-field Python lists in LOG_FIELDS order, with row()'s value conversions."""
+    ts = rows["timestamp"]
+    stamps = np.datetime_as_string(ts.astype("datetime64[us]"), unit="us")
+    whole = ts % 1_000_000 == 0                     # isoformat() omits a zero fraction
+    if whole.any():
+        stamps[whole] = np.datetime_as_string(ts[whole].astype("datetime64[us]"), unit="s")
+    columns = {"timestamp": stamps.tolist(),
+               "transfer_result": [_RESULTS[r + 1] for r in rows["transfer_result"].tolist()]}
+    for name in ("event", "run_id"):
+        columns[name] = [strings[code] for code in rows[name].tolist()]
+    columns["extra"] = [extras[code] for code in rows["extra"].tolist()]
+    for name in LOG_FIELDS:
+        if name not in columns:
+            values = rows[name].tolist()
+            if rows.dtype[name].kind == "f" and np.isnan(rows[name]).any():
+                values = [None if v != v else v for v in values]
+            columns[name] = values
+    return [columns[name] for name in LOG_FIELDS]
+
+def iter_export(table, fmt="csv", run_id=None, start_us=None, end_us=None, chunk_rows=10000):
+    """
+    Yields the retained records of a RecordTable as text chunks: CSV (header first, the
+    same rows export_csv writes) or NDJSON (one row() dict per line). Filters by run_id
+    and by timestamp in [start_us, end_us). Works on the rows present when the export
+    started, so records logged meanwhile are not included.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {sorted(EXPORT_FORMATS)}")
+    _, segments, strings, extras = table.segments()
+    run_code = None
+    if run_id is not None:
+        run_code = strings.index(run_id) if run_id in strings else -1
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(LOG_FIELDS)
+        yield buffer.getvalue()
+    for segment in segments:
+        for i in range(0, len(segment), chunk_rows):
+            rows = segment[i:i + chunk_rows]
+            mask = np.ones(len(rows), dtype=bool)
+            if run_code is not None:
+                mask &= rows["run_id"] == run_code
+            if start_us is not None:
+                mask &= rows["timestamp"] >= start_us
+            if end_us is not None:
+                mask &= rows["timestamp"] < end_us
+            if not mask.all():
+                rows = rows[mask]
+            if not len(rows):
+                continue
+            records = zip(*_export_columns(rows, strings, extras))
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(records)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(zip(LOG_FIELDS, r))) + "\n" for r in records)
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compresses a stream of text chunks incrementally (UTF-8)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)      # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+class RecordsView:
+    """
+    List-like view of a RecordTable: supports len(), indexing, slicing, iteration and
+    append(), yielding log dicts as callers of SimulationLogger.records expect.
+    Slices return plain lists. Covers the retained records (compacted ones are only in
+    the retention rollups).
+    """
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table) - self._table.start
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        start = self._table.start
+        if isinstance(index, slice):
+            return [self._table.row(start + i) for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("record index out of range")
+        return self._table.row(start + index)
+
+    def __iter__(self):
+        for i in range(self._table.start, len(self._table)):
+            yield self._table.row(i)
+
+    def append(self, entry):
+        self._table.append(entry)
+
+    def clear(self):
+        self._table.clear()
+
 class SimulationLogger:
     """
     Handles the collection, buffering, and export of all simulation event records.
     """
     def __init__(self, csv_filename="stargate_datalog.csv", json_filename="stargate_auditlog.json"):
-        self.records = []
+        self.table = RecordTable()
+        self.records = RecordsView(self.table)
         self.csv_filename = csv_filename
         self.json_filename = json_filename
 
+    def use_table(self, table):
+        """Swaps in another record table (e.g. a restored snapshot), keeping listeners attached."""
+        table.listeners = self.table.listeners
+        self.table = table
+        self.records = RecordsView(table)
+
     def log_event(self, event, run_id, portal1, portal2, bridge_strength, transfer_result=None, extra=None):
-        timestamp = datetime.utcnow().isoformat()
-        entry = make_log_entry(timestamp, event, run_id, portal1, portal2, bridge_strength, transfer_result, extra)
-        self.records.append(entry)
+        self.table.append_values(time.time_ns() // 1000, event, run_id, portal1, portal2,
+                                 bridge_strength, transfer_result, extra)
+
+    def stream(self, fmt="csv", run_id=None, start_us=None, end_us=None, compress=False):
+        """Export chunks for an HTTP response or file (see iter_export); gzip bytes if compress."""
+        chunks = iter_export(self.table, fmt, run_id, start_us, end_us)
+        return gzip_chunks(chunks) if compress else chunks
 
     def export_csv(self):
         if not self.records:
             print("[Logger] No records to export.")
             return
-        keys = self.records[0].keys()
         with open(self.csv_filename, "w", newline='') as f:
-            writer = csv.DictWriter(f, keys)
-            writer.writeheader()
-            writer.writerows(self.records)
+            for chunk in self.stream("csv"):
+                f.write(chunk)
         print(f"[Logger] Exported log to {self.csv_filename}")
 
     def export_json(self):
@@ -63,7 +494,7 @@ class SimulationLogger:
             print("[Logger] No records to export.")
             return
         with open(self.json_filename, "w") as f:
-            json.dump(self.records, f, indent=4)
+            json.dump(self.records[:], f, indent=4)
         print(f"[Logger] Exported audit to {self.json_filename}")
 
     def clear(self):
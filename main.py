@@ -5,12 +5,13 @@ FastAPI application with WebSocket support for real-time physics simulation
 
 print("=== STARGATE BACKEND STARTING - UVICORN VERSION ===", flush=True)
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
-import json
 import asyncio
+import functools
 from typing import List
 import uvicorn
 
@@ -18,10 +19,29 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import load_simulation_config, validate_config
-from dualportal import DualPortal
-from logger import SimulationLogger
+from profiles import ProfileStore, ConfigError, validate_batch, describe_violations
+from logger import SimulationLogger, EXPORT_FORMATS
 from hardware import TemperatureSensor, ContactSensor, TeslaBattery, FailsafeBlock
+import protocol
+from revision import REVISION, SnapshotCache, etag_matches
+from scheduler import TransferScheduler
+from snapshot import SessionStore, object_state, dual_portal_state
+from resultcache import ResultCache
+from audit import AuditTrail, AUDIT_DIR
+from analytics import RunAnalytics
+from pool import DualPortalPool
+from gateway import GatewayServer, GatewayClient, HardwareMirror
+from alerts import ALERTS, failsafe_interlock, reset_failsafe, deliver_webhook
+import sensitivity
+import plots
+from plots import PlotRenderer
+import statepub
+from statepub import StatePublisher
+from payloads import PAYLOADS, manifest_totals
+from retention import RetentionManager, DEFAULT_TIERS
+from safetyrules import SAFETY_RULES, STAGE_FIELDS
+from branches import BranchManager, session_metrics
+import numpy as np
 
 simulation_state = {
     "dual_portal": None,
@@ -37,13 +57,15 @@ simulation_state = {
     },
     "running": False
 }
+for device in simulation_state["hardware"].values():
+    device.attach()                     # Live objects publish revisions and alerts; pooled, replay and sweep copies do not
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, subprotocol: str | None = None):
+        await websocket.accept(subprotocol=subprotocol)
         self.active_connections.append(websocket)
 
     def disconnect(self, websocket: WebSocket):
@@ -52,29 +74,245 @@ class ConnectionManager:
     async def broadcast(self, message: dict):
         for connection in self.active_connections:
             try:
-                await connection.send_text(json.dumps(message))
+                await connection.send_text(protocol.JSONCodec().encode(message))
             except:
                 pass
 
 manager = ConnectionManager()
 
+# Held by every endpoint and loop that mutates the live session (including the scheduler,
+# the hardware mirror and the /ws telemetry tick), so none of them interleaves with another
+# or with an /api/batch sequence
+session_lock = asyncio.Lock()
+
+def locked(endpoint):
+    """Runs a mutating endpoint under session_lock (batches call endpoint.__wrapped__, already holding it)"""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        async with session_lock:
+            return await endpoint(*args, **kwargs)
+    return wrapper
+
+result_cache = ResultCache()
+
+plot_renderer = PlotRenderer(workers=int(os.environ.get("STARGATE_PLOT_WORKERS", "2")))
+PLOT_MAX_INCHES = 20.0                  # Largest chart edge a request may ask for
+PLOT_MAX_POINTS = 100_000               # Most records a history/sensor chart may draw
+
+# Transfers draw portal power over TRANSFER_SECONDS from the battery (live and in branches)
+TRANSFER_SECONDS = float(os.environ.get("STARGATE_TRANSFER_SECONDS", "1.0"))
+
+branches = BranchManager(max_branches=int(os.environ.get("STARGATE_MAX_BRANCHES", "64")),
+                         transfer_seconds=TRANSFER_SECONDS)
+
+portal_pool = DualPortalPool(size=int(os.environ.get("STARGATE_POOL_SIZE", "16")))
+
+# The charger refills the battery at CHARGER_W between transfer windows
+scheduler = TransferScheduler(lambda: simulation_state["dual_portal"],
+                              simulation_state["hardware"]["battery"],
+                              transfer_seconds=TRANSFER_SECONDS,
+                              recharge_w=float(os.environ.get("STARGATE_CHARGER_W", "13500")),
+                              lock=session_lock)
+
+audit_trail = None
+run_analytics = None
+retention = None
+AUDIT_CHECKPOINT_PATH = os.path.join(AUDIT_DIR, "checkpoints.jsonl")
+
+# Hardware gateway: unset = simulated hardware only, "local" = in-process stand-in server,
+# "host:port" = remote gateway. Readings are mirrored into simulation_state["hardware"].
+GATEWAY_ADDRESS = os.environ.get("STARGATE_GATEWAY", "")
+GATEWAY_POLL_INTERVAL = float(os.environ.get("STARGATE_GATEWAY_POLL", "0.5"))
+gateway = {"server": None, "client": None, "mirror": None}
+
+async def start_gateway():
+    """Connects the hardware mirror to the configured gateway (if any); returns its poll task"""
+    if not GATEWAY_ADDRESS:
+        return None
+    if GATEWAY_ADDRESS == "local":
+        gateway["server"] = await GatewayServer().start()
+        host, port = gateway["server"].host, gateway["server"].port
+    else:
+        host, port = GATEWAY_ADDRESS.rsplit(":", 1)
+    gateway["client"] = GatewayClient(host, int(port))
+    gateway["mirror"] = HardwareMirror(gateway["client"], simulation_state["hardware"], GATEWAY_POLL_INTERVAL,
+                                       lock=session_lock)
+    return asyncio.create_task(gateway["mirror"].run())
+
+async def stop_gateway(task):
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if gateway["client"]:
+        await gateway["client"].close()
+    if gateway["server"]:
+        await gateway["server"].stop()
+
+ALERT_WEBHOOK = os.environ.get("STARGATE_ALERT_WEBHOOK", "")
+# Only objects attached to the live session publish to ALERTS; the failsafe latches until /api/failsafe/reset
+ALERTS.subscribe(failsafe_interlock(simulation_state["hardware"]["failsafe"]), channel="failsafe")
+
+# Shared-memory state block for co-located readers (statepub.StateReader); unset = disabled
+STATE_SHM_NAME = os.environ.get("STARGATE_SHM", "")
+STATE_SHM_HEARTBEAT = float(os.environ.get("STARGATE_SHM_HEARTBEAT", "1.0"))
+state_block = {"publisher": None}
+
+async def publish_state_loop(publisher):
+    """Republishes the shared state block after every revision change (and at least once per heartbeat)"""
+    revision = -1
+    while True:
+        revision = await REVISION.wait_for(revision, STATE_SHM_HEARTBEAT)
+        try:
+            publisher.publish(simulation_state["dual_portal"], simulation_state["hardware"], revision)
+        except Exception as e:
+            print(f"✗ State block publish error: {e}")
+
+session_store = SessionStore()
+SNAPSHOT_INTERVAL = float(os.environ.get("STARGATE_SNAPSHOT_INTERVAL", "30"))
+
+def ensure_restored():
+    """Lazily restores the last session snapshot on the first request after a wake-up"""
+    if session_store.checked:
+        return
+    try:
+        if session_store.restore_once(simulation_state):
+            if simulation_state["dual_portal"]:
+                simulation_state["dual_portal"].attach()
+            scheduler.logger = simulation_state["logger"]
+            if retention:
+                retention.load()
+            print("✓ Session restored from snapshot")
+        elif audit_trail and audit_trail.checkpoints and \
+                len(simulation_state["logger"].records) < audit_trail.base + audit_trail.checkpoints[-1]["size"]:
+            audit_trail.start_epoch()       # Checkpoints belong to a session that was not restored
+    except Exception as e:
+        print(f"✗ Snapshot restore error: {e}")
+
+def save_session():
+    """Writes an incremental session snapshot (after any pending restore)"""
+    if not session_store.checked:
+        return
+    try:
+        session_store.save(simulation_state)
+        if retention:
+            retention.save()
+        if audit_trail:
+            audit_trail.checkpoint()
+    except Exception as e:
+        print(f"✗ Snapshot save error: {e}")
+
+profile_store = None
+CONFIG_PROFILE = os.environ.get("STARGATE_PROFILE", "default")
+CONFIG_POLL_INTERVAL = float(os.environ.get("STARGATE_CONFIG_POLL", "1.0"))
+
+async def profile_watch_loop():
+    """Hot-reloads config profiles and safety rules when their files change"""
+    while True:
+        await asyncio.sleep(CONFIG_POLL_INTERVAL)
+        try:
+            async with session_lock:
+                if profile_store.reload_if_changed():
+                    simulation_state["config"] = profile_store.active
+                    REVISION.bump()
+                    print(f"✓ Reloaded config profiles ({profile_store.active_name} active)")
+                if SAFETY_RULES.reload_if_changed():
+                    REVISION.bump()
+                    print(f"✓ Reloaded safety rules from {SAFETY_RULES.path}")
+        except Exception as e:
+            print(f"✗ Config reload error: {e}")      # Keep watching; the last good config stays active
+
+async def snapshot_loop():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        async with session_lock:
+            save_session()
+
+# Raw records older than RETENTION_RAW_SECONDS are compacted into the rollup tiers
+RETENTION_RAW_SECONDS = float(os.environ.get("STARGATE_RETENTION_RAW_SECONDS", "3600"))
+RETENTION_INTERVAL = float(os.environ.get("STARGATE_RETENTION_INTERVAL", "60"))
+
+async def retention_loop():
+    """Compacts aged raw records, then snapshots so the record file shrinks with them"""
+    while True:
+        await asyncio.sleep(RETENTION_INTERVAL)
+        if not session_store.checked:
+            continue                    # Compact only once a pending restore has happened
+        try:
+            async with session_lock:
+                if retention.compact():
+                    save_session()
+        except Exception as e:
+            print(f"✗ Retention error: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize simulation on startup"""
+    global audit_trail, run_analytics, retention, profile_store
     try:
-        config = load_simulation_config()
-        validate_config(config)
-        simulation_state["config"] = config
+        profile_store = ProfileStore(active=CONFIG_PROFILE)
+        if profile_store.last_error:
+            raise ConfigError(profile_store.last_error)
+        simulation_state["config"] = profile_store.active
         simulation_state["logger"] = SimulationLogger()
+        audit_trail = AuditTrail(simulation_state["logger"], AUDIT_CHECKPOINT_PATH)
+        run_analytics = RunAnalytics(simulation_state["logger"])
+        retention = RetentionManager(simulation_state["logger"], RETENTION_RAW_SECONDS,
+                                     DEFAULT_TIERS, session_store.directory)
+        scheduler.logger = simulation_state["logger"]
+        portal_pool.warm()
+        REVISION.bump()
         print("✓ Stargate Simulation API initialized successfully")
     except Exception as e:
         print(f"✗ Startup error: {e}")
+    scheduler.start()
+    snapshot_task = asyncio.create_task(snapshot_loop())
+    retention_task = asyncio.create_task(retention_loop()) if retention else None
+    profile_task = asyncio.create_task(profile_watch_loop()) if profile_store else None
+    try:
+        gateway_task = await start_gateway()
+    except Exception as e:
+        gateway_task = None
+        print(f"✗ Hardware gateway error: {e}")
+    publish_task = None
+    if STATE_SHM_NAME:
+        state_block["publisher"] = StatePublisher(STATE_SHM_NAME)
+        publish_task = asyncio.create_task(publish_state_loop(state_block["publisher"]))
+    webhook_task = None
+    if ALERT_WEBHOOK:
+        webhook_task = asyncio.create_task(deliver_webhook(ALERTS.subscribe_async("webhook"), ALERT_WEBHOOK))
     yield
+    if webhook_task:
+        webhook_task.cancel()
+    if publish_task:
+        publish_task.cancel()
+        try:
+            await publish_task
+        except asyncio.CancelledError:
+            pass
+        state_block["publisher"].close()
+        state_block["publisher"] = None
+    snapshot_task.cancel()
+    if retention_task:
+        retention_task.cancel()
+    if profile_task:
+        profile_task.cancel()
+    await stop_gateway(gateway_task)
+    await scheduler.stop()
+    plot_renderer.close()
+    save_session()
 
 app = FastAPI(title="Stargate Simulation API", version="1.0.0", lifespan=lifespan)
 
 print("DEBUG: main.py loaded!", flush=True)
 
+@app.middleware("http")
+async def restore_session_middleware(request: Request, call_next):
+    ensure_restored()
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -87,15 +325,15 @@ app.add_middleware(
 async def root():
     return {"message": "Stargate Simulation API", "status": "operational", "version": "uvicorn-fixed", "debug": "code-updated"}
 
-@app.get("/api/status")
-async def get_status():
-    """Get current simulation status"""
+def build_status(revision):
+    """Current simulation status snapshot"""
     dp = simulation_state["dual_portal"]
     if not dp:
-        return {"status": "not_initialized"}
+        return {"status": "not_initialized", "revision": revision}
     
     return {
         "status": "running" if simulation_state["running"] else "ready",
+        "revision": revision,
         "run_id": dp.run_id,
         "portal1": {
             "frequency": dp.portal1.freq,
@@ -123,12 +361,31 @@ async def get_status():
         }
     }
 
+status_cache = SnapshotCache(build_status, protocol.JSONCodec().encode)
+
+async def cached_response(request: Request, cache: SnapshotCache,
+                          wait_for_revision: int | None, timeout: float):
+    """Serves a cached snapshot with ETag/If-None-Match and optional long-poll"""
+    if wait_for_revision is not None:
+        await REVISION.wait_for(wait_for_revision, max(0.0, min(timeout, 60.0)))
+    body, etag = cache.get()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/status")
+async def get_status(request: Request, wait_for_revision: int | None = None, timeout: float = 30.0):
+    """Get current simulation status (supports If-None-Match and wait_for_revision long-poll)"""
+    return await cached_response(request, status_cache, wait_for_revision, timeout)
+
 @app.post("/api/initialize")
+@locked
 async def initialize_simulation(payload_volume: float = 0.1, payload_mass: float = 75.0):
     """Initialize dual portal simulation"""
     try:
         config = simulation_state["config"]
-        dp = DualPortal(
+        dp = portal_pool.acquire(
             freq1=config["resonance_frequency"],
             detune=config["detune_default"],
             power=config["energy_rate"]
@@ -144,12 +401,15 @@ async def initialize_simulation(payload_volume: float = 0.1, payload_mass: float
             floor_contact2=hw["contact_sensor_2"].read()
         )
         
-        simulation_state["dual_portal"] = dp
+        previous = simulation_state["dual_portal"]
+        simulation_state["dual_portal"] = dp.attach()
+        portal_pool.release(previous)
         return {"status": "initialized", "run_id": dp.run_id}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.post("/api/update_energy")
+@locked
 async def update_energy(dt: float = 1.0):
     """Update portal energy levels with real physics calculations"""
     dp = simulation_state["dual_portal"]
@@ -169,6 +429,7 @@ async def update_energy(dt: float = 1.0):
         return {"status": "error", "message": str(e)}
 
 @app.post("/api/form_bridge")
+@locked
 async def form_bridge(t: float = 1.0):
     """Form bridge between portals with real physics calculations"""
     dp = simulation_state["dual_portal"]
@@ -189,28 +450,33 @@ async def form_bridge(t: float = 1.0):
         return {"status": "error", "message": str(e)}
 
 @app.post("/api/transfer_payload")
-async def transfer_payload():
-    """Attempt payload transfer with safety checks"""
+async def transfer_payload(priority: int = 0, portal: int = 1):
+    """
+    Queue a payload transfer with safety checks and wait for its bridge window (rejected
+    at once, with retry_after seconds, if the battery budget cannot cover it)
+    """
     dp = simulation_state["dual_portal"]
     if not dp:
         return {"status": "error", "message": "Simulation not initialized"}
+    if portal not in (1, 2):
+        return {"status": "error", "message": "Portal must be 1 or 2"}
     
     try:
-        result = dp.transfer_payload()
-        logger = simulation_state["logger"]
-        logger.log_event('API Transfer', dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, result)
-        
-        return {
-            "status": "success",
-            "transfer_result": result,
-            "bridge_strength": dp.bridge_strength,
-            "portal1_safety": dp.portal1.safety_status,
-            "portal2_safety": dp.portal2.safety_status
-        }
+        job = scheduler.submit(priority=priority, portal=portal, max_wait=0.0)
+        if not scheduler.running:
+            async with session_lock:
+                scheduler.run_window()
+        return await job.wait()             # The dispatch loop takes session_lock for its window
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/transfer_queue")
+async def transfer_queue():
+    """Transfer queue depth, wait-time and throughput metrics"""
+    return {"status": "success", "metrics": scheduler.metrics()}
+
 @app.post("/api/update_parameters")
+@locked
 async def update_parameters(
     frequency1: float | None = None,
     frequency2: float | None = None,
@@ -267,9 +533,8 @@ async def update_parameters(
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@app.get("/api/safety_status")
-async def get_safety_status():
-    """Get comprehensive safety monitoring data"""
+def build_safety_status(revision):
+    """Comprehensive safety monitoring snapshot"""
     dp = simulation_state["dual_portal"]
     hw = simulation_state["hardware"]
     
@@ -279,6 +544,7 @@ async def get_safety_status():
     try:
         return {
             "status": "success",
+            "revision": revision,
             "overall_safety": dp.portal1.safety_status and dp.portal2.safety_status,
             "portal1": {
                 "safety_status": dp.portal1.safety_status,
@@ -306,41 +572,44 @@ async def get_safety_status():
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@app.get("/api/export/csv")
-async def export_csv():
-    """Export simulation data as CSV"""
+safety_cache = SnapshotCache(build_safety_status, protocol.JSONCodec().encode)
+
+@app.get("/api/safety_status")
+async def get_safety_status(request: Request, wait_for_revision: int | None = None, timeout: float = 30.0):
+    """Get comprehensive safety monitoring data (supports If-None-Match and wait_for_revision long-poll)"""
+    return await cached_response(request, safety_cache, wait_for_revision, timeout)
+
+def export_response(fmt, filename, run_id, start, end, gzip):
+    """
+    Streams the logged records as a download. The chunk generator is synchronous, so
+    Starlette drives it from its thread pool and other clients are served meanwhile.
+    """
     logger = simulation_state["logger"]
     if not logger:
         return {"status": "error", "message": "Logger not initialized"}
-    
+    ensure_restored()
+    logger = simulation_state["logger"]
     try:
-        csv_data = logger.export_csv()
-        return {
-            "status": "success",
-            "filename": logger.csv_filename,
-            "data": csv_data,
-            "format": "csv"
-        }
+        chunks = logger.stream(fmt, run_id, None if start is None else int(start * 1e6),
+                               None if end is None else int(end * 1e6), compress=gzip)
+        if gzip:
+            filename += ".gz"
+        return StreamingResponse(chunks, media_type="application/gzip" if gzip else EXPORT_FORMATS[fmt],
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}"'})
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/export/csv")
+async def export_csv(run_id: str | None = None, start: float | None = None, end: float | None = None,
+                     gzip: bool = False):
+    """Stream simulation data as CSV (filters: run_id, start/end epoch seconds; optional gzip)"""
+    return export_response("csv", "stargate_datalog.csv", run_id, start, end, gzip)
+
 @app.get("/api/export/json")
-async def export_json():
-    """Export audit trail as JSON"""
-    logger = simulation_state["logger"]
-    if not logger:
-        return {"status": "error", "message": "Logger not initialized"}
-    
-    try:
-        json_data = logger.export_json()
-        return {
-            "status": "success",
-            "filename": logger.json_filename,
-            "data": json_data,
-            "format": "json"
-        }
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+async def export_json(run_id: str | None = None, start: float | None = None, end: float | None = None,
+                      gzip: bool = False):
+    """Stream the audit trail as NDJSON, one record per line (same filters as the CSV export)"""
+    return export_response("ndjson", "stargate_auditlog.ndjson", run_id, start, end, gzip)
 
 @app.get("/api/logs/events")
 async def get_logged_events():
@@ -352,7 +621,7 @@ async def get_logged_events():
     try:
         return {
             "status": "success",
-            "records": logger.records,
+            "records": logger.records[:],
             "record_count": len(logger.records)
         }
     except Exception as e:
@@ -368,13 +637,130 @@ async def get_audit_trail():
     try:
         return {
             "status": "success",
-            "audit_trail": logger.records,
+            "audit_trail": logger.records[:],
             "audit_count": len(logger.records)
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/alerts")
+async def get_alerts(limit: int = 50):
+    """Active safety conditions, recent alerts and per-channel delivery latency"""
+    return {
+        "status": "success",
+        "alerts": ALERTS.summary(),
+        "recent": [event.to_dict() for event in list(ALERTS.history)[-limit:]]
+    }
+
+@app.post("/api/failsafe/reset")
+@locked
+async def reset_failsafe_block():
+    """Releases the latched failsafe once no floor or battery condition is still raised"""
+    failsafe = simulation_state["hardware"]["failsafe"]
+    try:
+        reset_failsafe(failsafe, ALERTS)
+        return {"status": "success", "failsafe_engaged": failsafe.engaged}
+    except Exception as e:
+        return {"status": "error", "message": str(e), "failsafe_engaged": failsafe.engaged}
+
+@app.get("/api/gateway/stats")
+async def get_gateway_stats():
+    """Hardware gateway connection pool, round-trip latency and mirror poll statistics"""
+    client, mirror = gateway["client"], gateway["mirror"]
+    if client is None:
+        return {"status": "error", "message": "No hardware gateway configured (set STARGATE_GATEWAY)"}
+    return {
+        "status": "success",
+        "address": GATEWAY_ADDRESS,
+        "client": client.summary(),
+        "polls": mirror.polls,
+        "poll_errors": mirror.errors,
+        "last_error": mirror.last_error
+    }
+
+@app.get("/api/state_block")
+async def get_state_block():
+    """Shared-memory state block name, layout and publication count (`STARGATE_SHM`)"""
+    publisher = state_block["publisher"]
+    if publisher is None:
+        return {"status": "error", "message": "Shared-memory publication disabled (set STARGATE_SHM)"}
+    return {"status": "success", "name": publisher.name, "size": statepub.BLOCK_SIZE,
+            "layout": statepub.LAYOUT_VERSION, "seq": publisher.seq, "publications": publisher.publications,
+            "fields": list(statepub.STATE_DTYPE.names)}
+
+@app.get("/api/pool/stats")
+async def get_pool_stats():
+    """DualPortal pool occupancy and hit statistics"""
+    return {"status": "success", "pool": portal_pool.summary()}
+
+@app.get("/api/analytics")
+async def get_analytics(run_id: str | None = None, histogram: bool = True):
+    """Streaming run statistics for one run_id (or all records), maintained as events are logged"""
+    if not run_analytics:
+        return {"status": "error", "message": "Logger not initialized"}
+    try:
+        summary = run_analytics.query(run_id, histogram)
+        if summary is None:
+            return {"status": "error", "message": f"Unknown run_id: {run_id}"}
+        return {"status": "success", "run_id": run_id, "analytics": summary}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/analytics/runs")
+async def get_run_overview():
+    """Record and transfer counts for every logged run"""
+    if not run_analytics:
+        return {"status": "error", "message": "Logger not initialized"}
+    try:
+        return {"status": "success", "runs": run_analytics.run_overview()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/audit/root")
+async def get_audit_root():
+    """Current audit Merkle root, record count and latest checkpoint"""
+    if not audit_trail:
+        return {"status": "error", "message": "Logger not initialized"}
+    try:
+        return {"status": "success", "audit": audit_trail.summary()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/audit/checkpoints")
+async def get_audit_checkpoints(verify: bool = False):
+    """Checkpointed audit roots; with verify=true, roots that no longer match the log"""
+    if not audit_trail:
+        return {"status": "error", "message": "Logger not initialized"}
+    try:
+        result = {"status": "success", "epoch": audit_trail.epoch, "checkpoints": audit_trail.checkpoints}
+        if verify:
+            result["mismatched"] = audit_trail.verify_checkpoints()
+        return result
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/audit/proof/{index}")
+async def get_inclusion_proof(index: int, size: int | None = None):
+    """Inclusion proof for one record against the root of the first `size` records"""
+    if not audit_trail:
+        return {"status": "error", "message": "Logger not initialized"}
+    try:
+        return {"status": "success", **audit_trail.inclusion(index, size)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/audit/consistency")
+async def get_consistency_proof(old_size: int, size: int | None = None):
+    """Proof that the log at old_size is a prefix of the log at size"""
+    if not audit_trail:
+        return {"status": "error", "message": "Logger not initialized"}
+    try:
+        return {"status": "success", **audit_trail.consistency(old_size, size)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 @app.post("/api/logs/clear")
+@locked
 async def clear_logs():
     """Clear all logged data"""
     logger = simulation_state["logger"]
@@ -390,6 +776,51 @@ async def clear_logs():
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/logs/history")
+async def get_log_history(start: float | None = None, end: float | None = None,
+                          resolution: str | None = None, max_points: int = 2000):
+    """Stability, energy and bridge strength history over [start, end) (epoch seconds) from the best retention tier"""
+    if not retention:
+        return {"status": "error", "message": "Logger not initialized"}
+    ensure_restored()
+    try:
+        if resolution not in (None, "raw"):
+            resolution = int(resolution)
+        result = retention.query(None if start is None else int(start * 1e6),
+                                 None if end is None else int(end * 1e6), resolution, max_points)
+        columns = {name: [None if v != v else v for v in column.tolist()]
+                   for name, column in result.pop("columns").items()}
+        columns["time"] = [t / 1e6 for t in columns["time"]]
+        return {"status": "success", **result, "columns": columns}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/logs/retention")
+async def get_retention():
+    """Raw window, compacted record count and rollup tier sizes"""
+    if not retention:
+        return {"status": "error", "message": "Logger not initialized"}
+    try:
+        return {"status": "success", "retention": retention.summary(),
+                "branch_pinned_records": branches.pinned_records(simulation_state["logger"].table)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.post("/api/logs/compact")
+@locked
+async def compact_logs():
+    """Compacts raw records older than the retention window now (instead of waiting for the next pass)"""
+    if not retention:
+        return {"status": "error", "message": "Logger not initialized"}
+    ensure_restored()
+    try:
+        dropped = retention.compact()
+        if dropped:
+            save_session()
+        return {"status": "success", "compacted": dropped, "retention": retention.summary()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 @app.post("/api/scan_portal")
 async def scan_portal(portal: int = 1):
     """Scan portal contents and return required parameters"""
@@ -435,14 +866,17 @@ async def lock_portal(portal: int = 1):
             return {"status": "error", "message": "Dual portal not initialized"}
         
         portal_obj = dual_portal.portal1 if portal == 1 else dual_portal.portal2
+        values, fired = SAFETY_RULES.check("lock", stability=portal_obj.stability, safety=portal_obj.safety_status)
+        rules = [rule.name for rule, _ in fired]
         
-        if portal_obj.safety_status and portal_obj.stability > 0.3:
+        if values["allowed"]:
             return {
                 "status": "success",
                 "portal": portal,
                 "locked": True,
                 "message": f"Portal {portal} locked and ready for transport",
-                "transport_ready": True
+                "transport_ready": True,
+                "rules": rules
             }
         else:
             return {
@@ -450,7 +884,8 @@ async def lock_portal(portal: int = 1):
                 "portal": portal,
                 "locked": False,
                 "message": f"Portal {portal} not stable enough for transport lock",
-                "transport_ready": False
+                "transport_ready": False,
+                "rules": rules
             }
     except Exception as e:
         logger = simulation_state.get("logger")
@@ -462,19 +897,26 @@ async def lock_portal(portal: int = 1):
         return {"status": "error", "message": str(e)}
 
 @app.post("/api/load_payload")
+@locked
 async def load_payload(request: dict):
     """Load payload into specified portal"""
     try:
         portal = request.get("portal", 1)
         payload_type = request.get("payload_type", "Gold")
-        payload_volume = request.get("payload_volume", 0.1)
-        payload_mass = request.get("payload_mass", 75.0)
         
         dual_portal = simulation_state["dual_portal"]
         if not dual_portal:
             return {"status": "error", "message": "Dual portal not initialized"}
         
+        # Volume or mass may be omitted and the material density supplies the other;
+        # with neither, the endpoint's long-standing 0.1 m³ / 75 kg payload is loaded
+        payload_volume, payload_mass = request.get("payload_volume"), request.get("payload_mass")
+        if payload_volume is None and payload_mass is None:
+            payload_volume, payload_mass = 0.1, 75.0
+        tuning = PAYLOADS.tune_one(payload_type, payload_volume, payload_mass, scheduler.transfer_seconds)
+        payload_volume, payload_mass = tuning["volume"], tuning["mass"]
         portal_obj = dual_portal.portal1 if portal == 1 else dual_portal.portal2
+        portal_obj.sense_payload(volume=payload_volume, mass=payload_mass, material=payload_type)
         
         portal_obj.payload = {
             "type": payload_type,
@@ -499,6 +941,12 @@ async def load_payload(request: dict):
                 "type": payload_type,
                 "volume": payload_volume,
                 "mass": payload_mass
+            },
+            "tuning": {
+                "freq": portal_obj.freq,
+                "energy_required": tuning["energy_required"],
+                "heat_load": tuning["heat_load"],
+                "sensible_heat": tuning["sensible_heat"]
             }
         }
     except Exception as e:
@@ -510,7 +958,36 @@ async def load_payload(request: dict):
                            0.0, None, f"Error loading payload: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/payloads/materials")
+async def get_payload_materials():
+    """Payload material library (density, resonance modifier, energy factor, thermal properties)"""
+    return {"status": "success", "materials": PAYLOADS.summary()}
+
+@app.post("/api/payloads/manifest")
+async def tune_manifest(request: dict):
+    """
+    Tunes a batch manifest in one vectorized call: {"payload_type": [...], "payload_volume":
+    [...], "payload_mass": [...]} (lists, or scalars applied to every payload; null or
+    missing values are derived from density). Per-payload arrays are returned with
+    "details": true.
+    """
+    try:
+        def column(key):
+            values = request.get(key)
+            if isinstance(values, list):
+                return np.array([np.nan if v is None else v for v in values], dtype=float)
+            return values
+        tuning = PAYLOADS.tune(request["payload_type"], column("payload_volume"), column("payload_mass"),
+                               scheduler.transfer_seconds)
+        result = {"status": "success", "totals": manifest_totals(tuning, PAYLOADS)}
+        if request.get("details", False):
+            result["payloads"] = {key: value.tolist() for key, value in tuning.items() if key != "code"}
+        return result
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 @app.post("/api/apply_optimal_parameters")
+@locked
 async def apply_optimal_parameters(
     frequency1: float = 32.0,
     frequency2: float = 32.0,
@@ -552,50 +1029,45 @@ async def apply_optimal_parameters(
                            0.0, None, f"Error applying optimal parameters: {e}")
         return {"status": "error", "message": str(e)}
 
+def sweep_results(state, base_freq, sweep_range, steps):
+    """
+    Bridge strength at each sweep step, following the energy trajectory of one
+    update_energy(dt=1.0) per step from the given portal state.
+    """
+    freq_step = (2 * sweep_range) / steps
+    freqs = [max(30.0, min(35.0, base_freq - sweep_range + (i * freq_step))) for i in range(steps)]
+    n = np.arange(1, steps + 1)
+    strengths = result_cache.bridge_points(
+        state["energy1"] + n * state["power1"], state["energy2"] + n * state["power2"],
+        state["stability1"], state["stability2"], state["safety1"], state["safety2"], state["detune"])
+    return [{"freq1": f, "freq2": f, "bridge_strength": float(b), "detune": state["detune"], "step": i}
+            for i, (f, b) in enumerate(zip(freqs, strengths))]
+
 @app.post("/api/parameter_sweep")
 async def parameter_sweep(base_freq: float = 32.0, sweep_range: float = 2.0, steps: int = 10):
-    """Run parameter sweep optimization for bridge strength"""
+    """Run parameter sweep optimization for bridge strength (cached by inputs; does not disturb the live run)"""
     dp = simulation_state["dual_portal"]
     if not dp:
         return {"status": "error", "message": "Simulation not initialized"}
     
     try:
-        results = []
-        freq_step = (2 * sweep_range) / steps
-        
-        for i in range(steps):
-            freq1 = base_freq - sweep_range + (i * freq_step)
-            freq2 = base_freq - sweep_range + (i * freq_step)
-            
-            freq1 = max(30.0, min(35.0, freq1))
-            freq2 = max(30.0, min(35.0, freq2))
-            
-            original_freq1 = dp.portal1.freq
-            original_freq2 = dp.portal2.freq
-            
-            dp.portal1.freq = freq1
-            dp.portal2.freq = freq2
-            
-            dp.portal1.update_energy(dt=1.0)
-            dp.portal2.update_energy(dt=1.0)
-            dp.form_bridge(t=1.0)
-            bridge_strength = dp.bridge_strength
-            
-            results.append({
-                "freq1": freq1,
-                "freq2": freq2,
-                "bridge_strength": bridge_strength,
-                "detune": dp.detune,
-                "step": i
-            })
-            
-            dp.portal1.freq = original_freq1
-            dp.portal2.freq = original_freq2
+        state = {
+            "energy1": dp.portal1.energy, "energy2": dp.portal2.energy,
+            "power1": dp.portal1.power, "power2": dp.portal2.power,
+            "stability1": dp.portal1.stability, "stability2": dp.portal2.stability,
+            "safety1": dp.portal1.safety_status, "safety2": dp.portal2.safety_status,
+            "detune": dp.detune
+        }
+        results, cached = result_cache.get_or_compute(
+            "parameter_sweep", lambda: sweep_results(state, base_freq, sweep_range, steps),
+            config=simulation_state["config"], rules=SAFETY_RULES.specs, state=state,
+            grid={"base_freq": base_freq, "sweep_range": sweep_range, "steps": steps}, seed=None)
         
         return {
             "status": "success",
             "results": results,
             "best_result": max(results, key=lambda x: x["bridge_strength"]),
+            "cached": cached,
             "sweep_parameters": {
                 "base_freq": base_freq,
                 "sweep_range": sweep_range,
@@ -605,86 +1077,399 @@ async def parameter_sweep(base_freq: float = 32.0, sweep_range: float = 2.0, ste
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# Sample count (Sobol base samples / Morris trajectories) and process-pool bounds per request
+SENSITIVITY_MAX_SAMPLES = int(os.environ.get("STARGATE_SENSITIVITY_MAX_SAMPLES", "65536"))
+SENSITIVITY_MAX_WORKERS = int(os.environ.get("STARGATE_SENSITIVITY_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+@app.post("/api/sensitivity")
+async def sensitivity_analysis(method: str = "sobol", output: str = "bridge_strength", samples: int = 4096,
+                               parameters: str | None = None, seed: int = 0, workers: int = 1):
+    """
+    Ranked input importances for bridge strength / transfer success (cached by inputs).
+    samples and workers are clamped to [16, SENSITIVITY_MAX_SAMPLES] and [1, SENSITIVITY_MAX_WORKERS].
+    """
+    try:
+        samples = max(16, min(samples, SENSITIVITY_MAX_SAMPLES))
+        workers = max(1, min(workers, SENSITIVITY_MAX_WORKERS))
+        names = parameters.split(",") if parameters else None
+        options = {"parameters": names, "output": output}
+        pooled = {}
+        if method == "sobol":
+            options.update(samples=samples, seed=seed)
+            pooled["workers"] = workers
+        elif method == "morris":
+            options.update(trajectories=samples, seed=seed)
+            pooled["workers"] = workers
+        result, cached = await asyncio.to_thread(
+            result_cache.get_or_compute, "sensitivity",
+            lambda: sensitivity.analyze(method, **options, **pooled),
+            config=simulation_state["config"], rules=SAFETY_RULES.specs, method=method, options=options)
+        return {"status": "success", "cached": cached, "workers": workers, **result}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def plot_data(kind, run_id, limit):
+    """Chart inputs for a plot kind from the live run and the record table"""
+    dp = simulation_state["dual_portal"]
+    if kind in ("resonance", "sweep_heatmap"):
+        if not dp:
+            raise ValueError("Simulation not initialized")
+        return plots.resonance_data(dp) if kind == "resonance" else plots.heatmap_data(dp)
+    table = simulation_state["logger"].table
+    if kind == "bridge_history":
+        return plots.history_data(table, run_id, limit)
+    return plots.sensor_data(table, run_id, limit)
+
+@app.get("/api/plots/{kind}")
+async def get_plot(request: Request, kind: str, fmt: str = "png", run_id: str | None = None,
+                   limit: int = 2000, width: float = 8.0, height: float = 4.5):
+    """
+    Server-rendered chart (ETag revalidation; Content-Location names the immutable image).
+    width/height (inches) are clamped to [1, PLOT_MAX_INCHES] and limit to [1, PLOT_MAX_POINTS].
+    """
+    try:
+        width = max(1.0, min(width, PLOT_MAX_INCHES))
+        height = max(1.0, min(height, PLOT_MAX_INCHES))
+        limit = max(1, min(limit, PLOT_MAX_POINTS))
+        data = plot_data(kind, run_id, limit)
+        options = {"width": width, "height": height}
+        key = plot_renderer.prepare(kind, fmt, data, **options)
+        etag = f'"{key[:32]}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache",
+                   "Content-Location": f"/api/plots/image/{key}"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        body, media_type, _, hit = await plot_renderer.render(kind, fmt, data, **options)
+        headers["X-Plot-Cache"] = "hit" if hit else "miss"
+        return Response(content=body, media_type=media_type, headers=headers)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/plots/image/{key}")
+async def get_plot_image(key: str):
+    """A previously rendered chart by content hash (cacheable indefinitely)"""
+    image = plot_renderer.get(key)
+    if image is None:
+        return Response(status_code=404)
+    return Response(content=image[0], media_type=image[1],
+                    headers={"ETag": f'"{key[:32]}"', "Cache-Control": "public, max-age=31536000, immutable"})
+
+@app.get("/api/plots")
+async def plot_stats():
+    """Plot renderer cache and timing statistics"""
+    return {"status": "success", "kinds": plots.PLOT_KINDS, "formats": list(plots.FORMATS),
+            "renderer": plot_renderer.summary()}
+
+@app.get("/api/config")
+async def get_config():
+    """Active compiled config profile and the available profiles"""
+    if profile_store is None:
+        return {"status": "error", "message": "Config profiles not loaded"}
+    return {"status": "success", "config": profile_store.active.to_dict(), **profile_store.summary()}
+
+@app.post("/api/config/profile")
+@locked
+async def activate_profile(name: str):
+    """Switches the active config profile (applies to new runs)"""
+    try:
+        simulation_state["config"] = profile_store.activate(name)
+        REVISION.bump()
+        return {"status": "success", "active": name, "config": simulation_state["config"].to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.post("/api/config/validate")
+async def validate_configs(request: dict):
+    """
+    Validates candidate configs in one vectorized pass: {"candidates": {field: [values]}}
+    (unlisted fields take the active value). Returns the per-row valid mask and, per field,
+    the violation count and first offending rows.
+    """
+    try:
+        valid, violations, fields = validate_batch(request.get("candidates", {}))
+        return {"status": "success", "rows": len(valid), "valid_count": int(valid.sum()),
+                "valid": valid.tolist(),
+                "violations": describe_violations(violations, fields, request.get("limit", 20))}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/safety/rules")
+async def get_safety_rules():
+    """Active safety rules by stage, the rule file and its reload status"""
+    return {"status": "success", "safety_rules": SAFETY_RULES.summary()}
+
+@app.post("/api/safety/evaluate")
+async def evaluate_safety(request: dict):
+    """
+    Evaluates one stage's safety rules over many portal states in one vectorized pass:
+    {"stage": "floor", "portals": {field: [values] or value}}. Returns the fields after
+    the rules' effects, the first rule that fired for each portal and per-rule counts.
+    """
+    try:
+        stage = request.get("stage", "floor")
+        result = SAFETY_RULES.evaluate(stage, **request.get("portals", {}))
+        names = SAFETY_RULES.rule_names(stage)
+        fired = result.pop("fired").reshape(-1, len(names))
+        first = result.pop("rule").ravel()
+        return {"status": "success", "stage": stage, "portals": len(first),
+                "rule": [names[j] if j >= 0 else None for j in first.tolist()],
+                "fired_counts": dict(zip(names, fired.sum(axis=0).tolist())),
+                "values": {field: np.ravel(values).tolist() for field, values in result.items()
+                           if field in STAGE_FIELDS[stage]}}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Study result cache hit/miss statistics"""
+    return {"status": "success", "cache": result_cache.summary()}
+
+BATCH_OPERATIONS = {
+    # The run_batch caller already holds session_lock: call the undecorated endpoints
+    "initialize": lambda **p: initialize_simulation.__wrapped__(**p),
+    "load_payload": lambda **p: load_payload.__wrapped__(p),
+    "update_energy": lambda **p: update_energy.__wrapped__(**p),
+    "form_bridge": lambda **p: form_bridge.__wrapped__(**p),
+    "update_parameters": lambda **p: update_parameters.__wrapped__(**p),
+    "apply_optimal_parameters": lambda **p: apply_optimal_parameters.__wrapped__(**p),
+    "scan_portal": lambda **p: scan_portal(**p),
+    "lock_portal": lambda **p: lock_portal(**p),
+}
+
+def capture_session():
+    """Copies portal, bridge and hardware state so a failed batch can be rolled back"""
+    dp = simulation_state["dual_portal"]
+    return (dp, dual_portal_state(dp) if dp else None,
+            {name: object_state(obj) for name, obj in simulation_state["hardware"].items()})
+
+def rollback_session(saved):
+    """Restores captured state in place, keeping existing object references valid"""
+    dp, dp_state, hw_state = saved
+    current = simulation_state["dual_portal"]
+    if current is not dp:
+        portal_pool.release(current)      # Pair initialized inside the failed batch
+    if dp is not None:
+        portal_pool.claim(dp)
+        dp_state = dict(dp_state)
+        dp.portal1.__dict__.update(dp_state.pop("portal1"))
+        dp.portal2.__dict__.update(dp_state.pop("portal2"))
+        dp_state["portal1"], dp_state["portal2"] = dp.portal1, dp.portal2
+        dp.__dict__.update(dp_state)
+        dp.attach()
+    simulation_state["dual_portal"] = dp
+    for name, attrs in hw_state.items():
+        simulation_state["hardware"][name].__dict__.update(attrs)
+    REVISION.bump()
+
+def batch_transfer(priority: int = 0, portal: int = 1):
+    """Transfer inside a batch: dispatched in an immediate bridge window, without yielding"""
+    if not simulation_state["dual_portal"]:
+        return {"status": "error", "message": "Simulation not initialized"}
+    job = scheduler.submit(priority=priority, portal=portal, max_wait=0.0)
+    scheduler.run_window()
+    if job.result is None:
+        return {"status": "error", "message": "Transfer deferred: portal window full", "job_id": job.job_id}
+    return job.result
+
+@app.post("/api/branches")
+async def fork_branches(request: dict):
+    """
+    Forks what-if branches from the live session (or from branch "from"): {"label": ...,
+    "count": n}. Branches share the logged history copy-on-write and never touch live state.
+    """
+    ensure_restored()
+    try:
+        count = int(request.get("count", 1))
+        label = request.get("label")
+        source = request.get("from")
+        created = []
+        for i in range(count):
+            name = f"{label} {i + 1}" if label and count > 1 else label
+            if source:
+                branch = branches.fork_branch(source, name)
+            else:
+                branch = branches.fork(simulation_state["dual_portal"], simulation_state["hardware"],
+                                       simulation_state["logger"], name)
+            created.append(branch.summary())
+        return {"status": "success", "branches": created}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/branches")
+async def list_branches():
+    """All open what-if branches with their current metrics"""
+    return {"status": "success", **branches.summary(),
+            "branches": [branch.summary() for branch in branches.branches.values()]}
+
+@app.get("/api/branches/compare")
+async def compare_branches(ids: str | None = None):
+    """Branch metrics side by side, with differences from the live session"""
+    try:
+        dp = simulation_state["dual_portal"]
+        baseline = session_metrics(dp, simulation_state["hardware"]) if dp else None
+        return {"status": "success", **branches.compare(ids.split(",") if ids else None, baseline)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/api/branches/{branch_id}")
+async def get_branch(branch_id: str):
+    """One branch's metrics plus its full portal and bridge status report"""
+    try:
+        branch = branches.get(branch_id)
+        return {"status": "success", "branch": branch.summary(), "report": branch.dual_portal.full_status()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.post("/api/branches/{branch_id}/apply")
+async def apply_to_branch(branch_id: str, request: dict):
+    """
+    Runs operations on one branch: {"operations": [{"op": "set_detune", "params": {"detune": 0.2}}, ...]}
+    (update_energy, form_bridge, transfer_payload, set_detune, set_power, floor_sensor,
+    sense_payload). Stops at the first failing operation.
+    """
+    try:
+        branch = branches.get(branch_id)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    results = []
+    for operation in request.get("operations", []):
+        name = operation.get("op")
+        try:
+            results.append({"op": name, "result": branch.apply(name, **(operation.get("params") or {}))})
+        except Exception as e:
+            results.append({"op": name, "result": {"status": "error", "message": str(e)}})
+            return {"status": "error", "failed_at": len(results) - 1, "results": results, "branch": branch.summary()}
+    return {"status": "success", "results": results, "branch": branch.summary()}
+
+@app.post("/api/branches/{branch_id}/discard")
+async def discard_branch(branch_id: str):
+    """Discards a branch (its shared history stays with the live session)"""
+    try:
+        branches.discard(branch_id)
+        return {"status": "success", "discarded": branch_id, **branches.summary()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.post("/api/batch")
+async def run_batch(request: dict):
+    """
+    Execute an ordered list of operations atomically under the session lock.
+    Body: {"operations": [{"op": "initialize", "params": {...}}, ...], "atomic": true}
+    Stops at the first failing operation; with atomic (default) portal, bridge and
+    hardware state are rolled back (logged events are kept for audit).
+    Returns every result plus one final status snapshot.
+    """
+    operations = request.get("operations", [])
+    atomic = request.get("atomic", True)
+    # Every mutating endpoint and background loop takes the same lock, so nothing
+    # interleaves with the batch (transfers use an immediate window rather than the loop).
+    async with session_lock:
+        saved = capture_session() if atomic else None
+        results = []
+        failed_at = None
+        for index, operation in enumerate(operations):
+            name = operation.get("op")
+            params = operation.get("params") or {}
+            try:
+                if name == "transfer_payload":
+                    result = batch_transfer(**params)
+                elif name in BATCH_OPERATIONS:
+                    result = await BATCH_OPERATIONS[name](**params)
+                else:
+                    result = {"status": "error", "message": f"Unknown operation: {name}"}
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            results.append({"op": name, "result": result})
+            if result.get("status") == "error":
+                failed_at = index
+                break
+        rolled_back = failed_at is not None and atomic
+        if rolled_back:
+            rollback_session(saved)
+        return {
+            "status": "success" if failed_at is None else "error",
+            "results": results,
+            "failed_at": failed_at,
+            "rolled_back": rolled_back,
+            "snapshot": build_status(REVISION.value)
+        }
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """Main WebSocket endpoint for real-time simulation data streaming"""
-    await manager.connect(websocket)
+    ensure_restored()
+    codec, subprotocol = protocol.negotiate(websocket)
+    await manager.connect(websocket, subprotocol)
+    # Safety alerts are pushed as soon as they are published, ahead of the next telemetry tick
+    alerts = ALERTS.subscribe_async("ws")
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
     try:
         while True:
             try:
-                dual_portal = simulation_state.get("dual_portal")
-                if dual_portal:
-                    dual_portal.portal1.update_energy(dt=1.0)
-                    dual_portal.portal2.update_energy(dt=1.0)
-                    
-                    simulation_data = {
-                        "status": "running",
-                        "run_id": dual_portal.run_id,
-                        "portal1": {
-                            "freq": dual_portal.portal1.freq,
-                            "stability": dual_portal.portal1.stability,
-                            "power": dual_portal.portal1.power,
-                            "energy": dual_portal.portal1.energy,
-                            "floor_temp": dual_portal.portal1.floor_temp,
-                            "floor_contact": dual_portal.portal1.floor_contact,
-                            "safety_status": dual_portal.portal1.safety_status,
-                            "payload_volume": dual_portal.portal1.payload_volume,
-                            "payload_mass": dual_portal.portal1.payload_mass,
-                            "status_log": dual_portal.portal1.report_status()
-                        },
-                        "portal2": {
-                            "freq": dual_portal.portal2.freq,
-                            "stability": dual_portal.portal2.stability,
-                            "power": dual_portal.portal2.power,
-                            "energy": dual_portal.portal2.energy,
-                            "floor_temp": dual_portal.portal2.floor_temp,
-                            "floor_contact": dual_portal.portal2.floor_contact,
-                            "safety_status": dual_portal.portal2.safety_status,
-                            "payload_volume": dual_portal.portal2.payload_volume,
-                            "payload_mass": dual_portal.portal2.payload_mass,
-                            "status_log": dual_portal.portal2.report_status()
-                        },
-                        "bridge_strength": dual_portal.bridge_strength,
-                        "transfer_energy": dual_portal.transfer_energy,
-                        "detune": dual_portal.detune,
-                        "status_log": dual_portal.status_log
-                    }
-                    await websocket.send_text(json.dumps(simulation_data))
-                else:
-                    default_data = {
-                        "status": "disconnected",
-                        "portal1": None,
-                        "portal2": None,
-                        "bridge_strength": 0.0,
-                        "transfer_energy": 0.0,
-                        "detune": 0.0
-                    }
-                    await websocket.send_text(json.dumps(default_data))
-                
-                await asyncio.sleep(1.0)
+                event = await alerts.get(timeout=max(0.0, next_tick - loop.time()))
+                if event is not None:
+                    await protocol.send(websocket, codec, codec.encode(event.to_dict()))
+                    alerts.delivered(event)
+                    continue
+                async with session_lock:
+                    dual_portal = simulation_state.get("dual_portal")
+                    if dual_portal:
+                        dual_portal.portal1.update_energy(dt=1.0)
+                        dual_portal.portal2.update_energy(dt=1.0)
+                    snapshot = codec.encode_snapshot(dual_portal)
+                await protocol.send(websocket, codec, snapshot)
+                next_tick = max(next_tick + 1.0, loop.time())
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 print(f"WebSocket loop error: {e}")
                 await asyncio.sleep(1.0)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
+    finally:
+        alerts.close()
 
 @app.websocket("/ws/logs")
 async def websocket_logs_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time log streaming"""
-    await manager.connect(websocket)
+    ensure_restored()
+    codec, subprotocol = protocol.negotiate(websocket)
+    await manager.connect(websocket, subprotocol)
     try:
         while True:
             logger = simulation_state["logger"]
             if logger:
                 log_data = {
                     "timestamp": asyncio.get_event_loop().time(),
-                    "records": logger.records[-10:] if len(logger.records) > 10 else logger.records,
+                    "records": logger.records[-10:],
                     "record_count": len(logger.records)
                 }
-                await websocket.send_text(json.dumps(log_data))
+                await protocol.send(websocket, codec, codec.encode(log_data))
             await asyncio.sleep(1.0)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
+@app.websocket("/ws/alerts")
+async def websocket_alerts_endpoint(websocket: WebSocket):
+    """Dedicated safety alert channel: events pushed on publish, critical first; heartbeat when idle"""
+    ensure_restored()
+    codec, subprotocol = protocol.negotiate(websocket)
+    await manager.connect(websocket, subprotocol)
+    alerts = ALERTS.subscribe_async("ws_alerts")
+    try:
+        await protocol.send(websocket, codec, codec.encode({"type": "alert_state", **ALERTS.summary()}))
+        while True:
+            event = await alerts.get(timeout=15.0)
+            if event is None:
+                await protocol.send(websocket, codec, codec.encode({"type": "heartbeat"}))
+                continue
+            await protocol.send(websocket, codec, codec.encode(event.to_dict()))
+            alerts.delivered(event)
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
+    finally:
+        alerts.close()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,208 @@
+"""
+Version 2.6 — Multi-Portal Network & Transfer Routing Module
+Dual Portal Stargate Simulation System
+
+Defines the PortalNetwork class: N portals held as NumPy state arrays, directed links
+between them, and bridge strengths for every link computed in one batched pass of the
+form_bridge formula. When a portal's stability, energy, frequency or safety changes only
+the links incident to it are recomputed. Transfers are routed over the graph on the most
+reliable multi-hop path (maximum product of hop strengths) using only links strong
+enough for a transfer: by default, links the "transfer" stage safety rules allow, so
+routing follows the same thresholds as DualPortal.transfer_payload.
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from config import SimulationConfig
+from dualportal import bridge_strength
+from safetyrules import SAFETY_RULES
+
+PORTAL_FIELDS = ("freq", "power", "stability", "energy", "safety")
+
+class PortalNetwork:
+    """
+    Network of portals and directed links with incrementally maintained bridge strengths.
+    """
+    def __init__(self):
+        self.freq = np.zeros(0)
+        self.power = np.zeros(0)
+        self.stability = np.zeros(0)
+        self.energy = np.zeros(0)
+        self.safety = np.zeros(0, dtype=bool)
+        self.src = np.zeros(0, dtype=np.int64)
+        self.dst = np.zeros(0, dtype=np.int64)
+        self.strength = np.zeros(0)
+        self._incident = None          # CSR (offsets, link ids) of links per portal
+        self._graph = None             # Cached routing graph, rebuilt when strengths change
+        self._graph_usable = None      # Link mask the cached graph was built from
+        self.recomputed_links = 0      # Link evaluations since construction (for profiling)
+
+    @classmethod
+    def from_portals(cls, portals):
+        """Builds a network whose portal states are taken from Portal objects."""
+        net = cls()
+        net.add_portals(len(portals),
+                        freq=[p.freq for p in portals], power=[p.power for p in portals],
+                        stability=[p.stability for p in portals], energy=[p.energy for p in portals],
+                        safety=[p.safety_status for p in portals])
+        return net
+
+    def __len__(self):
+        return len(self.freq)
+
+    def add_portals(self, n, freq=None, power=None, stability=1.0, energy=0.0, safety=True):
+        """Appends n portals (values broadcast; freq/power default to the configured values); returns their indices."""
+        freq = SimulationConfig["resonance_frequency"] if freq is None else freq
+        power = SimulationConfig["energy_rate"] if power is None else power
+        start = len(self)
+        self.freq = np.concatenate([self.freq, np.broadcast_to(np.asarray(freq, dtype=float), (n,))])
+        self.power = np.concatenate([self.power, np.broadcast_to(np.asarray(power, dtype=float), (n,))])
+        self.stability = np.concatenate([self.stability, np.broadcast_to(np.asarray(stability, dtype=float), (n,))])
+        self.energy = np.concatenate([self.energy, np.broadcast_to(np.asarray(energy, dtype=float), (n,))])
+        self.safety = np.concatenate([self.safety, np.broadcast_to(np.asarray(safety, dtype=bool), (n,))])
+        self._incident = None
+        return np.arange(start, start + n)
+
+    def add_links(self, src, dst, bidirectional=True):
+        """Adds links src[k] -> dst[k] (and the reverse if bidirectional) and scores them."""
+        src = np.atleast_1d(np.asarray(src, dtype=np.int64))
+        dst = np.atleast_1d(np.asarray(dst, dtype=np.int64))
+        if bidirectional:
+            src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+        if len(src) and (src.max() >= len(self) or dst.max() >= len(self) or np.any(src == dst)):
+            raise ValueError("Links must join two distinct existing portals.")
+        first = len(self.src)
+        self.src = np.concatenate([self.src, src])
+        self.dst = np.concatenate([self.dst, dst])
+        self.strength = np.concatenate([self.strength, np.zeros(len(src))])
+        self._incident = None
+        self._recompute(np.arange(first, len(self.src)))
+
+    def _recompute(self, links):
+        """Re-evaluates the bridge formula for a subset of link ids in one batch."""
+        s, d = self.src[links], self.dst[links]
+        self.strength[links] = bridge_strength(
+            self.energy[s], self.energy[d], self.stability[s], self.stability[d],
+            self.safety[s], self.safety[d], self.freq[d] - self.freq[s])
+        self.recomputed_links += len(links)
+        self._graph = None
+
+    def recompute_all(self):
+        """Scores every link from scratch."""
+        self._recompute(np.arange(len(self.src)))
+
+    def _incident_links(self, portals):
+        """Ids of all links touching any of the given portals."""
+        if self._incident is None:
+            ends = np.concatenate([self.src, self.dst])
+            links = np.concatenate([np.arange(len(self.src))] * 2)
+            order = np.argsort(ends, kind="stable")
+            offsets = np.searchsorted(ends[order], np.arange(len(self) + 1))
+            self._incident = (offsets, links[order])
+        offsets, ids = self._incident
+        portals = np.atleast_1d(portals)
+        if len(portals) == 1:
+            return ids[offsets[portals[0]]:offsets[portals[0] + 1]]
+        return np.unique(np.concatenate([ids[offsets[p]:offsets[p + 1]] for p in portals]))
+
+    def update_portals(self, portals, **fields):
+        """
+        Sets state fields (freq, power, stability, energy, safety) for one or more portals and
+        recomputes only the links incident to them.
+        """
+        portals = np.atleast_1d(np.asarray(portals, dtype=np.int64))
+        for name, value in fields.items():
+            if name not in PORTAL_FIELDS:
+                raise ValueError(f"Unknown portal field: {name}")
+            getattr(self, name)[portals] = value
+        if fields.keys() - {"power"}:
+            self._recompute(self._incident_links(portals))
+
+    def update_energy(self, portals=None, dt=1.0):
+        """Accumulates power * dt into the energy of the given (default: all) portals."""
+        portals = np.arange(len(self)) if portals is None else np.atleast_1d(portals)
+        self.update_portals(portals, energy=self.energy[portals] + self.power[portals] * dt)
+
+    def sync_portal(self, index, portal):
+        """Copies a live Portal object's state into the network slot `index`."""
+        self.update_portals(index, freq=portal.freq, power=portal.power, stability=portal.stability,
+                            energy=portal.energy, safety=portal.safety_status)
+
+    def _usable(self, min_strength):
+        """Links a transfer may cross: strength >= min_strength, or those the transfer rules allow."""
+        if min_strength is None:
+            return SAFETY_RULES.evaluate("transfer", strength=self.strength)["allowed"]
+        return self.strength >= min_strength
+
+    def _routing_graph(self, min_strength):
+        usable = self._usable(min_strength)
+        if self._graph is None or not np.array_equal(usable, self._graph_usable):
+            s, d, w = self.src[usable], self.dst[usable], -np.log(self.strength[usable])
+            # Keep only the strongest of any parallel links, and nudge zero costs so they
+            # remain explicit edges in the sparse graph.
+            order = np.lexsort((w, d, s))
+            s, d, w = s[order], d[order], w[order]
+            keep = np.ones(len(s), dtype=bool)
+            keep[1:] = (s[1:] != s[:-1]) | (d[1:] != d[:-1])
+            self._graph = csr_matrix((w[keep] + 1e-12, (s[keep], d[keep])), shape=(len(self), len(self)))
+            self._graph_usable = usable
+        return self._graph
+
+    def route(self, source, target, min_strength=None):
+        """
+        Most reliable path from source to target using links with strength >= min_strength
+        (default: links the "transfer" safety rules allow).
+        Returns (path, end-to-end strength) where strength is the product over hops,
+        or (None, 0.0) if the target is unreachable.
+        """
+        graph = self._routing_graph(min_strength)
+        dist, pred = dijkstra(graph, indices=source, return_predecessors=True)
+        if not np.isfinite(dist[target]):
+            return None, 0.0
+        path = [int(target)]
+        while path[-1] != source:
+            path.append(int(pred[path[-1]]))
+        path.reverse()
+        return path, float(np.exp(-dist[target] + 1e-12 * (len(path) - 1)))
+
+    def reachable_strengths(self, source, min_strength=None):
+        """End-to-end route strength from source to every portal (0 where unreachable)."""
+        dist = dijkstra(self._routing_graph(min_strength), indices=source)
+        return np.where(np.isfinite(dist), np.exp(-dist), 0.0)
+
+    def transfer(self, source, target, min_strength=None):
+        """
+        Routes a payload transfer and reports the path, hop strengths and outcome.
+        Every hop must individually be allowed by the transfer rules (or meet min_strength if
+        given), as in DualPortal.transfer_payload.
+        """
+        path, strength = self.route(source, target, min_strength)
+        if path is None:
+            return {"success": False, "path": None, "hops": 0, "hop_strengths": [], "route_strength": 0.0}
+        graph = self._routing_graph(min_strength)
+        hops = [float(np.exp(1e-12 - graph[a, b])) for a, b in zip(path[:-1], path[1:])]
+        return {"success": True, "path": path, "hops": len(path) - 1,
+                "hop_strengths": hops, "route_strength": strength}
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(7)
+    n, degree = 5000, 6
+    net = PortalNetwork()
+    net.add_portals(n, freq=32.0 + rng.uniform(-0.1, 0.1, n), energy=27000.0)
+    src = np.repeat(np.arange(n), degree // 2)
+    dst = (src + rng.integers(1, n, len(src))) % n
+    start = time.perf_counter()
+    net.add_links(src, dst)
+    print(f"Scored {len(net.src)} links for {n} portals in {time.perf_counter() - start:.4f} s")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        net.update_portals(int(rng.integers(n)), stability=float(rng.uniform(0.85, 1.0)))
+    print(f"1000 incremental stability updates in {time.perf_counter() - start:.4f} s")
+
+    start = time.perf_counter()
+    result = net.transfer(0, n - 1)
+    print(f"Routed transfer in {time.perf_counter() - start:.4f} s:", result)
@@ -0,0 +1,164 @@
+"""
+Version 4.0 — Material Payload Library Module
+Dual Portal Stargate Simulation System
+
+Library of payload materials with the properties the portals need for tuning: density,
+resonance modifier, transfer energy factor, heat released onto the floor and specific
+heat. Materials are held as NumPy columns with an indexed name lookup, so a manifest of
+thousands of mixed payloads resolves to material codes once and is tuned in one
+vectorized call: resonance frequency (the Portal.sense_payload cube-root law scaled by
+the material's modifier), transfer energy requirement and thermal impact on the LN2
+floor. Volume is derived from mass and density when a payload only gives its mass.
+"""
+
+import numpy as np
+
+from config import SimulationConfig
+
+REFERENCE_MASS = 75.0            # kg, the default human payload energy requirements are scaled from
+AMBIENT_TEMP = 20.0              # °C, payload temperature when loaded
+
+MATERIAL_FIELDS = ("density", "resonance_modifier", "energy_factor", "heat_w_per_kg", "specific_heat")
+
+# name: (density kg/m³, resonance modifier, energy factor, heat released W/kg, specific heat J/(kg·K))
+DEFAULT_MATERIALS = {
+    "Human":    (985.0,   1.00, 1.00, 100.0 / 75.0, 3500.0),   # Matches thermal.BODY_HEAT_LOAD at 75 kg
+    "Water":    (1000.0,  1.00, 0.95, 0.0, 4186.0),
+    "Gold":     (19300.0, 0.92, 1.35, 0.0, 129.0),
+    "Lead":     (11340.0, 0.94, 1.30, 0.0, 128.0),
+    "Copper":   (8960.0,  0.95, 1.20, 0.0, 385.0),
+    "Steel":    (7850.0,  0.96, 1.15, 0.0, 490.0),
+    "Titanium": (4500.0,  0.97, 1.10, 0.0, 523.0),
+    "Ceramic":  (3900.0,  0.98, 1.05, 0.0, 880.0),
+    "Aluminum": (2700.0,  0.98, 1.05, 0.0, 897.0),
+    "Silicon":  (2330.0,  0.99, 1.05, 0.0, 705.0),
+    "Polymer":  (950.0,   1.01, 0.90, 0.0, 1900.0),
+}
+
+class MaterialLibrary:
+    """Material property columns with an indexed name -> code lookup."""
+    def __init__(self, materials=None):
+        self.names = []
+        self._codes = {}
+        self._columns = {field: np.empty(0) for field in MATERIAL_FIELDS}
+        for name, properties in (materials or DEFAULT_MATERIALS).items():
+            self.register(name, *properties)
+
+    def register(self, name, density, resonance_modifier=1.0, energy_factor=1.0,
+                 heat_w_per_kg=0.0, specific_heat=1000.0):
+        """Adds or replaces a material; returns its code."""
+        if density <= 0 or resonance_modifier <= 0 or energy_factor <= 0:
+            raise ValueError(f"Material {name!r}: density, resonance modifier and energy factor must be positive")
+        values = dict(zip(MATERIAL_FIELDS, (density, resonance_modifier, energy_factor, heat_w_per_kg, specific_heat)))
+        code = self._codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(name)
+            self._codes[name] = code
+            for field in MATERIAL_FIELDS:
+                self._columns[field] = np.append(self._columns[field], float(values[field]))
+        else:
+            for field in MATERIAL_FIELDS:
+                self._columns[field][code] = float(values[field])
+        return code
+
+    def code(self, name):
+        try:
+            return self._codes[name]
+        except KeyError:
+            raise ValueError(f"Unknown payload material {name!r}; available: {', '.join(self.names)}") from None
+
+    def codes(self, names):
+        """Material codes for an array of names (each distinct name is looked up once)."""
+        unique, inverse = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+        return np.array([self.code(str(name)) for name in unique], dtype=np.intp)[inverse]
+
+    def properties(self, name):
+        code = self.code(name)
+        return {field: float(self._columns[field][code]) for field in MATERIAL_FIELDS}
+
+    def tune(self, materials, volume=None, mass=None, transfer_seconds=1.0):
+        """
+        Tuning for arrays of payloads (materials as names or codes; volume/mass arrays,
+        scalars or None, NaN meaning not given). Mass defaults to the volume times density,
+        volume to mass over density; with neither, the configured subject volume is used.
+        Given volumes and masses must be positive and finite.
+        Returns a dict of arrays: code, volume, mass, freq (Hz), energy_required (J: the
+        configured energy rate, scaled by mass and material, over a transfer_seconds bridge
+        hold), heat_load (W) and sensible_heat (J to cool from ambient to the floor threshold).
+        """
+        materials = np.atleast_1d(materials)
+        if materials.dtype.kind in "iu":
+            code = materials.astype(np.intp)
+            bad = (code < 0) | (code >= len(self.names))
+            if bad.any():
+                raise ValueError(f"Material codes must be in 0..{len(self.names) - 1}; got {code[bad][:5].tolist()}")
+        else:
+            code = self.codes(materials)
+        n = len(code)
+        density = self._columns["density"][code]
+        volume = np.broadcast_to(np.nan if volume is None else np.asarray(volume, dtype=float), (n,))
+        mass = np.broadcast_to(np.nan if mass is None else np.asarray(mass, dtype=float), (n,))
+        for label, values in (("volume", volume), ("mass", mass)):
+            bad = ~np.isnan(values) & ~((values > 0) & np.isfinite(values))
+            if bad.any():
+                raise ValueError(f"Payload {label} must be positive; rows {np.flatnonzero(bad)[:5].tolist()} "
+                                 f"are {values[bad][:5].tolist()}")
+        volume = np.where(np.isnan(volume), mass / density, volume)
+        volume = np.where(np.isnan(volume), SimulationConfig["subject_volume"], volume)
+        mass = np.where(np.isnan(mass), volume * density, mass)
+        f0 = SimulationConfig["resonance_frequency"]
+        freq = np.minimum(f0, f0 / np.cbrt(volume)) * self._columns["resonance_modifier"][code]
+        power = SimulationConfig["energy_rate"] * (mass / REFERENCE_MASS) * self._columns["energy_factor"][code]
+        energy = power * transfer_seconds
+        heat = mass * self._columns["heat_w_per_kg"][code]
+        sensible = mass * self._columns["specific_heat"][code] * (AMBIENT_TEMP - SimulationConfig["floor_temp_threshold"])
+        return {"code": code, "volume": volume, "mass": mass, "freq": freq,
+                "energy_required": energy, "heat_load": heat, "sensible_heat": sensible}
+
+    def tune_one(self, material, volume=None, mass=None, transfer_seconds=1.0):
+        """tune() for a single payload, as Python floats."""
+        result = self.tune([material], np.nan if volume is None else volume, np.nan if mass is None else mass,
+                           transfer_seconds)
+        return {key: (int(value[0]) if key == "code" else float(value[0])) for key, value in result.items()}
+
+    def summary(self):
+        return {name: self.properties(name) for name in self.names}
+
+PAYLOADS = MaterialLibrary()
+
+def manifest_totals(tuning, library=PAYLOADS):
+    """Aggregate energy and thermal load of a manifest tuned by `library`, plus per-material counts."""
+    counts = np.bincount(tuning["code"], minlength=len(library.names))
+    return {"payloads": int(len(tuning["code"])),
+            "total_mass": float(tuning["mass"].sum()),
+            "total_energy_required": float(tuning["energy_required"].sum()),
+            "total_heat_load": float(tuning["heat_load"].sum()),
+            "total_sensible_heat": float(tuning["sensible_heat"].sum()),
+            "freq_range": [float(tuning["freq"].min()), float(tuning["freq"].max())] if len(tuning["freq"]) else None,
+            "materials": {library.names[i]: int(c) for i, c in enumerate(counts) if c}}
+
+if __name__ == "__main__":
+    import time
+    from portal import Portal
+
+    portal = Portal()
+    portal.sense_payload(volume=0.2, mass=60, material="Gold")
+    print("Portal tuned for 0.2 m³ of gold:", round(portal.freq, 4), "Hz;",
+          PAYLOADS.tune_one("Gold", volume=0.2, mass=60))
+
+    n = 100_000
+    rng = np.random.default_rng(0)
+    names = rng.choice(PAYLOADS.names, n)
+    mass = rng.uniform(1, 200, n)
+    start = time.perf_counter()
+    tuning = PAYLOADS.tune(names, mass=mass)
+    vectorized = time.perf_counter() - start
+    start = time.perf_counter()
+    for name, m in zip(names[:5000], mass[:5000]):
+        props = PAYLOADS.properties(name)
+        volume = m / props["density"]
+        freq = min(32.0, 32.0 / volume ** (1 / 3)) * props["resonance_modifier"]
+    per_item = (time.perf_counter() - start) / 5000 * n
+    print(f"{n:,} mixed payloads: vectorized {vectorized * 1e3:.1f} ms, per-item loop ~{per_item * 1e3:.0f} ms")
+    print(manifest_totals(tuning))
@@ -0,0 +1,261 @@
+"""
+Version 3.7 — Server-side Plot Rendering Module
+Dual Portal Stargate Simulation System
+
+Renders PNG/SVG charts on the server so low-power monitor screens only have to display
+an image: resonance response of both portals, bridge strength history, portal sensor
+trends and bridge-strength sweep heatmaps. The data for a chart is gathered on the API
+side (cheap NumPy column reads), hashed, and rendered with matplotlib's Agg/SVG
+backends in a process pool off the event loop. Rendered images are kept in an LRU cache
+keyed by that content hash, so unchanged inputs are served without re-rendering and
+identical concurrent requests share one render.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dualportal import bridge_strength
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+PLOT_KINDS = ("resonance", "bridge_history", "sensor_trends", "sweep_heatmap")
+
+# --- Chart data (gathered on the API side) ---
+
+def resonance_data(dp, span=4.0, points=400, damping=None):
+    """Steady-state amplitude of the portal.resonance_model oscillator around both portal frequencies."""
+    damping = dp.portal1.damping if damping is None else damping
+    f1, f2 = dp.portal1.freq, dp.portal2.freq
+    freqs = np.linspace(min(f1, f2) - span, max(f1, f2) + span, points)
+    omega = 2 * np.pi * freqs
+    amplitude = [1.0 / np.sqrt(((2 * np.pi * f) ** 2 - omega ** 2) ** 2 + (damping * omega) ** 2)
+                 for f in (f1, f2)]
+    return {"freq": freqs, "portal1": amplitude[0], "portal2": amplitude[1],
+            "freq1": f1, "freq2": f2, "detune": dp.detune}
+
+def _select(table, run_id=None, limit=2000):
+    """Column positions of the last `limit` retained records, optionally restricted to one run."""
+    index = np.arange(len(table) - table.start)
+    if run_id is not None:
+        index = index[table.column("run_id") == table.lookup(run_id)]
+    return index[-limit:]
+
+def history_data(table, run_id=None, limit=2000):
+    """Bridge strength and transfer outcomes over time from the record table."""
+    index = _select(table, run_id, limit)
+    t = table.column("timestamp")[index] / 1e6
+    result = table.column("transfer_result")[index]
+    return {"time": t - t[0] if len(t) else t, "bridge_strength": table.column("bridge_strength")[index],
+            "success": (result == 1), "failure": (result == 0), "run_id": run_id or "all runs"}
+
+def sensor_data(table, run_id=None, limit=2000):
+    """Per-portal stability, energy and safety trends from the record table."""
+    index = _select(table, run_id, limit)
+    t = table.column("timestamp")[index] / 1e6
+    data = {"time": t - t[0] if len(t) else t, "run_id": run_id or "all runs"}
+    for portal in ("portal1", "portal2"):
+        for field in ("stab", "energy", "safety"):
+            data[f"{portal}_{field}"] = table.column(f"{portal}_{field}")[index]
+    return data
+
+def heatmap_data(dp, detune_max=2.0, ratio_range=(0.5, 1.5), resolution=80):
+    """Bridge strength over detune x destination/source energy ratio from the live state."""
+    detune = np.linspace(0.0, detune_max, resolution)
+    ratio = np.linspace(*ratio_range, resolution)
+    energy1 = dp.portal1.energy
+    strength = bridge_strength(energy1, energy1 * ratio[:, None], dp.portal1.stability,
+                               dp.portal2.stability, dp.portal1.safety_status,
+                               dp.portal2.safety_status, detune[None, :])
+    return {"detune": detune, "ratio": ratio, "strength": np.broadcast_to(strength, (resolution, resolution)),
+            "current_detune": dp.detune, "current_ratio": dp.portal2.energy / energy1 if energy1 else 1.0}
+
+def plot_key(kind, fmt, data, options):
+    """SHA-256 content hash of a chart request (array inputs hashed by their bytes)."""
+    h = hashlib.sha256(json.dumps([kind, fmt, options], sort_keys=True).encode())
+    for name in sorted(data):
+        value = data[name]
+        h.update(name.encode())
+        if isinstance(value, np.ndarray):
+            h.update(str(value.dtype).encode() + str(value.shape).encode())
+            h.update(np.ascontiguousarray(value).tobytes())
+        else:
+            h.update(repr(value).encode())
+    return h.hexdigest()
+
+# --- Rendering (runs in worker processes) ---
+
+def _resonance(fig, data):
+    ax = fig.subplots()
+    ax.semilogy(data["freq"], data["portal1"], label=f"Portal 1 ({data['freq1']:.2f} Hz)")
+    ax.semilogy(data["freq"], data["portal2"], label=f"Portal 2 ({data['freq2']:.2f} Hz)")
+    ax.set(title=f"Resonance response (detune {data['detune']:.3f} Hz)",
+           xlabel="Drive frequency (Hz)", ylabel="Relative amplitude")
+    ax.legend()
+
+def _bridge_history(fig, data):
+    ax = fig.subplots()
+    t = data["time"]
+    ax.plot(t, data["bridge_strength"], color="tab:blue", label="Bridge strength")
+    ax.scatter(t[data["success"]], data["bridge_strength"][data["success"]], color="tab:green",
+               zorder=3, label="Transfer success")
+    ax.scatter(t[data["failure"]], data["bridge_strength"][data["failure"]], color="tab:red",
+               zorder=3, label="Transfer failure")
+    ax.axhline(0.9, color="gray", linestyle="--", linewidth=0.8)
+    ax.set(title=f"Bridge strength ({data['run_id']})", xlabel="Time (s)", ylabel="Strength",
+           ylim=(-0.02, 1.05))
+    ax.legend(loc="lower right")
+
+def _sensor_trends(fig, data):
+    stab_ax, energy_ax = fig.subplots(2, 1, sharex=True)
+    t = data["time"]
+    for portal in ("portal1", "portal2"):
+        stab_ax.plot(t, data[f"{portal}_stab"], label=portal)
+        energy_ax.plot(t, data[f"{portal}_energy"] / 1e3, label=portal)
+        unsafe = ~data[f"{portal}_safety"].astype(bool)
+        stab_ax.scatter(t[unsafe], data[f"{portal}_stab"][unsafe], marker="x", color="tab:red")
+    stab_ax.set(title=f"Portal sensor trends ({data['run_id']})", ylabel="Stability")
+    energy_ax.set(xlabel="Time (s)", ylabel="Energy (kJ)")
+    stab_ax.legend()
+
+def _sweep_heatmap(fig, data):
+    ax = fig.subplots()
+    mesh = ax.pcolormesh(data["detune"], data["ratio"], data["strength"], vmin=0.0, vmax=1.0,
+                         shading="auto", cmap="viridis", rasterized=True)
+    ax.contour(data["detune"], data["ratio"], data["strength"], levels=[0.9], colors="white")
+    ax.plot(data["current_detune"], data["current_ratio"], "r+", markersize=12)
+    ax.set(title="Bridge strength sweep", xlabel="Detune (Hz)", ylabel="Energy ratio (portal 2 / portal 1)")
+    fig.colorbar(mesh, ax=ax, label="Bridge strength")
+
+RENDERERS = {"resonance": _resonance, "bridge_history": _bridge_history,
+             "sensor_trends": _sensor_trends, "sweep_heatmap": _sweep_heatmap}
+
+def render_plot(kind, fmt, data, width=8.0, height=4.5, dpi=100):
+    """Renders one chart to PNG or SVG bytes (no pyplot state, safe in any process)."""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(width, height), dpi=dpi, layout="tight")
+    RENDERERS[kind](fig, data)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+    return buffer.getvalue()
+
+class PlotRenderer:
+    """
+    Renders charts in a process pool with an LRU image cache keyed by content hash.
+    workers: pool processes (0 renders in a thread instead); max_bytes bounds the cache.
+    """
+    def __init__(self, workers=2, max_entries=256, max_bytes=64 * 2**20):
+        self.workers = workers
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()         # key -> (body, media_type), least recently used first
+        self._bytes = 0
+        self._inflight = {}                  # key -> future of a render in progress
+        self._pool = None
+        self.stats = {"renders": 0, "hits": 0, "coalesced": 0, "evictions": 0, "render_seconds": 0.0}
+
+    def prepare(self, kind, fmt, data, **options):
+        """Validates a chart request and returns its content key."""
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown plot {kind!r}; expected one of {PLOT_KINDS}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}; expected one of {tuple(FORMATS)}")
+        return plot_key(kind, fmt, data, options)
+
+    def get(self, key):
+        """Cached (body, media_type) for a key, or None."""
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def _store(self, key, image):
+        self._images[key] = image
+        self._bytes += len(image[0])
+        while self._images and (len(self._images) > self.max_entries or self._bytes > self.max_bytes):
+            _, (body, _) = self._images.popitem(last=False)
+            self._bytes -= len(body)
+            self.stats["evictions"] += 1
+
+    async def render(self, kind, fmt, data, **options):
+        """Returns (body, media_type, key, hit), rendering off the event loop on a miss."""
+        key = self.prepare(kind, fmt, data, **options)
+        image = self.get(key)
+        if image is not None:
+            self.stats["hits"] += 1
+            return (*image, key, True)
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+            return (*(await asyncio.shield(self._inflight[key])), key, True)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        start = loop.time()
+        try:
+            if self.workers > 0:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                body = await loop.run_in_executor(self._pool, render_plot, kind, fmt, data, *self._size(options))
+            else:
+                body = await asyncio.to_thread(render_plot, kind, fmt, data, *self._size(options))
+            image = (body, FORMATS[fmt])
+            self._store(key, image)
+            self.stats["renders"] += 1
+            self.stats["render_seconds"] += loop.time() - start
+            future.set_result(image)
+            return (*image, key, False)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()                 # Marks it retrieved when nobody was waiting
+            raise
+        finally:
+            del self._inflight[key]
+
+    @staticmethod
+    def _size(options):
+        return options.get("width", 8.0), options.get("height", 4.5), options.get("dpi", 100)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def summary(self):
+        renders = self.stats["renders"]
+        return dict(self.stats, cached=len(self._images), cached_bytes=self._bytes, workers=self.workers,
+                    mean_render_ms=self.stats["render_seconds"] / renders * 1e3 if renders else 0.0)
+
+if __name__ == "__main__":
+    import time
+    from dualportal import DualPortal
+    from logger import SimulationLogger
+
+    dp = DualPortal(detune=0.3)
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    logger = SimulationLogger()
+    for step in range(200):
+        dp.portal1.update_energy(dt=0.1)
+        dp.portal2.update_energy(dt=0.1 if step % 7 else 0.05)
+        dp.form_bridge(t=step * 0.1)
+        logger.log_event("form_bridge", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength,
+                         dp.bridge_strength >= 0.9 if step % 20 == 0 else None)
+
+    async def demo():
+        renderer = PlotRenderer(workers=2)
+        charts = {"resonance": resonance_data(dp), "bridge_history": history_data(logger.table),
+                  "sensor_trends": sensor_data(logger.table), "sweep_heatmap": heatmap_data(dp)}
+        for fmt in FORMATS:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(renderer.render(kind, fmt, data) for kind, data in charts.items()))
+            print(f"{fmt}: {[len(r[0]) for r in results]} bytes in {time.perf_counter() - start:.2f} s")
+        start = time.perf_counter()
+        body, media_type, key, hit = await renderer.render("sweep_heatmap", "png", heatmap_data(dp))
+        print(f"Repeat heatmap: hit={hit} in {(time.perf_counter() - start) * 1e3:.2f} ms ({key[:12]})")
+        print(renderer.summary())
+        renderer.close()
+
+    asyncio.run(demo())
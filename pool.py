@@ -0,0 +1,92 @@
+"""
+Version 3.2 — DualPortal Instance Pool Module
+Dual Portal Stargate Simulation System
+
+Recycles DualPortal pairs between runs instead of constructing new ones. Released pairs
+are kept on a bounded free list. Each acquire restores the pair with the full form of
+DualPortal.reset / Portal.reset, which rebuilds every attribute (fresh log lists
+included) as a new DualPortal(freq1, detune, power) would, so nothing from a previous
+run leaks into the next. The pool is warmed to its target size at startup, and
+hit/miss statistics show whether it is sized for the workload.
+"""
+
+from config import SimulationConfig
+from dualportal import DualPortal
+
+class DualPortalPool:
+    """
+    Bounded free list of reusable DualPortal pairs.
+    size: pairs pre-constructed by warm(); max_free: cap on retained released pairs.
+    """
+    def __init__(self, size=16, max_free=256):
+        self.size = size
+        self.max_free = max_free
+        self._free = []
+        self._free_ids = set()           # Guards against double release
+        self.stats = {"acquired": 0, "hits": 0, "misses": 0, "released": 0,
+                      "discarded": 0, "warmed": 0}
+
+    def warm(self, count=None):
+        """Pre-constructs pairs until `count` (default: size) are free."""
+        target = min(self.size if count is None else count, self.max_free)
+        while len(self._free) < target:
+            dp = DualPortal()
+            self._free.append(dp)
+            self._free_ids.add(id(dp))
+            self.stats["warmed"] += 1
+        return len(self._free)
+
+    def acquire(self, freq1=None, detune=None, power=None):
+        """Returns a pair in freshly constructed state for the given parameters."""
+        freq1 = SimulationConfig["resonance_frequency"] if freq1 is None else freq1
+        detune = SimulationConfig["detune_default"] if detune is None else detune
+        power = SimulationConfig["energy_rate"] if power is None else power
+        self.stats["acquired"] += 1
+        if self._free:
+            dp = self._free.pop()
+            self._free_ids.discard(id(dp))
+            self.stats["hits"] += 1
+            dp.reset(freq1=freq1, detune=detune, power=power)
+            return dp
+        self.stats["misses"] += 1
+        return DualPortal(freq1=freq1, detune=detune, power=power)
+
+    def release(self, dp):
+        """Returns a pair that is no longer referenced by the session to the free list (detached from it)."""
+        if dp is None or id(dp) in self._free_ids:
+            return
+        dp.detach()
+        if len(self._free) >= self.max_free:
+            self.stats["discarded"] += 1
+            return
+        self._free.append(dp)
+        self._free_ids.add(id(dp))
+        self.stats["released"] += 1
+
+    def claim(self, dp):
+        """Takes a released pair back out of the pool (e.g. a batch rollback reinstates it)."""
+        if id(dp) in self._free_ids:
+            self._free.remove(dp)
+            self._free_ids.discard(id(dp))
+
+    def summary(self):
+        acquired = self.stats["acquired"]
+        return dict(self.stats, free=len(self._free), size=self.size, max_free=self.max_free,
+                    hit_rate=self.stats["hits"] / acquired if acquired else 0.0)
+
+if __name__ == "__main__":
+    import time
+
+    def churn(acquire, release, runs=20000):
+        start = time.perf_counter()
+        for i in range(runs):
+            dp = acquire()
+            dp.initialize_run(payload_volume=0.1, payload_mass=75)
+            release(dp)
+        return (time.perf_counter() - start) / runs * 1e6
+
+    pool = DualPortalPool(size=8)
+    pool.warm()
+    print(f"Fresh construction: {churn(DualPortal, lambda dp: None):.1f} µs per run")
+    print(f"Pooled reuse:       {churn(pool.acquire, pool.release):.1f} µs per run")
+    print(pool.summary())
@@ -7,28 +7,36 @@ floor sensor interaction, and stability metrics. Fully empirical, safety-aware,
 exception logged.
 """
 
+from types import SimpleNamespace
 import numpy as np
 from config import SimulationConfig
+from revision import Versioned, SESSION_BINDINGS
+from alerts import Alerting
+from payloads import PAYLOADS
+from safetyrules import SAFETY_RULES
 
-def resonance_model(y, t, freq, damping=SimulationConfig["damping_min"]):
+def resonance_model(y, t, freq, damping=None):
     """
     Second-order linear oscillator simulating portal resonance.
     y: [displacement, velocity]
     t: time (seconds)
     freq: resonance frequency (Hz)
-    damping: damping/friction factor
+    damping: damping/friction factor (default: configured damping_min)
     Returns the time derivative [velocity, acceleration]
     """
+    damping = SimulationConfig["damping_min"] if damping is None else damping
     omega2 = (2.0 * np.pi * freq) ** 2
     dydt = [y[1], -omega2 * y[0] - damping * y[1]]
     return dydt
 
-class Portal:
+class Portal(Alerting, Versioned):
     """
     Simulation class for a single quantum resonance portal.
     """
-    def __init__(self, freq=SimulationConfig["resonance_frequency"], 
-                 power=SimulationConfig["energy_rate"]):
+    def __init__(self, freq=None, power=None, name="portal"):
+        freq = SimulationConfig["resonance_frequency"] if freq is None else freq
+        power = SimulationConfig["energy_rate"] if power is None else power
+        self.name = name                        # Source name for safety alerts
         self.freq = freq                        # Resonance frequency (Hz)
         self.damping = SimulationConfig["damping_min"]  # Damping parameter
         self.power = power                      # Power input (W)
@@ -41,9 +49,10 @@ class Portal:
         self.safety_status = True               # All safety checks passed
         self.status_log = []
 
-    def sense_payload(self, volume=None, mass=None):
+    def sense_payload(self, volume=None, mass=None, material=None):
         """
         Sets payload volume and mass, triggering auto-tuning of resonance frequency.
+        A material from the payload library scales the tuned frequency by its resonance modifier.
         """
         if volume:
             self.payload_volume = volume
@@ -51,7 +60,10 @@ class Portal:
             self.payload_mass = mass
         self.freq = min(SimulationConfig["resonance_frequency"], 
                         SimulationConfig["resonance_frequency"] / self.payload_volume ** (1/3))
-        self.status_log.append(f"[INFO] Payload sensed: volume={self.payload_volume:.3f} m³, mass={self.payload_mass:.1f} kg. New freq={self.freq:.4f} Hz.")
+        if material is not None:
+            self.freq *= PAYLOADS.properties(material)["resonance_modifier"]
+        self.status_log.append(f"[INFO] Payload sensed: volume={self.payload_volume:.3f} m³, mass={self.payload_mass:.1f} kg"
+                               f"{f' ({material})' if material else ''}. New freq={self.freq:.4f} Hz.")
 
     def update_energy(self, dt=1.0):
         """
@@ -63,29 +75,40 @@ class Portal:
 
     def floor_sensor(self, temp=None, contact=None):
         """
-        Receives input from coolant/floor sensors and updates safety status and stability.
+        Receives input from coolant/floor sensors and updates safety status and stability
+        according to the "floor" stage safety rules.
         """
         if temp is not None:
             self.floor_temp = temp
         if contact is not None:
             self.floor_contact = contact
-        if self.floor_temp > SimulationConfig["floor_temp_threshold"]:
-            self.safety_status = False
-            self.stability *= 0.7
-            msg = f"[WARN] Floor temperature {self.floor_temp:.2f} °C exceeds safe threshold! Stability dropped to {self.stability:.2f}."
-            self.status_log.append(msg)
-        if not self.floor_contact:
-            self.safety_status = False
-            self.stability *= 0.8
-            msg = f"[WARN] Floor contact lost; unsafe for transfer. Stability dropped to {self.stability:.2f}."
-            self.status_log.append(msg)
+        values, fired = SAFETY_RULES.check("floor", floor_temp=self.floor_temp, floor_contact=self.floor_contact,
+                                           stability=self.stability, safety=self.safety_status)
+        self.stability, self.safety_status = values["stability"], values["safety"]
+        self.status_log.extend(message for _, message in fired if message)
         if self.safety_status:
             self.status_log.append("[INFO] Floor/coolant sensors OK.")
+        name = self.name
+        fired = {rule.name for rule, _ in fired}
+        for rule in SAFETY_RULES.stages["floor"]:
+            if rule.alert:
+                self._alerts.transition(name, rule.name, rule.name in fired, rule.severity,
+                                  rule.alert.format(source=name, **values), value=self.floor_temp)
 
-    def reset(self):
+    def reset(self, freq=None, power=None):
         """
         Resets energy, stability, safety status and sensor log for repeated runs.
+        Given freq and/or power, restores the portal to its freshly constructed state
+        instead (every attribute, including payload and sensor readings), for pooled reuse.
         """
+        if freq is not None or power is not None:
+            fresh = SimpleNamespace()   # Run __init__ unversioned, then publish with one bump
+            Portal.__init__(fresh, freq=freq, power=power, name=self.name)
+            bindings = {k: v for k, v in vars(self).items() if k in SESSION_BINDINGS}
+            self.__dict__.clear()
+            self.__dict__.update(vars(fresh), **bindings)    # Stays attached to its session (or detached)
+            self._revision.bump()
+            return
         self.energy = 0.0
         self.stability = 1.0
         self.safety_status = True
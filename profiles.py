@@ -0,0 +1,258 @@
+"""
+Version 3.9 — Compiled Configuration Profiles Module
+Dual Portal Stargate Simulation System
+
+Turns configuration into immutable, typed CompiledConfig objects built once per named
+profile, instead of re-reading and merging JSON on every load_simulation_config call.
+Profiles live in one JSON file ({"profiles": {name: {"base": other, key: value}}}) that
+ProfileStore re-compiles when it changes on disk, with no process restart; a broken edit
+leaves the last good profiles active. The active profile is written into the shared
+SimulationConfig dict, which Portal, DualPortal, PortalNetwork and the thermal model now
+read at call time rather than binding as import-time default arguments.
+
+Validation bounds are data (CONFIG_BOUNDS), compiled into low/high vectors, so
+validate_batch checks millions of candidate configs (sweep or Monte Carlo rows) in one
+vectorized pass and returns per-row, per-field violation masks.
+"""
+
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+from config import SimulationConfig, validate_config
+
+PROFILES_PATH = os.environ.get("STARGATE_CONFIG_PROFILES", "config_profiles.json")
+
+# Built-in defaults every profile starts from (SimulationConfig itself holds the active profile)
+BASE_CONFIG = dict(SimulationConfig)
+# Field name -> type, in SimulationConfig order
+CONFIG_TYPES = {name: type(value) for name, value in BASE_CONFIG.items()}
+
+# Hard bounds (inclusive) checked for every profile and candidate row; None = unbounded
+CONFIG_BOUNDS = {
+    "resonance_frequency": (1.0, 100.0),          # Hz, bio-safe/engineering band
+    "energy_rate": (0.0, None),                   # W
+    "subject_volume": (1e-9, 10.0 - 1e-9),        # m³, 0 < volume < 10
+    "floor_temp_threshold": (None, -100.0),       # °C, LN2 systems
+    "tesla_battery_capacity": (0.0, None),        # kWh
+    "failsafe_blocks": (1, None),
+    "detune_default": (0.0, 2.0),                 # Hz
+    "damping_min": (0.0, 1.0),
+    "damping_max": (0.0, 1.0),
+}
+NUMERIC_FIELDS = tuple(name for name in CONFIG_TYPES if CONFIG_TYPES[name] in (int, float))
+_BOUNDS = [CONFIG_BOUNDS.get(n, (None, None)) for n in NUMERIC_FIELDS]
+_LOW = np.array([-np.inf if lo is None else lo for lo, _ in _BOUNDS])
+_HIGH = np.array([np.inf if hi is None else hi for _, hi in _BOUNDS])
+
+class ConfigError(ValueError):
+    """Raised for an unknown field, a wrong type or an out-of-bounds value."""
+
+def validate_batch(candidates):
+    """
+    Vectorized bounds check of many candidate configs.
+    candidates: dict of field -> array (columns), or an (n, len(fields)) array in
+    NUMERIC_FIELDS order; fields not given take the current SimulationConfig value.
+    Returns (valid, violations, fields): a length-n bool mask, an (n, fields) bool mask
+    of violated bounds (NaN counts as a violation), and the field order.
+    """
+    if isinstance(candidates, Mapping):
+        unknown = set(candidates) - set(NUMERIC_FIELDS)
+        if unknown:
+            raise ConfigError(f"Unknown numeric config fields: {sorted(unknown)}")
+        columns = [np.asarray(candidates.get(n, SimulationConfig[n]), dtype=float) for n in NUMERIC_FIELDS]
+        X = np.column_stack(np.broadcast_arrays(*columns)) if columns else np.empty((0, 0))
+    else:
+        X = np.atleast_2d(np.asarray(candidates, dtype=float))
+        if X.shape[1] != len(NUMERIC_FIELDS):
+            raise ConfigError(f"Expected {len(NUMERIC_FIELDS)} columns in order {NUMERIC_FIELDS}")
+    violations = ~((X >= _LOW) & (X <= _HIGH))
+    # Cross-field rule: the damping band must not be inverted
+    lo, hi = NUMERIC_FIELDS.index("damping_min"), NUMERIC_FIELDS.index("damping_max")
+    inverted = X[:, lo] > X[:, hi]
+    violations[:, lo] |= inverted
+    violations[:, hi] |= inverted
+    return ~violations.any(axis=1), violations, NUMERIC_FIELDS
+
+def describe_violations(violations, fields=NUMERIC_FIELDS, limit=20):
+    """Per-field violation counts and the first offending row indices."""
+    return {field: {"count": int(violations[:, j].sum()),
+                    "rows": np.flatnonzero(violations[:, j])[:limit].tolist()}
+            for j, field in enumerate(fields) if violations[:, j].any()}
+
+class CompiledConfig(Mapping):
+    """
+    Immutable, typed configuration. Reads as a mapping (cfg["damping_min"]) like the
+    SimulationConfig dict, or as attributes (cfg.damping_min).
+    """
+    __slots__ = ("name", "_values")
+
+    def __init__(self, name, values):
+        merged = dict(BASE_CONFIG)
+        for key, value in values.items():
+            if key not in CONFIG_TYPES:
+                raise ConfigError(f"Profile {name!r}: unknown config field {key!r}")
+            expected = CONFIG_TYPES[key]
+            if expected is float and isinstance(value, int) and not isinstance(value, bool):
+                value = float(value)
+            if not isinstance(value, expected) or (expected is not bool and isinstance(value, bool)):
+                raise ConfigError(f"Profile {name!r}: {key} must be {expected.__name__}, got {value!r}")
+            merged[key] = value
+        valid, violations, fields = validate_batch({n: merged[n] for n in NUMERIC_FIELDS})
+        if not valid[0]:
+            bad = [f for f, v in zip(fields, violations[0]) if v]
+            raise ConfigError(f"Profile {name!r}: out-of-bounds values for {bad}")
+        validate_config(merged)                        # Legacy checks (monitor count warning)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "_values", merged)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("CompiledConfig is immutable")
+
+    def __getattr__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def to_dict(self):
+        return dict(self._values)
+
+    def __reduce__(self):
+        return CompiledConfig, (self.name, self._values)
+
+    def __repr__(self):
+        return f"CompiledConfig({self.name!r})"
+
+def compile_profiles(spec):
+    """Compiles {name: {"base": other, key: value}} into {name: CompiledConfig}."""
+    if not isinstance(spec, Mapping):
+        raise ConfigError(f"Profiles must be an object of name -> settings, got {type(spec).__name__}")
+    for name, values in spec.items():
+        if not isinstance(values, Mapping):
+            raise ConfigError(f"Profile {name!r} must be an object of settings, got {type(values).__name__}")
+        if not isinstance(values.get("base", ""), str):
+            raise ConfigError(f"Profile {name!r}: base must be a profile name, got {values['base']!r}")
+    spec = dict(spec)
+    spec.setdefault("default", {})
+    resolved = {}
+
+    def resolve(name, chain=()):
+        if name in resolved:
+            return resolved[name]
+        if name not in spec:
+            raise ConfigError(f"Unknown base profile {name!r}")
+        if name in chain:
+            raise ConfigError(f"Profile inheritance cycle: {' -> '.join(chain + (name,))}")
+        values = dict(spec[name])
+        base = values.pop("base", None)
+        merged = dict(resolve(base, chain + (name,)).to_dict()) if base else {}
+        merged.update(values)
+        resolved[name] = CompiledConfig(name, merged)
+        return resolved[name]
+
+    for name in spec:
+        resolve(name)
+    return resolved
+
+class ProfileStore:
+    """
+    Named profiles compiled from a JSON file, re-compiled when the file changes.
+    The active profile is applied to SimulationConfig.
+    """
+    def __init__(self, path=PROFILES_PATH, active="default"):
+        self.path = path
+        self.active_name = active
+        self.profiles = compile_profiles({})
+        self.reloads = 0
+        self.last_error = None
+        self._stamp = None
+        self.reload_if_changed()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def reload_if_changed(self):
+        """Re-compiles the profiles if the file changed; returns True when a new set was applied."""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            spec = {}
+            if stamp is not None:
+                with open(self.path) as f:
+                    document = json.load(f)
+                if not isinstance(document, dict):
+                    raise ConfigError(f"{self.path} must hold an object with a \"profiles\" object")
+                spec = document.get("profiles", {})
+            profiles = compile_profiles(spec)
+            if self.active_name not in profiles:
+                raise ConfigError(f"Active profile {self.active_name!r} missing from {self.path}")
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            self.last_error = str(e)                   # Keep serving the last good profiles
+            return False
+        self.profiles = profiles
+        self.last_error = None
+        self.reloads += 1
+        self.apply()
+        return True
+
+    @property
+    def active(self):
+        return self.profiles[self.active_name]
+
+    def activate(self, name):
+        if name not in self.profiles:
+            raise ConfigError(f"Unknown profile {name!r}; available: {sorted(self.profiles)}")
+        self.active_name = name
+        return self.apply()
+
+    def apply(self):
+        """Writes the active profile into the shared SimulationConfig dict."""
+        SimulationConfig.update(self.active.to_dict())
+        return self.active
+
+    def summary(self):
+        return {"path": self.path, "active": self.active_name, "profiles": sorted(self.profiles),
+                "reloads": self.reloads, "last_error": self.last_error}
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    path = os.path.join(tempfile.mkdtemp(), "profiles.json")
+    with open(path, "w") as f:
+        json.dump({"profiles": {"lab": {"detune_default": 0.12}, "cold_room": {"base": "lab", "damping_min": 0.03}}}, f)
+    store = ProfileStore(path, active="lab")
+    print(store.summary(), store.active.detune_default, SimulationConfig["detune_default"])
+    store.activate("cold_room")
+    print("cold_room:", store.active.damping_min, store.active["detune_default"])
+    with open(path, "w") as f:
+        json.dump({"profiles": {"lab": {"detune_default": 0.2}, "cold_room": {"base": "lab"}}}, f)
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1))
+    print("Hot reload:", store.reload_if_changed(), store.active.detune_default)
+
+    n = 2_000_000
+    rng = np.random.default_rng(0)
+    candidates = {"resonance_frequency": rng.uniform(0, 120, n), "detune_default": rng.uniform(0, 2.5, n),
+                  "damping_min": rng.uniform(0, 0.15, n), "damping_max": rng.uniform(0, 0.15, n)}
+    start = time.perf_counter()
+    valid, violations, fields = validate_batch(candidates)
+    print(f"Validated {n:,} candidates in {time.perf_counter() - start:.3f} s: {valid.sum():,} valid")
+    print({f: v["count"] for f, v in describe_violations(violations, fields).items()})
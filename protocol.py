@@ -0,0 +1,198 @@
+"""
+Version 2.3 — WebSocket Wire Protocol Module
+Dual Portal Stargate Simulation System
+
+Builds the portal/bridge snapshot streamed over /ws and /ws/logs and encodes it per
+connection. Text clients get JSON (orjson when installed, standard library otherwise);
+binary clients can negotiate MessagePack or a fixed-layout packed frame of float64/bool
+fields for the portal/bridge snapshot. The encoding is chosen with the `encoding` query
+parameter or a `stargate.<encoding>` WebSocket subprotocol; JSON remains the default.
+"""
+
+import json
+import struct
+
+from fastapi import WebSocketDisconnect
+
+try:
+    import orjson
+except ImportError:  # Optional fast JSON encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional binary encoder
+    msgpack = None
+
+SUBPROTOCOL_PREFIX = "stargate."
+
+PORTAL_FLOAT_FIELDS = ("freq", "stability", "power", "energy", "floor_temp",
+                       "payload_volume", "payload_mass")
+PORTAL_BOOL_FIELDS = ("floor_contact", "safety_status")
+BRIDGE_FLOAT_FIELDS = ("bridge_strength", "transfer_energy", "detune")
+
+# Packed frame: magic, layout version, flags (bit 0 = initialized), run id,
+# portal1 floats, portal2 floats, bridge floats, portal1 bools, portal2 bools.
+PACKED_MAGIC = b"SGS1"
+PACKED_VERSION = 1
+PACKED_SNAPSHOT = struct.Struct(
+    "<4sHH16s"
+    + "d" * (2 * len(PORTAL_FLOAT_FIELDS) + len(BRIDGE_FLOAT_FIELDS))
+    + "?" * (2 * len(PORTAL_BOOL_FIELDS)))
+
+def portal_snapshot(portal, include_log=True):
+    """Snapshot dict of a single portal for streaming."""
+    data = {field: getattr(portal, field) for field in PORTAL_FLOAT_FIELDS + PORTAL_BOOL_FIELDS}
+    if include_log:
+        data["status_log"] = portal.report_status()
+    return data
+
+def build_snapshot(dual_portal, include_log=True):
+    """Snapshot dict of the dual portal and bridge, as streamed over /ws."""
+    if dual_portal is None:
+        return {
+            "status": "disconnected",
+            "portal1": None,
+            "portal2": None,
+            "bridge_strength": 0.0,
+            "transfer_energy": 0.0,
+            "detune": 0.0
+        }
+    data = {
+        "status": "running",
+        "run_id": dual_portal.run_id,
+        "portal1": portal_snapshot(dual_portal.portal1, include_log),
+        "portal2": portal_snapshot(dual_portal.portal2, include_log),
+    }
+    for field in BRIDGE_FLOAT_FIELDS:
+        data[field] = getattr(dual_portal, field)
+    if include_log:
+        data["status_log"] = dual_portal.status_log
+    return data
+
+def pack_snapshot(dual_portal):
+    """Encodes the dual portal and bridge state as a fixed-layout binary frame."""
+    if dual_portal is None:
+        return PACKED_SNAPSHOT.pack(PACKED_MAGIC, PACKED_VERSION, 0, b"",
+                                    *([0.0] * (2 * len(PORTAL_FLOAT_FIELDS) + len(BRIDGE_FLOAT_FIELDS))),
+                                    *([False] * (2 * len(PORTAL_BOOL_FIELDS))))
+    p1, p2 = dual_portal.portal1, dual_portal.portal2
+    values = [float(getattr(p, f)) for p in (p1, p2) for f in PORTAL_FLOAT_FIELDS]
+    values += [float(getattr(dual_portal, f)) for f in BRIDGE_FLOAT_FIELDS]
+    values += [bool(getattr(p, f)) for p in (p1, p2) for f in PORTAL_BOOL_FIELDS]
+    run_id = (dual_portal.run_id or "").encode("ascii", "replace")[:16]
+    return PACKED_SNAPSHOT.pack(PACKED_MAGIC, PACKED_VERSION, 1, run_id, *values)
+
+def unpack_snapshot(frame):
+    """Decodes a packed frame back into the snapshot dict layout (without status logs)."""
+    fields = PACKED_SNAPSHOT.unpack(frame)
+    magic, version, flags, run_id = fields[:4]
+    if magic != PACKED_MAGIC or version != PACKED_VERSION:
+        raise ValueError("Unrecognised packed snapshot frame.")
+    if not flags & 1:
+        return build_snapshot(None)
+    values = list(fields[4:])
+    n_float, n_bool = len(PORTAL_FLOAT_FIELDS), len(PORTAL_BOOL_FIELDS)
+    portals = [dict(zip(PORTAL_FLOAT_FIELDS, values[i * n_float:(i + 1) * n_float])) for i in range(2)]
+    bridge = values[2 * n_float:2 * n_float + len(BRIDGE_FLOAT_FIELDS)]
+    bools = values[2 * n_float + len(BRIDGE_FLOAT_FIELDS):]
+    for i, portal in enumerate(portals):
+        portal.update(zip(PORTAL_BOOL_FIELDS, bools[i * n_bool:(i + 1) * n_bool]))
+    data = {
+        "status": "running",
+        "run_id": run_id.rstrip(b"\x00").decode("ascii") or None,
+        "portal1": portals[0],
+        "portal2": portals[1],
+    }
+    data.update(zip(BRIDGE_FLOAT_FIELDS, bridge))
+    return data
+
+class JSONCodec:
+    """Text frames; uses orjson when available."""
+    name = "json"
+    binary = False
+
+    def encode(self, message):
+        if orjson is not None:
+            return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        return json.dumps(message)
+
+    def encode_snapshot(self, dual_portal):
+        return self.encode(build_snapshot(dual_portal))
+
+class MsgpackCodec:
+    """Binary MessagePack frames carrying the same structure as JSON."""
+    name = "msgpack"
+    binary = True
+
+    def encode(self, message):
+        return msgpack.packb(message, use_bin_type=True)
+
+    def encode_snapshot(self, dual_portal):
+        return self.encode(build_snapshot(dual_portal))
+
+class PackedCodec:
+    """Fixed-layout float64/bool snapshot frames; other messages fall back to MessagePack or JSON."""
+    name = "packed"
+    binary = True
+
+    def __init__(self):
+        self.fallback = MsgpackCodec() if msgpack is not None else JSONCodec()
+
+    def encode(self, message):
+        return self.fallback.encode(message)
+
+    def encode_snapshot(self, dual_portal):
+        return pack_snapshot(dual_portal)
+
+CODECS = {"json": JSONCodec, "msgpack": MsgpackCodec, "packed": PackedCodec}
+
+def available_encodings():
+    """Names of encodings usable with the installed libraries."""
+    return [name for name in CODECS if name != "msgpack" or msgpack is not None]
+
+def negotiate(websocket):
+    """
+    Picks the codec for a connection from the `encoding` query parameter or an offered
+    `stargate.<encoding>` subprotocol. Returns (codec, subprotocol to accept or None).
+    """
+    available = available_encodings()
+    requested = websocket.query_params.get("encoding")
+    if requested in available:
+        return CODECS[requested](), None
+    offered = websocket.headers.get("sec-websocket-protocol", "")
+    for proto in (p.strip() for p in offered.split(",")):
+        if proto.startswith(SUBPROTOCOL_PREFIX) and proto[len(SUBPROTOCOL_PREFIX):] in available:
+            return CODECS[proto[len(SUBPROTOCOL_PREFIX):]](), proto
+    return JSONCodec(), None
+
+async def send(websocket, codec, payload):
+    """
+    Sends an already encoded payload as a text or binary frame to match the codec.
+    The push loops never receive, so a client that has gone away only shows up as a failed
+    send (ConnectionClosed, ClientDisconnected, ...); that is raised as WebSocketDisconnect.
+    """
+    try:
+        if codec.binary:
+            await websocket.send_bytes(payload)
+        else:
+            await websocket.send_text(payload)
+    except WebSocketDisconnect:
+        raise
+    except Exception as e:
+        raise WebSocketDisconnect(code=1006) from e
+
+if __name__ == "__main__":
+    import timeit
+    from dualportal import DualPortal
+
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=2.0)
+    dp.portal2.update_energy(dt=2.0)
+    dp.form_bridge(t=2.0)
+    for codec in [CODECS[name]() for name in available_encodings()]:
+        frame = codec.encode_snapshot(dp)
+        per_tick = timeit.timeit(lambda: codec.encode_snapshot(dp), number=2000) / 2000
+        print(f"{codec.name:8s} {len(frame):5d} bytes  {per_tick * 1e6:7.1f} µs/tick")
+    print("Packed round trip:", unpack_snapshot(pack_snapshot(dp)))
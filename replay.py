@@ -0,0 +1,262 @@
+"""
+Version 2.5 — Sensor Trace Replay Module
+Dual Portal Stargate Simulation System
+
+Streams recorded sensor traces into the hardware layer and drives a DualPortal run from
+them, so field incidents can be reproduced without hand-calling update(). Traces are
+either CSV (a `t` column plus one column per channel, blank = no new sample) or the
+binary .sgt format (magic line, JSON channel header, then raw little-endian float64
+rows of [t, channels...] with NaN = no new sample), which is read through a memory map.
+Both readers are generators, so replay memory stays constant regardless of trace
+length. Playback runs in real time, accelerated (speed > 1) or at maximum speed.
+"""
+
+import csv
+import json
+import time
+import numpy as np
+
+from safetyrules import SAFETY_RULES
+
+TRACE_MAGIC = b"SGTR1\n"
+
+CHANNELS = ("temp1", "temp2", "contact1", "contact2", "battery_charge",
+            "env_temp", "env_humidity", "env_pressure")
+
+def iter_csv_trace(path):
+    """Yields (t, {channel: value}) rows from a CSV trace."""
+    with open(path, "r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        channels = header[1:]
+        for row in reader:
+            if not row:
+                continue
+            values = {}
+            for name, cell in zip(channels, row[1:]):
+                if cell != "":
+                    values[name] = float(cell)
+            yield float(row[0]), values
+
+def read_trace_header(path):
+    """Returns (channels, data offset) of a binary .sgt trace."""
+    with open(path, "rb") as f:
+        if f.readline() != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a binary sensor trace.")
+        channels = json.loads(f.readline())["channels"]
+        return channels, f.tell()
+
+def iter_binary_trace(path, chunk_rows=65536):
+    """Yields (t, {channel: value}) rows from a memory-mapped binary .sgt trace."""
+    channels, offset = read_trace_header(path)
+    width = len(channels) + 1
+    data = np.memmap(path, dtype="<f8", mode="r", offset=offset)
+    data = data[:len(data) - len(data) % width].reshape(-1, width)
+    for start in range(0, len(data), chunk_rows):
+        chunk = np.array(data[start:start + chunk_rows])   # Copy one chunk out of the map
+        present = ~np.isnan(chunk[:, 1:])
+        for row, mask in zip(chunk.tolist(), present.tolist()):
+            yield row[0], {name: row[i + 1] for i, name in enumerate(channels) if mask[i]}
+
+def iter_trace(path, chunk_rows=65536):
+    """Picks the CSV or binary reader from the file extension."""
+    if path.endswith(".csv"):
+        return iter_csv_trace(path)
+    return iter_binary_trace(path, chunk_rows)
+
+class TraceWriter:
+    """Streams samples to a binary .sgt trace without holding them in memory."""
+    def __init__(self, path, channels=CHANNELS):
+        self.channels = list(channels)
+        self._index = {name: i + 1 for i, name in enumerate(self.channels)}
+        self._file = open(path, "wb")
+        self._file.write(TRACE_MAGIC)
+        self._file.write((json.dumps({"channels": self.channels}) + "\n").encode())
+
+    def write(self, t, values):
+        row = np.full(len(self.channels) + 1, np.nan, dtype="<f8")
+        row[0] = t
+        for name, value in values.items():
+            row[self._index[name]] = value
+        self._file.write(row.tobytes())
+
+    def write_array(self, rows):
+        """Writes an (n, 1 + channels) float array of rows in one call."""
+        self._file.write(np.ascontiguousarray(rows, dtype="<f8").tobytes())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def set_battery_charge(battery, pct):
+    """Applies a recorded state-of-charge reading to a TeslaBattery."""
+    battery.charge_pct = max(0.0, min(100.0, pct))
+    battery.capacity = 13.5 * battery.charge_pct / 100.0
+    battery.failsafe_engaged = battery.charge_pct < 10.0
+
+def default_bindings(hardware, env=None):
+    """
+    Maps trace channels onto a hardware dict shaped like main.simulation_state["hardware"]
+    and an optional EnvironmentMonitor.
+    """
+    bindings = {
+        "temp1": hardware["temp_sensor_1"].update,
+        "temp2": hardware["temp_sensor_2"].update,
+        "contact1": lambda v: hardware["contact_sensor_1"].update(bool(v)),
+        "contact2": lambda v: hardware["contact_sensor_2"].update(bool(v)),
+        "battery_charge": lambda v: set_battery_charge(hardware["battery"], v),
+    }
+    if env is not None:
+        bindings["env_temp"] = lambda v: env.update(temp=v)
+        bindings["env_humidity"] = lambda v: env.update(humidity=v)
+        bindings["env_pressure"] = lambda v: env.update(pressure=v)
+    return bindings
+
+def floor_conditions(temp, contact):
+    """Names of the floor rules a reading triggers (the condition edges replay feeds to portals)."""
+    _, fired = SAFETY_RULES.check("floor", floor_temp=temp, floor_contact=contact, stability=1.0, safety=True)
+    return frozenset(rule.name for rule, _ in fired)
+
+class TraceReplayer:
+    """
+    Replays a trace through channel bindings and, optionally, a DualPortal run.
+    speed: 1.0 = real time, >1 accelerated, None = as fast as possible.
+    Floor readings reach the portals as edge transitions: Portal.floor_sensor (and its
+    stability penalty) runs only when the set of floor rules a reading triggers changes,
+    so an excursion is penalized once however densely the trace samples it; in between,
+    the portals just track the latest reading. Energy and bridge state advance every
+    `tick` seconds of trace time. Portal status logs are
+    trimmed to `log_limit` entries so memory stays flat on long traces.
+    """
+    def __init__(self, trace, bindings, hardware=None, dual_portal=None, speed=None,
+                 tick=1.0, log_limit=1000):
+        self.trace = trace
+        self.bindings = bindings
+        self.hardware = hardware
+        self.dual_portal = dual_portal
+        self.speed = speed
+        self.tick = tick
+        self.log_limit = log_limit
+        self.samples = 0
+        self.trace_time = 0.0
+        self.unbound = set()
+        self._last_tick = None
+        self._fed = {1: None, 2: None}
+
+    def _apply(self, t, values):
+        for name, value in values.items():
+            setter = self.bindings.get(name)
+            if setter is None:
+                self.unbound.add(name)
+            else:
+                setter(value)
+        if self.dual_portal is not None and self.hardware is not None:
+            self._drive(t, values)
+        self.samples += 1
+        self.trace_time = t
+
+    def _drive(self, t, values):
+        dp, hw = self.dual_portal, self.hardware
+        for i, portal in ((1, dp.portal1), (2, dp.portal2)):
+            if f"temp{i}" in values or f"contact{i}" in values:
+                temp, contact = hw[f"temp_sensor_{i}"].read(), hw[f"contact_sensor_{i}"].read()
+                conditions = floor_conditions(temp, contact)
+                if conditions != self._fed[i]:
+                    self._fed[i] = conditions
+                    portal.floor_sensor(temp=temp, contact=contact)
+                elif (portal.floor_temp, portal.floor_contact) != (temp, contact):
+                    portal.floor_temp, portal.floor_contact = temp, contact
+        if self._last_tick is None:
+            self._last_tick = t
+        elif t - self._last_tick >= self.tick:
+            dt = t - self._last_tick
+            self._last_tick = t
+            if not hw["battery"].failsafe_engaged:
+                dp.portal1.update_energy(dt=dt)
+                dp.portal2.update_energy(dt=dt)
+            dp.form_bridge(t=t)
+            for log in (dp.portal1.status_log, dp.portal2.status_log, dp.status_log):
+                if len(log) > self.log_limit:
+                    del log[:-self.log_limit]
+
+    def _delay(self, t0, wall0, t):
+        """Seconds to wait before applying the sample at trace time t."""
+        if not self.speed:
+            return 0.0
+        return wall0 + (t - t0) / self.speed - time.perf_counter()
+
+    def run(self, until=None):
+        """Replays synchronously; returns the number of samples applied."""
+        t0 = wall0 = None
+        for t, values in self.trace:
+            if until is not None and t > until:
+                break
+            if t0 is None:
+                t0, wall0 = t, time.perf_counter()
+            wait = self._delay(t0, wall0, t)
+            if wait > 0.005:
+                time.sleep(wait)
+            self._apply(t, values)
+        return self.samples
+
+    async def arun(self, until=None):
+        """Replays on the event loop, yielding between paced samples."""
+        import asyncio
+        t0 = wall0 = None
+        for t, values in self.trace:
+            if until is not None and t > until:
+                break
+            if t0 is None:
+                t0, wall0 = t, time.perf_counter()
+            wait = self._delay(t0, wall0, t)
+            if wait > 0.005:
+                await asyncio.sleep(wait)
+            elif self.samples % 4096 == 0:
+                await asyncio.sleep(0)
+            self._apply(t, values)
+        return self.samples
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from hardware import TemperatureSensor, ContactSensor, TeslaBattery, FailsafeBlock, EnvironmentMonitor
+    from dualportal import DualPortal
+
+    hardware = {
+        "temp_sensor_1": TemperatureSensor("Portal1_Temp", -196.0),
+        "temp_sensor_2": TemperatureSensor("Portal2_Temp", -196.0),
+        "contact_sensor_1": ContactSensor("Portal1_Contact", True),
+        "contact_sensor_2": ContactSensor("Portal2_Contact", True),
+        "battery": TeslaBattery(),
+        "failsafe": FailsafeBlock()
+    }
+    env = EnvironmentMonitor()
+    path = os.path.join(tempfile.mkdtemp(), "incident.sgt")
+
+    # One hour of 100 Hz data: portal 2 floor warms past the LN2 threshold at t=1800 s
+    n = 360000
+    with TraceWriter(path) as writer:
+        for start in range(0, n, 60000):
+            t = np.arange(start, min(n, start + 60000)) / 100.0
+            rows = np.full((len(t), len(CHANNELS) + 1), np.nan)
+            rows[:, 0] = t
+            rows[:, 1] = -196.0 + 0.01 * np.sin(t)
+            rows[:, 2] = np.where(t < 1800.0, -196.0, -195.0)
+            rows[::100, 5] = 100.0 - t[::100] / 60.0
+            writer.write_array(rows)
+
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    replayer = TraceReplayer(iter_trace(path), default_bindings(hardware, env), hardware, dp)
+    start = time.perf_counter()
+    replayer.run()
+    wall = time.perf_counter() - start
+    print(f"Replayed {replayer.samples} samples ({replayer.trace_time:.0f} s of trace) in {wall:.1f} s")
+    print("Portal 2 safety:", dp.portal2.safety_status, "stability:", round(dp.portal2.stability, 4))
+    print("Battery:", hardware["battery"].status())
+    print("Bridge strength:", dp.bridge_strength)
@@ -0,0 +1,210 @@
+"""
+Version 2.9 — Study Result Cache Module
+Dual Portal Stargate Simulation System
+
+Content-addressed cache for sweep, optimization and Monte Carlo results. Entries are keyed
+by a SHA-256 hash of the canonicalized inputs (study kind, configuration from
+load_simulation_config, parameter grid, seeds and MODEL_VERSION) and stored as files on
+local disk with size-bounded LRU eviction. Individual form_bridge evaluations are
+memoized in a bounded in-memory LRU layer so overlapping grid points between studies
+cost nothing; the memo is dropped when the active configuration or the bridge safety
+rules it was computed under change. Hit/miss statistics are kept for both layers. Both layers are guarded by a
+lock, so studies may run in worker threads; get_or_compute computes outside it.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+from config import SimulationConfig
+from dualportal import bridge_strength
+from safetyrules import SAFETY_RULES
+
+MODEL_VERSION = "1.3"            # Bump when portal/bridge physics changes invalidate results
+CACHE_DIR = os.environ.get("STARGATE_CACHE_DIR", "cache")
+CACHE_MAX_BYTES = int(os.environ.get("STARGATE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+def _canonical(value):
+    """JSON default hook for NumPy values and other non-JSON inputs."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, Mapping):                  # e.g. a CompiledConfig profile
+        return dict(value)
+    raise TypeError(f"Cannot canonicalize {type(value).__name__} for a cache key")
+
+def cache_key(kind, **inputs):
+    """SHA-256 hex key of a study kind and its canonicalized inputs."""
+    text = json.dumps({"kind": kind, "model_version": MODEL_VERSION, "inputs": inputs},
+                      sort_keys=True, separators=(",", ":"), default=_canonical)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def point_context():
+    """
+    Key of what a bridge point depends on besides its inputs: the active configuration
+    (resonance frequency and any thresholds the rules reference) and the bridge rules.
+    """
+    return cache_key("bridge_point", config=SimulationConfig,
+                     rules=[rule.spec for rule in SAFETY_RULES.stages["bridge"]])
+
+class ResultCache:
+    """
+    Disk-backed content-addressed store with LRU eviction once total size exceeds
+    max_bytes, plus an in-memory LRU memo of form_bridge point evaluations.
+    """
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_points=1_000_000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_points = max_points
+        self._index = OrderedDict()          # key -> size, least recently used first
+        self._points = OrderedDict()         # point key -> bridge strength
+        self._context = None                 # point_context() the memoized points were computed under
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "point_hits": 0, "point_misses": 0}
+        self._lock = threading.RLock()
+        self._scan()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pkl")
+
+    def _scan(self):
+        """Rebuilds the LRU index from files on disk, oldest access first."""
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pkl"):
+                    st = os.stat(os.path.join(root, name))
+                    entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.total_bytes += size
+
+    def get(self, key):
+        """Returns the cached value for key, or None on a miss."""
+        with self._lock:
+            if key not in self._index:
+                self.stats["misses"] += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except Exception:               # Corrupt or stale entries raise almost anything on unpickling
+                self._drop(key)
+                self.stats["misses"] += 1
+                return None
+            os.utime(path)
+            self._index.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        """Stores value under key and evicts least recently used entries over the size bound."""
+        with self._lock:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            if key in self._index:
+                self.total_bytes -= self._index.pop(key)
+            size = os.path.getsize(path)
+            self._index[key] = size
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self._index) > 1:
+                self._drop(next(iter(self._index)))
+                self.stats["evictions"] += 1
+
+    def _drop(self, key):
+        self.total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get_or_compute(self, kind, compute, **inputs):
+        """Returns (value, hit) for a study, computing and storing it on a miss."""
+        key = cache_key(kind, **inputs)
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def bridge_points(self, energy1, energy2, stability1, stability2, safety1, safety2, detune):
+        """
+        Bridge strength for arrays of portal states, evaluating only points not already
+        memoized (misses are computed in one vectorized batch).
+        """
+        with self._lock:
+            context = point_context()
+            if context != self._context:
+                self._points.clear()         # Profile switch or rules reload: memoized points are stale
+                self._context = context
+            rows = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in
+                                         (energy1, energy2, stability1, stability2, safety1, safety2, detune)))
+            keys = list(zip(*(r.ravel().tolist() for r in rows)))
+            out = np.empty(len(keys))
+            missing = []
+            for i, k in enumerate(keys):
+                value = self._points.get(k)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self._points.move_to_end(k)
+                    out[i] = value
+            self.stats["point_hits"] += len(keys) - len(missing)
+            self.stats["point_misses"] += len(missing)
+            if missing:
+                cols = np.array([keys[i] for i in missing]).T
+                values = bridge_strength(cols[0], cols[1], cols[2], cols[3],
+                                         cols[4].astype(bool), cols[5].astype(bool), cols[6])
+                out[missing] = values
+                for i, value in zip(missing, values.tolist()):
+                    self._points[keys[i]] = value
+                while len(self._points) > self.max_points:
+                    self._points.popitem(last=False)
+            return out.reshape(rows[0].shape)
+
+    def summary(self):
+        """Hit/miss statistics and occupancy of both layers."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            points = self.stats["point_hits"] + self.stats["point_misses"]
+            return dict(self.stats,
+                        entries=len(self._index), bytes=self.total_bytes, max_bytes=self.max_bytes,
+                        memo_points=len(self._points),
+                        hit_rate=self.stats["hits"] / lookups if lookups else 0.0,
+                        point_hit_rate=self.stats["point_hits"] / points if points else 0.0)
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from config import load_simulation_config
+
+    cache = ResultCache(tempfile.mkdtemp(), max_bytes=64 * 1024)
+    cfg = load_simulation_config()
+    grid = np.linspace(13500.0, 135000.0, 10000)
+
+    def study():
+        return cache.bridge_points(grid, grid * 0.99, 1.0, 0.95, True, True, 0.08)
+
+    for attempt in range(2):
+        start = time.perf_counter()
+        _, hit = cache.get_or_compute("energy_grid", study, config=cfg, grid=grid, seed=None)
+        print(f"Study {attempt + 1}: hit={hit} in {time.perf_counter() - start:.4f} s")
+    cache.bridge_points(grid[::2], grid[::2] * 0.99, 1.0, 0.95, True, True, 0.08)
+    print(cache.summary())
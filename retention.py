@@ -0,0 +1,326 @@
+"""
+Version 4.1 — Tiered Log Retention Module
+Dual Portal Stargate Simulation System
+
+Bounds the memory and disk used by SimulationLogger on always-on installations. Raw
+records are kept for a recent window; everything logged is also folded into downsampled
+rollup tiers (per-second and per-minute by default) holding record and transfer counts
+plus count/sum/min/max of portal stabilities, energies and bridge strength per bucket.
+RetentionManager.compact() drops raw records older than the window from the logger
+(the next session snapshot rewrites the record file without them) and prunes each tier
+to its own window. query() answers a time range from the finest tier that still covers
+it within a point budget, so callers get one interface over raw and rolled-up history.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+ROLLUP_METRICS = ("portal1_stab", "portal2_stab", "portal1_energy", "portal2_energy", "bridge_strength")
+
+ROLLUP_DTYPE = np.dtype(
+    [("bucket", np.int64),          # Bucket start, epoch microseconds
+     ("records", np.int64),
+     ("transfers", np.int64),
+     ("successes", np.int64)]
+    + [(f"{metric}_{stat}", np.int64 if stat == "n" else np.float64)
+       for metric in ROLLUP_METRICS for stat in ("n", "sum", "min", "max")])
+
+# (resolution seconds, retention seconds) from finest to coarsest
+DEFAULT_TIERS = ((1, 24 * 3600), (60, 30 * 24 * 3600))
+DEFAULT_RAW_SECONDS = 3600
+
+_ADD = ("records", "transfers", "successes") + tuple(f"{m}_{s}" for m in ROLLUP_METRICS for s in ("n", "sum"))
+
+def _now_us():
+    return time.time_ns() // 1000
+
+def _combine(parts):
+    """Merges rollup rows sharing a bucket; `parts` must be sorted by bucket."""
+    if len(parts) < 2:
+        return parts.copy()
+    starts = np.flatnonzero(np.r_[True, parts["bucket"][1:] != parts["bucket"][:-1]])
+    if len(starts) == len(parts):
+        return parts.copy()
+    merged = np.empty(len(starts), dtype=ROLLUP_DTYPE)
+    merged["bucket"] = parts["bucket"][starts]
+    for name in _ADD:
+        merged[name] = np.add.reduceat(parts[name], starts)
+    for metric in ROLLUP_METRICS:
+        merged[f"{metric}_min"] = np.fmin.reduceat(parts[f"{metric}_min"], starts)
+        merged[f"{metric}_max"] = np.fmax.reduceat(parts[f"{metric}_max"], starts)
+    return merged
+
+class RollupTier:
+    """Per-bucket aggregates at one resolution, kept sorted by bucket in a growable array."""
+    def __init__(self, resolution, retention):
+        self.resolution = resolution            # Seconds per bucket
+        self.retention = retention              # Seconds of buckets kept by prune()
+        self.horizon = None                     # Epoch µs before which buckets were pruned
+        self._data = np.zeros(64, dtype=ROLLUP_DTYPE)
+        self._size = 0
+
+    @property
+    def buckets(self):
+        return self._data[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def add_rows(self, rows):
+        """Folds raw RecordTable rows into the tier (one vectorized pass per batch)."""
+        if not len(rows):
+            return
+        width = self.resolution * 1_000_000
+        parts = np.zeros(len(rows), dtype=ROLLUP_DTYPE)
+        parts["bucket"] = rows["timestamp"] // width * width
+        parts["records"] = 1
+        parts["transfers"] = rows["transfer_result"] >= 0
+        parts["successes"] = rows["transfer_result"] == 1
+        for metric in ROLLUP_METRICS:
+            values = rows[metric]
+            present = ~np.isnan(values)
+            parts[f"{metric}_n"] = present
+            parts[f"{metric}_sum"] = np.where(present, values, 0.0)
+            parts[f"{metric}_min"] = values          # NaN is ignored by fmin/fmax
+            parts[f"{metric}_max"] = values
+        if np.any(parts["bucket"][1:] < parts["bucket"][:-1]):
+            parts = parts[np.argsort(parts["bucket"], kind="stable")]
+        # Only the existing buckets at or after the batch's first bucket can overlap it
+        buckets = self.buckets
+        position = int(np.searchsorted(buckets["bucket"], parts["bucket"][0]))
+        tail = np.concatenate([buckets[position:], parts])
+        if position < self._size:
+            tail = tail[np.argsort(tail["bucket"], kind="stable")]
+        self._replace_tail(position, _combine(tail))
+
+    def _replace_tail(self, position, tail):
+        size = position + len(tail)
+        if size > len(self._data):
+            data = np.zeros(max(64, 2 * size), dtype=ROLLUP_DTYPE)
+            data[:position] = self._data[:position]
+            self._data = data
+        self._data[position:size] = tail
+        self._size = size
+
+    def prune(self, now_us):
+        """Drops buckets older than the tier's retention window; returns how many."""
+        cutoff = now_us - self.retention * 1_000_000
+        drop = int(np.searchsorted(self.buckets["bucket"], cutoff))
+        if drop:
+            retained = self._data[drop:self._size].copy()
+            self._size = 0
+            self._replace_tail(0, retained)
+        self.horizon = cutoff if self.horizon is None else max(self.horizon, cutoff)
+        return drop
+
+    def select(self, start_us, end_us):
+        """Buckets starting in [start_us, end_us)."""
+        b = self.buckets
+        lo, hi = np.searchsorted(b["bucket"], (start_us, end_us))
+        return b[lo:hi]
+
+    def load(self, buckets, horizon):
+        self._size = 0
+        self._replace_tail(0, np.asarray(buckets, dtype=ROLLUP_DTYPE))
+        self.horizon = horizon
+
+    def nbytes(self):
+        return self._size * ROLLUP_DTYPE.itemsize
+
+class RetentionManager:
+    """
+    RecordTable listener maintaining rollup tiers for a SimulationLogger and compacting
+    raw records older than `raw_seconds`. Rows are folded in lazily (on compact, query or
+    save) in vectorized batches, so logging itself pays nothing extra.
+    """
+    def __init__(self, logger, raw_seconds=DEFAULT_RAW_SECONDS, tiers=DEFAULT_TIERS, directory=None):
+        self.logger = logger
+        self.raw_seconds = raw_seconds
+        self.tiers = [RollupTier(resolution, retention) for resolution, retention in tiers]
+        self.directory = directory
+        self._table = logger.table
+        self._folded = logger.table.start       # Records already in the tiers
+        self.compacted = 0                      # Raw records dropped by compact()
+        logger.table.listeners.append(self)
+
+    def on_append(self, table, index):
+        pass                                    # Folded in batches by sync()
+
+    def on_clear(self, table):
+        self._table = table
+        self._folded = 0
+        for tier in self.tiers:
+            tier.load(np.zeros(0, dtype=ROLLUP_DTYPE), None)
+
+    def on_compact(self, table, upto):
+        self.sync()
+
+    def sync(self):
+        """Folds any records not yet rolled up into every tier."""
+        table = self.logger.table
+        if table is not self._table:            # Replaced (e.g. by a snapshot restore)
+            self._table = table
+            self._folded = min(max(self._folded, table.start), len(table))
+        if self._folded < len(table):
+            rows = table.rows_since(self._folded)
+            for tier in self.tiers:
+                tier.add_rows(rows)
+            self._folded = len(table)
+
+    def compact(self, now_us=None):
+        """
+        Drops raw records older than the raw window from the logger (after rolling them
+        up) and prunes each tier; returns the number of raw records dropped.
+        """
+        now_us = _now_us() if now_us is None else now_us
+        table = self.logger.table
+        timestamps = table.column("timestamp")
+        fresh = timestamps >= now_us - self.raw_seconds * 1_000_000
+        aged = int(np.argmax(fresh)) if fresh.any() else len(timestamps)
+        dropped = table.compact(table.start + aged) if aged else 0
+        self.sync()
+        for tier in self.tiers:
+            tier.prune(now_us)
+        self.compacted += dropped
+        return dropped
+
+    def _pick(self, start_us, end_us, resolution, max_points):
+        """Chooses "raw" or a tier for the range: the finest that covers it within max_points."""
+        table = self.logger.table
+        if resolution is not None:
+            if resolution in ("raw", 0):
+                return "raw"
+            for tier in self.tiers:
+                if tier.resolution == resolution:
+                    return tier
+            raise ValueError(f"No rollup tier at {resolution} s; available: "
+                             f"raw, {', '.join(str(t.resolution) for t in self.tiers)}")
+        timestamps = table.column("timestamp")
+        # Once records have been compacted, raw only covers ranges from the first retained one
+        raw_from = (timestamps[0] if len(timestamps) else end_us) if table.start else None
+        if raw_from is None or start_us >= raw_from:
+            if np.count_nonzero((timestamps >= start_us) & (timestamps < end_us)) <= max_points:
+                return "raw"
+        for tier in self.tiers:
+            if (tier.horizon is None or start_us >= tier.horizon) and \
+                    len(tier.select(start_us, end_us)) <= max_points:
+                return tier
+        return self.tiers[-1] if self.tiers else "raw"
+
+    def query(self, start_us=None, end_us=None, resolution=None, max_points=2000):
+        """
+        History of the retained metrics over [start_us, end_us) (epoch µs; default: all).
+        resolution is "raw", a tier's bucket seconds, or None to pick automatically.
+        Returns columns: time (epoch µs), records, transfers, successes and, per metric,
+        mean/min/max (a raw record is its own bucket).
+        """
+        self.sync()
+        start_us = -2 ** 62 if start_us is None else start_us
+        end_us = 2 ** 62 if end_us is None else end_us
+        source = self._pick(start_us, end_us, resolution, max_points)
+        if source == "raw":
+            table = self.logger.table
+            t = table.column("timestamp")
+            mask = (t >= start_us) & (t < end_us)
+            result = table.column("transfer_result")[mask]
+            columns = {"time": t[mask], "records": np.ones(len(result), dtype=np.int64),
+                       "transfers": (result >= 0).astype(np.int64),
+                       "successes": (result == 1).astype(np.int64)}
+            for metric in ROLLUP_METRICS:
+                values = table.column(metric)[mask]
+                columns[f"{metric}_mean"] = columns[f"{metric}_min"] = columns[f"{metric}_max"] = values
+            return {"tier": "raw", "resolution": 0, "points": len(result), "columns": columns}
+        b = source.select(start_us, end_us)
+        columns = {"time": b["bucket"], "records": b["records"],
+                   "transfers": b["transfers"], "successes": b["successes"]}
+        for metric in ROLLUP_METRICS:
+            n = b[f"{metric}_n"]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                columns[f"{metric}_mean"] = np.where(n > 0, b[f"{metric}_sum"] / n, np.nan)
+            columns[f"{metric}_min"] = b[f"{metric}_min"]
+            columns[f"{metric}_max"] = b[f"{metric}_max"]
+        return {"tier": f"{source.resolution}s", "resolution": source.resolution,
+                "points": len(b), "columns": columns}
+
+    def _paths(self, directory):
+        return (os.path.join(directory, "retention.json"),
+                [os.path.join(directory, f"rollup_{tier.resolution}s.npy") for tier in self.tiers])
+
+    def save(self, directory=None):
+        """Writes the tiers (one .npy per tier, replaced atomically) and their coverage."""
+        directory = directory or self.directory
+        self.sync()
+        os.makedirs(directory, exist_ok=True)
+        meta_path, tier_paths = self._paths(directory)
+        for tier, path in zip(self.tiers, tier_paths):
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, tier.buckets)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+        meta = {"folded": self._folded, "generation": self._table.generation,
+                "horizons": [tier.horizon for tier in self.tiers], "saved_at": time.time()}
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def load(self, directory=None):
+        """Loads saved tiers; returns False if there are none. Call after a snapshot restore."""
+        directory = directory or self.directory
+        meta_path, tier_paths = self._paths(directory)
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as f:
+            meta = json.load(f)
+        for tier, path, horizon in zip(self.tiers, tier_paths, meta["horizons"]):
+            if os.path.exists(path):
+                tier.load(np.load(path), horizon)
+        table = self.logger.table
+        self._table = table
+        self._folded = min(max(meta["folded"], table.start), len(table))
+        return True
+
+    def summary(self):
+        self.sync()
+        table = self.logger.table
+        return {"raw_seconds": self.raw_seconds,
+                "raw_records": len(table) - table.start,
+                "raw_bytes": table.nbytes(),
+                "compacted_records": table.start,
+                "tiers": [{"resolution": tier.resolution, "retention": tier.retention,
+                           "buckets": len(tier), "bytes": tier.nbytes(), "horizon": tier.horizon}
+                          for tier in self.tiers]}
+
+if __name__ == "__main__":
+    from dualportal import DualPortal
+    from logger import SimulationLogger
+
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=2.0)
+    dp.portal2.update_energy(dt=2.0)
+    dp.form_bridge(t=2.0)
+
+    # Two simulated days at 2 records per second
+    logger = SimulationLogger()
+    retention = RetentionManager(logger, raw_seconds=600)
+    day_us = 24 * 3600 * 1_000_000
+    start_us = _now_us() - 2 * day_us
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    for hour in range(48):
+        for i in range(7200):
+            dp.portal1.stability = 1.0 - 0.05 * rng.random()
+            logger.table.append_values(start_us + hour * 3_600_000_000 + i * 500_000, "Tick", dp.run_id,
+                                       dp.portal1, dp.portal2, dp.bridge_strength)
+        retention.compact(start_us + (hour + 1) * 3_600_000_000)
+    print(f"Logged and compacted {48 * 7200:,} records in {time.perf_counter() - started:.1f} s")
+    print(retention.summary())
+    for span in (300, 6 * 3600, 2 * 24 * 3600):
+        now = start_us + 2 * day_us
+        result = retention.query(now - span * 1_000_000, now)
+        print(f"Last {span} s -> tier {result['tier']}, {result['points']} points, mean portal1 stability "
+              f"{np.nanmean(result['columns']['portal1_stab_mean']):.4f}")
@@ -0,0 +1,131 @@
+"""
+Version 2.4 — State Revision Tracking Module
+Dual Portal Stargate Simulation System
+
+Maintains a monotonically increasing revision of simulation state. Portal, DualPortal and
+hardware classes inherit Versioned, so every attribute assignment on an object attached to
+the live session bumps the shared revision; objects that are not attached (pooled pairs,
+replay, thermal and sweep copies) bump a detached counter nothing watches. Code that swaps
+whole objects (e.g. a new DualPortal in simulation_state) attaches them and bumps
+explicitly. SnapshotCache keeps a pre-serialized response per revision, and
+RevisionCounter.wait_for gives long-poll "wait for revision > N" semantics.
+In-place container mutation (e.g. status_log.append) is not tracked.
+"""
+
+import asyncio
+import hashlib
+
+class RevisionCounter:
+    """Monotonic state revision with asyncio waiters."""
+    def __init__(self):
+        self.value = 0
+        self._waiters = []
+
+    def bump(self):
+        self.value += 1
+        if self._waiters:
+            waiters, self._waiters = self._waiters, []
+            for fut in waiters:
+                fut.get_loop().call_soon_threadsafe(_resolve, fut, self.value)
+        return self.value
+
+    async def wait_for(self, after, timeout=30.0):
+        """
+        Waits until the revision exceeds `after` or `timeout` seconds pass.
+        Returns the current revision either way.
+        """
+        if self.value > after:
+            return self.value
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if fut in self._waiters:        # Timed out or cancelled (e.g. a stopped loop task)
+                self._waiters.remove(fut)
+        return self.value
+
+def _resolve(fut, value):
+    if not fut.done():
+        fut.set_result(value)
+
+REVISION = RevisionCounter()
+DETACHED = RevisionCounter()        # Bumped by objects outside any session; nobody waits on it
+
+# Per-instance attributes binding an object to a session (set by attach(), never persisted)
+SESSION_BINDINGS = ("_revision", "_alerts")
+
+class Versioned:
+    """
+    Mixin that bumps a revision counter whenever an attribute is assigned. Instances start
+    detached; attach() routes their changes to the live REVISION, or to a counter of
+    their own (what-if branches).
+    """
+    _revision = DETACHED
+
+    def attach(self, revision=REVISION):
+        """Routes this object's attribute changes to `revision`; returns the object."""
+        object.__setattr__(self, "_revision", revision)
+        revision.bump()
+        return self
+
+    def detach(self):
+        """Stops this object's changes from reaching the session it was attached to."""
+        self.__dict__.pop("_revision", None)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        self._revision.bump()
+
+class SnapshotCache:
+    """
+    Caches a serialized snapshot and its ETag for the revision it was built at.
+    `build` returns the response dict; `encode` turns it into a str/bytes body.
+    """
+    def __init__(self, build, encode, counter=REVISION):
+        self.build = build
+        self.encode = encode
+        self.counter = counter
+        self.revision = None
+        self.body = None
+        self.etag = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        """Returns (body, etag), rebuilding only if the revision has moved."""
+        revision = self.counter.value
+        if revision != self.revision:
+            self.body = self.encode(self.build(revision))
+            data = self.body if isinstance(self.body, bytes) else self.body.encode()
+            self.etag = f'"{revision}-{hashlib.blake2b(data, digest_size=8).hexdigest()}"'
+            self.revision = revision
+            self.misses += 1
+        else:
+            self.hits += 1
+        return self.body, self.etag
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value matches `etag`."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+if __name__ == "__main__":
+    import json
+
+    state = {"x": 0}
+    cache = SnapshotCache(lambda rev: {"revision": rev, **state}, json.dumps)
+    print("First:", cache.get())
+    print("Cached:", cache.get(), "hits:", cache.hits)
+    REVISION.bump()
+    print("After bump:", cache.get(), "misses:", cache.misses)
+
+    async def demo():
+        start = REVISION.value
+        asyncio.get_running_loop().call_later(0.1, REVISION.bump)
+        print("Long-poll woke at revision", await REVISION.wait_for(start, timeout=5.0))
+    asyncio.run(demo())
@@ -0,0 +1,269 @@
+"""
+Version 2.7 — Transfer Job Queue & Throughput Scheduler Module
+Dual Portal Stargate Simulation System
+
+Serializes payload transfers against a DualPortal through a priority job queue. Queued
+jobs are dispatched in bridge windows: each window takes up to `batch_size` jobs (highest
+priority first, FIFO within a priority), honours per-portal concurrency limits, and runs
+them against one bridge state. Admission is energy-budget aware: a successful transfer
+draws its cost (the source portal's power over `transfer_seconds` of bridge hold) from
+the TeslaBattery, which a charger refills at `recharge_w` between windows. Jobs are
+deferred while the cost would take the battery below its reserve (or the failsafe is
+engaged), then rejected after their `max_wait` (0 rejects at once, with an estimate of
+when to retry). Queue wait and transfers-per-hour metrics support throughput planning.
+"""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+class TransferJob:
+    """A queued payload transfer request."""
+    def __init__(self, job_id, priority, portal, payload, submitted, max_wait):
+        self.job_id = job_id
+        self.priority = priority
+        self.portal = portal          # Source portal (1 or 2)
+        self.payload = payload
+        self.submitted = submitted
+        self.max_wait = max_wait      # Seconds the job may be deferred for the energy budget
+        self.started = None
+        self.finished = None
+        self.status = "queued"        # queued -> done | rejected
+        self.result = None
+        self.future = None
+
+    @property
+    def queue_wait(self):
+        return None if self.started is None else self.started - self.submitted
+
+    async def wait(self):
+        """Waits for the job to finish and returns its result dict."""
+        if self.future is not None:
+            await self.future
+        return self.result
+
+def transfer_cost(dp, portal=1, seconds=1.0):
+    """Energy (J) one transfer draws: the source portal's power over the bridge hold time."""
+    return (dp.portal1 if portal == 1 else dp.portal2).power * seconds
+
+class TransferScheduler:
+    """
+    Priority transfer queue dispatched in bridge windows.
+    get_dual_portal: callable returning the live DualPortal (or None).
+    portal_limits: max jobs per source portal in one window.
+    transfer_seconds: bridge hold time per transfer (sets its energy cost).
+    recharge_w: charger power refilling the battery between windows (0 = none).
+    lock: optional asyncio.Lock the background loop holds while dispatching a window.
+    """
+    def __init__(self, get_dual_portal, battery, logger=None, portal_limits=None,
+                 batch_size=8, batch_interval=0.02, reserve_pct=10.0, max_wait=30.0,
+                 retry_interval=0.5, transfer_seconds=1.0, recharge_w=0.0, lock=None, clock=time.monotonic):
+        self.get_dual_portal = get_dual_portal
+        self.battery = battery
+        self.logger = logger
+        self.portal_limits = portal_limits or {1: 4, 2: 4}
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.reserve_pct = reserve_pct
+        self.max_wait = max_wait
+        self.retry_interval = retry_interval
+        self.transfer_seconds = transfer_seconds
+        self.recharge_w = recharge_w
+        self.lock = lock
+        self.clock = clock
+        self._charged_at = clock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._wakeup = None
+        self._task = None
+        self.windows = 0
+        self.counts = Counter()
+        self.waits = deque(maxlen=1000)          # Recent queue waits (s)
+        self.completions = deque()               # Completion times within the last hour
+        self.started_at = clock()
+
+    def submit(self, priority=0, portal=1, payload=None, max_wait=None):
+        """Queues a transfer job and returns it (max_wait defaults to the scheduler's)."""
+        if portal not in (1, 2):
+            raise ValueError(f"Source portal must be 1 or 2, got {portal!r}")
+        job = TransferJob(next(self._ids), priority, portal, payload, self.clock(),
+                          self.max_wait if max_wait is None else max_wait)
+        try:
+            job.future = asyncio.get_running_loop().create_future()
+        except RuntimeError:
+            pass                                  # Synchronous use (tests, planning runs)
+        heapq.heappush(self._queue, (-priority, next(self._seq), job))
+        self.counts["submitted"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def _finish(self, job, status, result):
+        job.finished = self.clock()
+        job.status = status
+        job.result = result
+        self.counts[status] += 1
+        if job.future is not None and not job.future.done():
+            job.future.set_result(result)
+
+    def _shortfall(self, energy_J):
+        """Joules the battery lacks to cover energy_J above its reserve (0 = within budget)."""
+        pct = energy_J / 3.6e6 / 13.5 * 100.0
+        short = max(0.0, self.reserve_pct + pct - self.battery.charge_pct) * 13.5 * 3.6e6 / 100.0
+        return short if short or not self.battery.failsafe_engaged else energy_J
+
+    def _recharge(self, now):
+        """Adds the charger's energy since the previous window."""
+        elapsed, self._charged_at = now - self._charged_at, now
+        if self.recharge_w > 0 and elapsed > 0 and self.battery.charge_pct < 100.0:
+            self.battery.recharge(self.recharge_w * elapsed)
+
+    def run_window(self):
+        """
+        Dispatches one bridge window; returns the jobs that finished in it.
+        """
+        dp = self.get_dual_portal()
+        if dp is None:
+            finished = []
+            while self._queue:
+                job = heapq.heappop(self._queue)[2]
+                self._finish(job, "rejected", {"status": "error", "message": "Simulation not initialized",
+                                               "job_id": job.job_id})
+                finished.append(job)
+            return finished
+        taken, held, per_portal = [], [], Counter()
+        while self._queue and len(taken) < self.batch_size:
+            entry = heapq.heappop(self._queue)
+            portal = entry[2].portal
+            if per_portal[portal] >= self.portal_limits.get(portal, self.batch_size):
+                held.append(entry)
+            else:
+                per_portal[portal] += 1
+                taken.append(entry)
+        self.windows += 1
+        now = self.clock()
+        self._recharge(now)
+        finished = []
+        for entry in taken:
+            job = entry[2]
+            cost = transfer_cost(dp, job.portal, self.transfer_seconds)
+            shortfall = self._shortfall(cost)
+            if shortfall:
+                if now - job.submitted >= job.max_wait:
+                    self._finish(job, "rejected", {
+                        "status": "error", "job_id": job.job_id,
+                        "message": "Transfer rejected: battery energy budget exhausted",
+                        "retry_after": shortfall / self.recharge_w if self.recharge_w > 0 else None})
+                    finished.append(job)
+                else:
+                    held.append(entry)
+                continue
+            job.started = now
+            self.waits.append(job.queue_wait)
+            result = dp.transfer_payload()
+            if result:
+                self.battery.supply_power(cost)             # Only completed transfers use energy
+            if self.logger:
+                self.logger.log_event('API Transfer', dp.run_id, dp.portal1, dp.portal2,
+                                      dp.bridge_strength, result)
+            self._finish(job, "done", {
+                "status": "success",
+                "transfer_result": result,
+                "bridge_strength": dp.bridge_strength,
+                "portal1_safety": dp.portal1.safety_status,
+                "portal2_safety": dp.portal2.safety_status,
+                "job_id": job.job_id,
+                "energy_used": cost if result else 0.0,
+                "queue_wait": job.queue_wait,
+                "window": self.windows
+            })
+            self.completions.append(job.finished)
+            self.counts["succeeded" if result else "failed"] += 1
+            finished.append(job)
+        for entry in held:
+            heapq.heappush(self._queue, entry)
+        return finished
+
+    async def run(self):
+        """Background dispatch loop; gathers concurrent submissions into windows."""
+        self._wakeup = asyncio.Event()
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await asyncio.sleep(self.batch_interval)
+            async with self.lock or contextlib.nullcontext():
+                finished = self.run_window()
+            if not finished:
+                await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        """Starts the dispatch loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self):
+        """Queue depth, outcome counts, queue-wait statistics and transfers per hour."""
+        now = self.clock()
+        while self.completions and now - self.completions[0] > 3600.0:
+            self.completions.popleft()
+        waits = np.array(self.waits) if self.waits else np.zeros(1)
+        span = min(3600.0, max(now - self.started_at, 1e-9))
+        return {
+            "queued": len(self._queue),
+            "windows": self.windows,
+            "submitted": self.counts["submitted"],
+            "done": self.counts["done"],
+            "succeeded": self.counts["succeeded"],
+            "failed": self.counts["failed"],
+            "rejected": self.counts["rejected"],
+            "queue_wait_mean": float(waits.mean()),
+            "queue_wait_p95": float(np.percentile(waits, 95)),
+            "queue_wait_max": float(waits.max()),
+            "transfers_per_hour": len(self.completions) * 3600.0 / span,
+            "battery_charge_pct": self.battery.charge_pct
+        }
+
+if __name__ == "__main__":
+    from dualportal import DualPortal
+    from hardware import TeslaBattery
+
+    # Planning run on a simulated clock: 200 requests arriving every 5 s, one window per 10 s
+    clock = [0.0]
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=2.0)
+    dp.portal2.update_energy(dt=2.0)
+    dp.form_bridge(t=2.0)
+    scheduler = TransferScheduler(lambda: dp, TeslaBattery(), batch_size=2, recharge_w=2000.0,
+                                  transfer_seconds=60.0, clock=lambda: clock[0])
+    for i in range(200):
+        scheduler.submit(priority=i % 3, portal=1 + i % 2)
+        clock[0] += 5.0
+        if i % 2:
+            scheduler.run_window()
+    while scheduler.metrics()["queued"]:
+        clock[0] += 10.0
+        scheduler.run_window()
+    for key, value in scheduler.metrics().items():
+        print(f"{key}: {value}")
@@ -0,0 +1,226 @@
+"""
+Version 3.6 — Sensitivity & Uncertainty Analysis Module
+Dual Portal Stargate Simulation System
+
+Ranks which run inputs drive bridge strength and transfer success. The DualPortal
+pipeline (sense_payload tuning, the floor and transfer safety rules, form_bridge) is
+evaluated in vectorized form over whole sample matrices via
+dualportal.bridge_strength. Local sensitivities use batched central finite differences.
+Global analysis offers Sobol first-order and total indices (Saltelli sampling, Jansen
+estimators, bootstrap confidence) and Morris elementary-effect screening. Large sample
+matrices can be split across a process pool.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.stats import qmc
+
+from config import SimulationConfig
+from dualportal import bridge_strength
+from safetyrules import SAFETY_RULES
+
+# Uncertain inputs: nominal value and (low, high) range for global analysis
+PARAMETERS = {
+    "detune": (SimulationConfig["detune_default"], (0.0, 2.0)),                 # Hz
+    "stability1": (1.0, (0.8, 1.0)),
+    "stability2": (1.0, (0.8, 1.0)),
+    "energy1": (2 * SimulationConfig["energy_rate"], (13500.0, 40500.0)),     # J (1-3 s at full power)
+    "energy2": (2 * SimulationConfig["energy_rate"], (13500.0, 40500.0)),
+    "payload_volume": (SimulationConfig["subject_volume"], (0.05, 0.5)),      # m³
+    "floor_temp1": (-196.0, (-197.0, -195.0)),                                 # °C
+    "floor_temp2": (-196.0, (-197.0, -195.0)),
+}
+OUTPUTS = ("bridge_strength", "transfer_success", "portal_freq")
+MIN_CHUNK = 500_000             # Smallest per-process chunk worth pickling to a worker
+
+def model(X, names, output="bridge_strength"):
+    """
+    Evaluates the run pipeline for each row of X (columns ordered as `names`; inputs not
+    listed take their nominal value). Returns a 1-D array of the requested output.
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    cols = {name: PARAMETERS[name][0] for name in PARAMETERS}
+    cols.update({name: X[:, j] for j, name in enumerate(names)})
+    f0 = SimulationConfig["resonance_frequency"]
+    if output == "portal_freq":                  # Portal.sense_payload cube-root tuning
+        freq = np.minimum(f0, f0 / np.asarray(cols["payload_volume"]) ** (1 / 3))
+        return np.broadcast_to(freq, (len(X),)).astype(float)
+    floor1, floor2 = (SAFETY_RULES.evaluate("floor", floor_temp=cols[f"floor_temp{i}"], floor_contact=True,   # Portal.floor_sensor
+                                            stability=cols[f"stability{i}"], safety=True) for i in (1, 2))
+    strength = bridge_strength(cols["energy1"], cols["energy2"], floor1["stability"], floor2["stability"],
+                               floor1["safety"], floor2["safety"], cols["detune"])
+    strength = np.broadcast_to(strength, (len(X),)).astype(float)
+    if output == "transfer_success":
+        return SAFETY_RULES.evaluate("transfer", strength=strength)["allowed"].astype(float)
+    if output != "bridge_strength":
+        raise ValueError(f"Unknown output {output!r}; expected one of {OUTPUTS}")
+    return strength
+
+def _model_chunk(args):
+    return model(*args)
+
+def evaluate(X, names, output="bridge_strength", workers=1, min_chunk=None):
+    """
+    model() over a large sample matrix, split across `workers` processes. Each chunk is
+    pickled to its worker, so this only pays off when evaluation dominates the transfer.
+    """
+    min_chunk = MIN_CHUNK if min_chunk is None else min_chunk
+    if workers <= 1 or len(X) < 2 * min_chunk:
+        return model(X, names, output)
+    chunks = np.array_split(X, min(workers, len(X) // min_chunk))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(_model_chunk, [(c, names, output) for c in chunks])))
+
+def _resolve(parameters, bounds):
+    names = list(parameters or PARAMETERS)
+    unknown = [n for n in names if n not in PARAMETERS]
+    if unknown:
+        raise ValueError(f"Unknown parameters: {unknown}")
+    limits = np.array([(bounds or {}).get(n, PARAMETERS[n][1]) for n in names], dtype=float)
+    return names, limits
+
+def _ranking(names, scores):
+    order = np.argsort(-np.abs(np.nan_to_num(scores)), kind="stable")
+    return [{"parameter": names[i], "score": float(scores[i])} for i in order]
+
+def local_sensitivities(points=None, parameters=None, output="bridge_strength", rel_step=1e-4):
+    """
+    Central-difference Jacobian of the output at one or more operating points (rows in
+    the order of `parameters`; default: the nominal point), all perturbations evaluated
+    in one batch. Elasticities are d(ln f)/d(ln x), averaged in magnitude over points.
+    """
+    names, _ = _resolve(parameters, None)
+    if points is None:
+        points = [[PARAMETERS[n][0] for n in names]]
+    P = np.atleast_2d(np.asarray(points, dtype=float))
+    n, k = P.shape
+    h = rel_step * np.maximum(np.abs(P), 1.0)
+    offsets = np.einsum("ij,jk->ijk", h, np.eye(k))                 # (n, k, k) perturbation per parameter
+    X = np.concatenate([(P[:, None, :] + offsets).reshape(-1, k),
+                        (P[:, None, :] - offsets).reshape(-1, k), P])
+    f = model(X, names, output)
+    f_plus, f_minus, f0 = f[:n * k].reshape(n, k), f[n * k:2 * n * k].reshape(n, k), f[2 * n * k:]
+    jacobian = (f_plus - f_minus) / (2 * h)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        elasticity = np.where(f0[:, None] != 0, jacobian * P / f0[:, None], 0.0)
+    mean_elasticity = np.abs(elasticity).mean(axis=0)
+    return {
+        "method": "local", "output": output, "points": n, "evaluations": len(X),
+        "jacobian": {name: jacobian[:, j].tolist() for j, name in enumerate(names)},
+        "elasticity": {name: float(mean_elasticity[j]) for j, name in enumerate(names)},
+        "ranking": _ranking(names, mean_elasticity)
+    }
+
+def sobol_indices(samples=4096, parameters=None, bounds=None, output="bridge_strength",
+                  seed=0, workers=1, bootstrap=100):
+    """
+    Variance-based Sobol indices from Saltelli sampling: N(d + 2) evaluations with N
+    rounded up to a power of two. Returns first-order and total indices with 95%
+    bootstrap half-widths, ranked by total index.
+    """
+    names, limits = _resolve(parameters, bounds)
+    k = len(names)
+    n = 1 << int(np.ceil(np.log2(max(samples, 2))))
+    base = qmc.Sobol(d=2 * k, scramble=True, seed=seed).random(n)
+    A = qmc.scale(base[:, :k], limits[:, 0], limits[:, 1])
+    B = qmc.scale(base[:, k:], limits[:, 0], limits[:, 1])
+    AB = np.repeat(A[None], k, axis=0)                               # AB[i] = A with column i from B
+    AB[np.arange(k), :, np.arange(k)] = B.T
+    f = evaluate(np.concatenate([A, B, AB.reshape(-1, k)]), names, output, workers)
+    fA, fB, fAB = f[:n], f[n:2 * n], f[2 * n:].reshape(k, n)
+
+    def estimate(idx):
+        a, b, ab = fA[idx], fB[idx], fAB[:, idx]
+        var = np.var(np.concatenate([a, b], axis=-1), axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            first = np.mean(b[None] * (ab - a[None]), axis=-1) / var
+            total = 0.5 * np.mean((a[None] - ab) ** 2, axis=-1) / var
+        return np.nan_to_num(first), np.nan_to_num(total), var
+
+    first, total, variance = estimate(np.arange(n))
+    rng = np.random.default_rng(seed)
+    draws = rng.integers(0, n, size=(bootstrap, n))
+    boot_first, boot_total = np.zeros((2, max(bootstrap, 1), k))
+    for b, idx in enumerate(draws):
+        boot_first[b], boot_total[b], _ = estimate(idx)
+    first_conf = 1.96 * boot_first.std(axis=0)
+    total_conf = 1.96 * boot_total.std(axis=0)
+    return {
+        "method": "sobol", "output": output, "samples": n, "evaluations": len(f),
+        "mean": float(np.mean(np.concatenate([fA, fB]))), "variance": float(variance),
+        "first_order": {name: float(first[j]) for j, name in enumerate(names)},
+        "first_order_conf": {name: float(first_conf[j]) for j, name in enumerate(names)},
+        "total": {name: float(total[j]) for j, name in enumerate(names)},
+        "total_conf": {name: float(total_conf[j]) for j, name in enumerate(names)},
+        "ranking": _ranking(names, total)
+    }
+
+def morris_screening(trajectories=200, parameters=None, bounds=None, output="bridge_strength",
+                     levels=4, seed=0, workers=1):
+    """
+    Morris elementary effects on the unit-scaled input space: r(d + 1) evaluations.
+    Returns mu* (mean |effect|), mu and sigma per parameter, ranked by mu*.
+    """
+    names, limits = _resolve(parameters, bounds)
+    k, r = len(names), trajectories
+    rng = np.random.default_rng(seed)
+    delta = levels / (2.0 * (levels - 1))
+    grid = np.arange(levels) / (levels - 1)
+    start = rng.choice(grid[grid <= 1 - delta + 1e-12], size=(r, k))
+    order = np.argsort(rng.random((r, k)), axis=1)                   # Random parameter order per trajectory
+    steps = np.where(rng.random((r, k)) < 0.5, delta, -delta)
+    steps = np.where(start + steps > 1, -delta, steps)
+    steps = np.where(start + steps < 0, delta, steps)
+    unit = np.repeat(start[:, None, :], k + 1, axis=1)
+    rows = np.arange(r)
+    for j in range(k):
+        unit[rows, j + 1:, order[:, j]] += steps[rows, order[:, j]][:, None]
+    X = limits[:, 0] + unit.reshape(-1, k) * (limits[:, 1] - limits[:, 0])
+    f = evaluate(X, names, output, workers).reshape(r, k + 1)
+    effects = np.empty((r, k))
+    effects[rows[:, None], order] = np.diff(f, axis=1) / steps[rows[:, None], order]
+    mu_star = np.abs(effects).mean(axis=0)
+    return {
+        "method": "morris", "output": output, "trajectories": r, "evaluations": len(X),
+        "mu_star": {name: float(mu_star[j]) for j, name in enumerate(names)},
+        "mu": {name: float(effects[:, j].mean()) for j, name in enumerate(names)},
+        "sigma": {name: float(effects[:, j].std(ddof=1)) for j, name in enumerate(names)},
+        "ranking": _ranking(names, mu_star)
+    }
+
+METHODS = {"local": local_sensitivities, "sobol": sobol_indices, "morris": morris_screening}
+
+def analyze(method="sobol", **options):
+    """Runs one analysis by name; options are passed to the method."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; expected one of {sorted(METHODS)}")
+    return METHODS[method](**options)
+
+if __name__ == "__main__":
+    import time
+    from dualportal import DualPortal
+
+    # The vectorized pipeline reproduces a DualPortal run at a sample point
+    dp = DualPortal(detune=0.5)
+    dp.initialize_run(payload_volume=0.2, floor_temp1=-196.0, floor_temp2=-196.0)
+    dp.portal1.update_energy(dt=2.0)
+    dp.portal2.update_energy(dt=1.5)
+    dp.portal2.stability = 0.85
+    dp.form_bridge(t=2.0)
+    point = [[0.5, 1.0, 0.85, 27000.0, 20250.0, 0.2, -196.0, -196.0]]
+    print("DualPortal:", dp.bridge_strength, "model:", model(point, list(PARAMETERS))[0])
+
+    for output in ("bridge_strength", "transfer_success"):
+        start = time.perf_counter()
+        result = sobol_indices(samples=16384, output=output)
+        print(f"\nSobol ({output}, {result['evaluations']} evaluations, "
+              f"{time.perf_counter() - start:.2f} s):")
+        for entry in result["ranking"]:
+            name = entry["parameter"]
+            print(f"  {name:15s} S1={result['first_order'][name]:6.3f}  ST={result['total'][name]:6.3f} "
+                  f"± {result['total_conf'][name]:.3f}")
+    morris = morris_screening(trajectories=500)
+    print("\nMorris mu* ranking:", [(e["parameter"], round(e["score"], 3)) for e in morris["ranking"][:4]])
+    local = local_sensitivities()
+    print("Local elasticities at nominal:", {k: round(v, 4) for k, v in local["elasticity"].items() if v})
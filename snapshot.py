@@ -0,0 +1,325 @@
+"""
+Version 2.8 — Session Snapshot & Restore Module
+Dual Portal Stargate Simulation System
+
+Persists the full session (DualPortal and both portals, hardware, logger) so a machine
+that auto-stops can resume where it left off. Object state is written as a small binary
+core file, replaced atomically on each save. Logger records are appended incrementally
+to a raw record file (only rows logged since the previous save) with new interned strings
+and `extra` messages appended alongside. Restore loads the core file and memory-maps the record file as the
+logger's read-only base segment, so restore time does not grow with history length.
+When the logger has been cleared or has compacted aged records into retention rollups,
+the next save writes the retained rows and pools to a new generation of files, which
+the core file names; the previous generation is deleted only once the new core file is
+in place, so a crash mid-save leaves the last snapshot intact. Snapshots written by an
+older SNAPSHOT_VERSION are upgraded on restore by the MIGRATIONS chain, one version at a time.
+"""
+
+import json
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+
+from dualportal import DualPortal
+from portal import Portal
+from logger import SimulationLogger, RecordTable, RECORD_DTYPE
+from revision import REVISION, SESSION_BINDINGS
+
+SNAPSHOT_VERSION = 3
+SNAPSHOT_DIR = os.environ.get("STARGATE_SNAPSHOT_DIR", "snapshots")
+LEGACY_FILES = {"records": "records.bin", "strings": "strings.jsonl", "extras": "extras.jsonl"}
+_LOGGER_FILE = re.compile(r"(records|strings|extras)(\.\d+)?\.(bin|jsonl)$")
+
+def generation_files(generation):
+    """Logger file names of one snapshot file generation."""
+    return {"records": f"records.{generation}.bin", "strings": f"strings.{generation}.jsonl",
+            "extras": f"extras.{generation}.jsonl"}
+
+def _migrate_v1(core, store):
+    """
+    Version 1 -> 2: portals gain alert source names, and `extra` codes index a separate
+    message pool (in version 1 they indexed the interned string table, so that table,
+    copied, is the pool they refer to).
+    """
+    dp = core["dual_portal"]
+    if dp is not None:
+        for name in ("portal1", "portal2"):
+            dp[name].setdefault("name", name)
+    meta = core["logger"]
+    if meta is not None:
+        meta.setdefault("start", 0)
+        strings = store._read_lines(os.path.join(store.directory, LEGACY_FILES["strings"]), meta["strings"])
+        extras_path = os.path.join(store.directory, LEGACY_FILES["extras"])
+        tmp = extras_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write("".join(json.dumps(s) + "\n" for s in strings))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, extras_path)
+        meta["extras"] = meta["strings"]
+    core["version"] = 2
+    return core
+
+def _migrate_v2(core, store):
+    """Version 2 -> 3: the core file names its logger files; version 2 used fixed names."""
+    if core["logger"] is not None:
+        core["logger"]["files"] = dict(LEGACY_FILES)
+    core["version"] = 3
+    return core
+
+# Upgrade from the keyed version to the next; restore applies them in sequence
+MIGRATIONS = {1: _migrate_v1, 2: _migrate_v2}
+
+def migrate(core, store):
+    """Upgrades a loaded core dict to SNAPSHOT_VERSION; raises ValueError if it cannot."""
+    version = core.get("version")
+    while version != SNAPSHOT_VERSION:
+        if version not in MIGRATIONS:
+            raise ValueError(f"Cannot restore snapshot version {version!r} (current {SNAPSHOT_VERSION})")
+        core = MIGRATIONS[version](core, store)
+        version = core["version"]
+    return core
+
+def object_state(obj):
+    """Plain dict of an object's attributes (containers shallow-copied, session bindings left out)."""
+    return {k: (v.copy() if isinstance(v, (list, dict)) else v) for k, v in vars(obj).items()
+            if k not in SESSION_BINDINGS}
+
+def restore_object(cls, state):
+    """Rebuilds an object from object_state() output without running __init__."""
+    obj = cls.__new__(cls)
+    obj.__dict__.update(state)
+    return obj
+
+def dual_portal_state(dp):
+    state = object_state(dp)
+    state["portal1"] = object_state(dp.portal1)
+    state["portal2"] = object_state(dp.portal2)
+    return state
+
+def restore_dual_portal(state):
+    state = dict(state)
+    state["portal1"] = restore_object(Portal, state["portal1"])
+    state["portal2"] = restore_object(Portal, state["portal2"])
+    return restore_object(DualPortal, state)
+
+class SessionStore:
+    """
+    Snapshot files for one session: session.bin (core state) and one generation of
+    logger files named by it: records.<n>.bin (raw logger rows, append-only),
+    strings.<n>.jsonl (interned logger strings, append-only) and extras.<n>.jsonl (the
+    logger's `extra` message pool, append-only).
+    """
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self.core_path = os.path.join(directory, "session.bin")
+        self._use_files(None)
+        self._saved_files = None        # Logger files named by the core file on disk
+        self._table = None              # Logger table the persisted counts refer to
+        self._generation = None
+        self._start = 0                 # Record index of the first row in the record file
+        self._rows = 0                  # Rows already in the record file
+        self._strings = 0               # Strings already in the strings file
+        self._extras = 0                # Messages already in the extras file
+        self.restored = False
+        self.checked = False            # Set once restore has been attempted
+        self.last_save = None
+
+    def exists(self):
+        return os.path.exists(self.core_path)
+
+    def _use_files(self, files):
+        self.files = files              # Names of the logger files the next core file refers to
+        paths = {kind: os.path.join(self.directory, name) for kind, name in (files or {}).items()}
+        self.records_path = paths.get("records")
+        self.strings_path = paths.get("strings")
+        self.extras_path = paths.get("extras")
+
+    def _new_generation(self):
+        """Creates empty files for the next logger file generation (the current ones stay until the core moves on)."""
+        generations = [int(m.group(2)[1:]) for m in map(_LOGGER_FILE.match, os.listdir(self.directory))
+                       if m and m.group(2)]
+        files = generation_files(max(generations, default=0) + 1)
+        for name in files.values():
+            open(os.path.join(self.directory, name), "wb").close()
+        self._use_files(files)
+
+    def _remove_stale(self):
+        """Deletes logger files the current core file does not name (superseded or from an interrupted save)."""
+        keep = set(self.files.values()) if self.files else set()
+        for name in os.listdir(self.directory):
+            if _LOGGER_FILE.match(name) and name not in keep:
+                os.remove(os.path.join(self.directory, name))   # A restored table may still map it: unlink only
+
+    def _sync_logger(self, table):
+        """
+        Appends rows, strings and messages logged since the last save; starts a new file
+        generation with the retained rows and pools after a clear or a compaction.
+        """
+        if table is not self._table or table.generation != self._generation or table.start > self._start \
+                or self.files is None:
+            self._new_generation()
+            self._table, self._generation = table, table.generation
+            self._start, self._rows, self._strings, self._extras = table.start, 0, 0, 0
+        rows = table.rows_since(self._start + self._rows)
+        strings = table.strings_since(self._strings)
+        extras = table.extras_since(self._extras)
+        if len(rows):
+            with open(self.records_path, "ab") as f:
+                f.write(rows.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        for path, values in ((self.strings_path, strings), (self.extras_path, extras)):
+            if values:
+                with open(path, "a") as f:
+                    f.write("".join(json.dumps(s) + "\n" for s in values))
+                    f.flush()
+                    os.fsync(f.fileno())
+        self._rows += len(rows)
+        self._strings += len(strings)
+        self._extras += len(extras)
+        return len(rows)
+
+    def save(self, state):
+        """
+        Writes a snapshot of a main.simulation_state-shaped dict.
+        Returns the number of logger rows appended by this save.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        logger = state.get("logger")
+        appended = self._sync_logger(logger.table) if logger is not None else 0
+        dp = state.get("dual_portal")
+        core = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "running": state.get("running", False),
+            "dual_portal": dual_portal_state(dp) if dp is not None else None,
+            "hardware": {name: (type(obj).__name__, object_state(obj))
+                         for name, obj in state["hardware"].items()},
+            "logger": None if logger is None else {
+                "csv_filename": logger.csv_filename,
+                "json_filename": logger.json_filename,
+                "start": self._start,
+                "rows": self._rows,
+                "strings": self._strings,
+                "extras": self._extras,
+                "files": self.files
+            }
+        }
+        tmp = self.core_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(core, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.core_path)
+        if self.files != self._saved_files:
+            self._saved_files = self.files
+            self._remove_stale()
+        self.last_save = core["saved_at"]
+        return appended
+
+    def restore(self, state):
+        """
+        Loads the snapshot into a main.simulation_state-shaped dict in place.
+        Hardware objects are updated in place so existing references stay valid.
+        Returns True if a snapshot was restored; raises ValueError for a snapshot version
+        with no migration path.
+        """
+        if not self.exists():
+            return False
+        with open(self.core_path, "rb") as f:
+            core = pickle.load(f)
+        core = migrate(core, self)
+        state["running"] = core["running"]
+        state["dual_portal"] = restore_dual_portal(core["dual_portal"]) if core["dual_portal"] else None
+        for name, (cls_name, attrs) in core["hardware"].items():
+            obj = state["hardware"].get(name)
+            if obj is not None and type(obj).__name__ == cls_name:
+                obj.__dict__.update(attrs)
+        meta = core["logger"]
+        if meta is not None:
+            logger = state.get("logger") or SimulationLogger()
+            logger.csv_filename = meta["csv_filename"]
+            logger.json_filename = meta["json_filename"]
+            self._use_files(meta["files"])
+            self._saved_files = self.files
+            start = meta["start"]
+            table = RecordTable.from_segments(self._map_records(meta["rows"]),
+                                              self._read_lines(self.strings_path, meta["strings"]), start,
+                                              self._read_lines(self.extras_path, meta["extras"]))
+            logger.use_table(table)
+            state["logger"] = logger
+            self._table, self._generation = table, table.generation
+            self._start, self._rows = start, meta["rows"]
+            self._strings, self._extras = meta["strings"], meta["extras"]
+            self._remove_stale()
+        REVISION.bump()
+        self.restored = True
+        return True
+
+    def restore_once(self, state):
+        """Restores on the first call only; later calls are no-ops returning False."""
+        if self.checked:
+            return False
+        self.checked = True
+        return self.restore(state)
+
+    def _map_records(self, rows):
+        """Memory-maps the first `rows` committed records (copy-on-write, loaded lazily)."""
+        committed = rows * RECORD_DTYPE.itemsize
+        if os.path.getsize(self.records_path) > committed:
+            os.truncate(self.records_path, committed)   # Drop rows from an interrupted save
+        if rows == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        base = np.memmap(self.records_path, dtype=RECORD_DTYPE, mode="c", shape=(rows,))
+        base.flags.writeable = False
+        return base
+
+    @staticmethod
+    def _read_lines(path, count):
+        """Reads the first `count` committed JSON lines of a file, dropping any uncommitted tail."""
+        values = []
+        with open(path, "rb+") as f:
+            while len(values) < count:
+                values.append(json.loads(f.readline()))
+            f.truncate(f.tell())
+        return values
+
+if __name__ == "__main__":
+    import tempfile
+    from hardware import TemperatureSensor, ContactSensor, TeslaBattery, FailsafeBlock
+
+    def fresh_state():
+        return {"dual_portal": None, "config": None, "logger": None, "running": False,
+                "hardware": {"temp_sensor_1": TemperatureSensor("Portal1_Temp", -196.0),
+                             "battery": TeslaBattery(), "failsafe": FailsafeBlock()}}
+
+    state = fresh_state()
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=2.0)
+    dp.portal2.update_energy(dt=2.0)
+    dp.form_bridge(t=2.0)
+    state["dual_portal"] = dp
+    state["logger"] = SimulationLogger()
+    state["hardware"]["battery"].supply_power(13500)
+    for i in range(200000):
+        state["logger"].log_event("Tick", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength)
+
+    store = SessionStore(tempfile.mkdtemp())
+    start = time.perf_counter()
+    print("Rows appended by first save:", store.save(state), f"({time.perf_counter() - start:.3f} s)")
+    state["logger"].log_event("Transfer", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, True)
+    start = time.perf_counter()
+    print("Rows appended by second save:", store.save(state), f"({time.perf_counter() - start:.4f} s)")
+
+    woken = fresh_state()
+    start = time.perf_counter()
+    SessionStore(store.directory).restore(woken)
+    print(f"Restored in {time.perf_counter() - start:.4f} s")
+    print("Run:", woken["dual_portal"].run_id, "bridge:", woken["dual_portal"].bridge_strength)
+    print("Battery:", woken["hardware"]["battery"].status())
+    print("Records:", len(woken["logger"].records), woken["logger"].records[-1]["event"])
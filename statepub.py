@@ -0,0 +1,281 @@
+"""
+Version 3.8 — Shared-Memory State Publication Module
+Dual Portal Stargate Simulation System
+
+Publishes the live DualPortal, bridge and hardware state into a fixed-layout
+multiprocessing.shared_memory block so co-located processes (monitor renderers,
+loggers, safety watchdogs) can read it without HTTP, JSON or sockets. The block is a
+64-byte header followed by one STATE_DTYPE record. Writes are guarded by a seqlock:
+the writer makes the sequence number odd, writes the record and makes it even again;
+StateReader maps the block into NumPy views without copying and retries a read whenever
+the sequence was odd or changed underneath it, so every snapshot it returns is
+consistent. There is a single writer (the API process); readers never write. The
+header records the writer's PID: a new publisher takes over a block left behind by a
+process that has exited, and refuses to start while the owner is still running.
+"""
+
+import os
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = 0x53475350                  # "SGSP"
+LAYOUT_VERSION = 2
+HEADER_SIZE = 64                    # Sequence number on its own cache line
+
+HEADER_DTYPE = np.dtype([("magic", np.uint32), ("layout", np.uint32), ("seq", np.uint64),
+                         ("record_size", np.uint64), ("owner_pid", np.uint64)], align=True)
+
+PORTAL_DTYPE = np.dtype([
+    ("freq", np.float64),           # Hz
+    ("stability", np.float64),
+    ("energy", np.float64),         # J
+    ("power", np.float64),          # W
+    ("floor_temp", np.float64),     # °C
+    ("safety", np.bool_),
+    ("floor_contact", np.bool_),
+], align=True)
+
+STATE_DTYPE = np.dtype([
+    ("revision", np.int64),         # REVISION.value at publication
+    ("timestamp_us", np.int64),     # Epoch microseconds of publication
+    ("initialized", np.bool_),      # False until a DualPortal exists
+    ("run_id", "S40"),
+    ("portals", PORTAL_DTYPE, (2,)),
+    ("detune", np.float64),
+    ("bridge_strength", np.float64),
+    ("transfer_energy", np.float64),
+    ("sensor_temp", np.float64, (2,)),
+    ("sensor_contact", np.bool_, (2,)),
+    ("battery_charge_pct", np.float64),
+    ("battery_capacity_kWh", np.float64),
+    ("battery_failsafe", np.bool_),
+    ("failsafe_engaged", np.bool_),
+], align=True)
+
+BLOCK_SIZE = HEADER_SIZE + STATE_DTYPE.itemsize
+
+def _map(buf):
+    """Header and state record views over a block's buffer (no copies)."""
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buf)
+    state = np.ndarray((), dtype=STATE_DTYPE, buffer=buf, offset=HEADER_SIZE)
+    return header, state
+
+def _attach(name):
+    """
+    Attaches to an existing block. A standalone reader process must not leave it
+    registered with a resource tracker of its own, which would unlink the publisher's
+    block when the reader exits; processes sharing the publisher's tracker are left alone.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shared_tracker = resource_tracker._resource_tracker._fd is not None
+    shm = shared_memory.SharedMemory(name=name)
+    if not shared_tracker:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True                     # Exists, owned by another user
+    return True
+
+def _block_owner(name):
+    """PID recorded in an existing block's header, or None if it is not a layout-2 state block."""
+    shm = _attach(name)
+    try:
+        if shm.size < HEADER_SIZE:
+            return None
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        valid = int(header["magic"]) == MAGIC and int(header["layout"]) == LAYOUT_VERSION
+        pid = int(header["owner_pid"]) if valid else None
+        del header                      # Release the buffer export before closing
+        return pid
+    finally:
+        shm.close()
+
+class StatePublisher:
+    """
+    Single writer of the shared state block. Raises FileExistsError if a block of that
+    name belongs to a running process, or was not written by a StatePublisher of this layout.
+    """
+    def __init__(self, name="stargate_state"):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=BLOCK_SIZE)
+        except FileExistsError:
+            owner = _block_owner(name)
+            if owner is None:
+                raise FileExistsError(f"Shared memory block {name!r} exists but is not a layout "
+                                      f"{LAYOUT_VERSION} state block; remove it or choose another name") from None
+            if owner == os.getpid() or _pid_alive(owner):
+                raise FileExistsError(f"Shared memory block {name!r} is published by running process {owner}") from None
+            # Left behind by a process that did not shut down cleanly: take it over
+            shared_memory.SharedMemory(name=name).unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=BLOCK_SIZE)
+        self.name = self.shm.name
+        self._header, self._state = _map(self.shm.buf)
+        self._scratch = np.zeros((), dtype=STATE_DTYPE)
+        self._header["owner_pid"] = os.getpid()
+        self._header["record_size"] = STATE_DTYPE.itemsize
+        self._header["layout"] = LAYOUT_VERSION
+        self._header["magic"] = MAGIC
+        self.publications = 0
+
+    def publish(self, dp, hardware, revision=0):
+        """Writes one consistent snapshot of the live objects."""
+        s = self._scratch                       # Gathered outside the write window
+        s["revision"] = revision
+        s["timestamp_us"] = time.time_ns() // 1000
+        s["initialized"] = dp is not None
+        if dp is not None:
+            s["run_id"] = (dp.run_id or "").encode()[:40]
+            for i, portal in enumerate((dp.portal1, dp.portal2)):
+                s["portals"][i] = (portal.freq, portal.stability, portal.energy, portal.power,
+                                   portal.floor_temp, portal.safety_status, portal.floor_contact)
+            s["detune"] = dp.detune
+            s["bridge_strength"] = dp.bridge_strength
+            s["transfer_energy"] = dp.transfer_energy
+        s["sensor_temp"] = (hardware["temp_sensor_1"].value, hardware["temp_sensor_2"].value)
+        s["sensor_contact"] = (hardware["contact_sensor_1"].contact, hardware["contact_sensor_2"].contact)
+        battery = hardware["battery"]
+        s["battery_charge_pct"] = battery.charge_pct
+        s["battery_capacity_kWh"] = battery.capacity
+        s["battery_failsafe"] = battery.failsafe_engaged
+        s["failsafe_engaged"] = hardware["failsafe"].engaged
+
+        seq = int(self._header["seq"])
+        self._header["seq"] = seq + 1           # Odd: write in progress
+        self._state[...] = s
+        self._header["seq"] = seq + 2           # Even: record consistent
+        self.publications += 1
+        return seq + 2
+
+    @property
+    def seq(self):
+        return int(self._header["seq"])
+
+    def close(self, unlink=True):
+        self._header = self._state = None       # Release buffer exports before closing
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+class StateReader:
+    """
+    Zero-copy reader of a published state block.
+    `state` is a live NumPy view (fields may change between reads of two fields);
+    read() returns a consistent copy.
+    """
+    def __init__(self, name="stargate_state"):
+        self.shm = _attach(name)
+        self._header, self.state = _map(self.shm.buf)
+        if int(self._header["magic"]) != MAGIC or int(self._header["layout"]) != LAYOUT_VERSION:
+            raise ValueError(f"Shared memory block {name!r} is not a layout {LAYOUT_VERSION} state block")
+        self.retries = 0
+
+    @property
+    def seq(self):
+        """Sequence number of the last completed publication (odd while one is in progress)."""
+        return int(self._header["seq"])
+
+    def read(self, timeout=0.5):
+        """Consistent snapshot as a 0-d STATE_DTYPE array, plus its sequence number."""
+        deadline = None
+        attempts = 0
+        while True:
+            before = int(self._header["seq"])
+            if not before & 1:
+                snapshot = self.state.copy()
+                if int(self._header["seq"]) == before:
+                    return snapshot, before
+                self.retries += 1
+            attempts += 1
+            if attempts % 64 == 0:              # Writer may be descheduled mid-write: yield the CPU
+                deadline = deadline or time.monotonic() + timeout
+                if time.monotonic() > deadline:
+                    raise TimeoutError("State block is being written continuously; no consistent read")
+                time.sleep(0)
+
+    def wait(self, after, timeout=1.0, poll=0.0005):
+        """Waits for a publication newer than sequence `after`; returns (snapshot, seq) or None."""
+        deadline = time.monotonic() + timeout
+        while self.seq <= after:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+        return self.read()
+
+    def close(self):
+        self._header = self.state = None
+        self.shm.close()
+
+def snapshot_dict(snapshot):
+    """A read() snapshot as plain Python values (for logging or debugging)."""
+    result = {}
+    for name in STATE_DTYPE.names:
+        value = snapshot[name]
+        if name == "run_id":
+            result[name] = value.item().decode()
+        elif name == "portals":
+            result[name] = [{field: portal[field].item() for field in PORTAL_DTYPE.names} for portal in value]
+        else:
+            result[name] = value.tolist()
+    return result
+
+if __name__ == "__main__":
+    import multiprocessing
+    from dualportal import DualPortal
+    from hardware import TemperatureSensor, ContactSensor, TeslaBattery, FailsafeBlock
+
+    def watchdog(name, duration, out):
+        reader = StateReader(name)
+        reads, torn, last = 0, 0, -1
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            snapshot, seq = reader.read()
+            reads += 1
+            portals = snapshot["portals"]
+            # The writer keeps energy1 == energy2 == 1000 * bridge_strength; a torn read breaks that
+            if not (portals["energy"][0] == portals["energy"][1] == 1000 * snapshot["bridge_strength"]):
+                torn += 1
+            last = seq
+        out.put((reads, torn, reader.retries, last))
+        reader.close()
+
+    hardware = {"temp_sensor_1": TemperatureSensor("Portal1_Temp", -196.0),
+                "temp_sensor_2": TemperatureSensor("Portal2_Temp", -196.0),
+                "contact_sensor_1": ContactSensor("Portal1_Contact", True),
+                "contact_sensor_2": ContactSensor("Portal2_Contact", True),
+                "battery": TeslaBattery(), "failsafe": FailsafeBlock()}
+    dp = DualPortal()
+    dp.initialize_run()
+    publisher = StatePublisher("stargate_state_demo")
+    publisher.publish(dp, hardware)
+
+    out = multiprocessing.Queue()
+    reader_process = multiprocessing.Process(target=watchdog, args=(publisher.name, 1.0, out))
+    reader_process.start()
+    start = time.perf_counter()
+    while reader_process.is_alive() and time.perf_counter() - start < 2.0:
+        i = publisher.publications
+        dp.portal1.energy = dp.portal2.energy = 1000.0 * i
+        dp.bridge_strength = float(i)
+        publisher.publish(dp, hardware)
+    reads, torn, retries, last = out.get()
+    reader_process.join()
+    elapsed = time.perf_counter() - start
+    print(f"Writer: {publisher.publications / elapsed:,.0f} publications/s")
+    print(f"Reader: {reads:,} consistent reads in 1 s, {torn} torn, {retries} retries, last seq {last}")
+    reader = StateReader(publisher.name)
+    print(snapshot_dict(reader.read()[0])["portals"][0])
+    reader.close()
+    publisher.close()
@@ -0,0 +1,66 @@
+"""
+Tests for the safety alert bus
+"""
+
+import asyncio
+from alerts import AlertBus, DETACHED_ALERTS, failsafe_interlock, reset_failsafe
+from hardware import ContactSensor, FailsafeBlock
+from portal import Portal
+
+def test_debounce_publishes_leading_edge_and_settled_state():
+    """Flapping within the window is coalesced; the settled state follows once it ends"""
+    clock = [0.0]
+    bus = AlertBus(debounce=0.5, clock=lambda: clock[0])
+    failsafe = FailsafeBlock()
+    bus.subscribe(failsafe_interlock(failsafe))
+    assert bus.transition("p1", "floor_contact_lost", True) is not None and failsafe.engaged
+    for state in (False, True, False):
+        assert bus.transition("p1", "floor_contact_lost", state) is None
+    bus.flush()
+    assert bus.counts["published"] == 1
+    clock[0] = 0.6
+    bus.flush()
+    assert [e.active for e in bus.history] == [True, False] and bus.counts["coalesced"] == 3
+    assert bus.transition("p1", "floor_contact_lost", False) is None
+
+def test_async_delivery_is_priority_ordered():
+    """Queued events reach async subscribers critical-first regardless of publish order"""
+    async def scenario():
+        bus = AlertBus(debounce=0.0)
+        subscription = bus.subscribe_async("test")
+        bus.transition("battery", "battery_failsafe", True)
+        bus.transition("battery", "battery_failsafe", False)
+        bus.transition("p2", "floor_temp_high", True, severity="warning")
+        bus.transition("p1", "floor_contact_lost", True)
+        order = []
+        while (event := await subscription.get(timeout=0.01)) is not None:
+            order.append((event.source, event.severity))
+            subscription.delivered(event)
+        assert order == [("battery", "critical"), ("p1", "critical"), ("p2", "warning"), ("battery", "info")]
+        assert bus.summary()["latency"]["test"]["deliveries"] == 4
+    asyncio.run(scenario())
+
+def test_objects_publish_to_the_bus_they_are_attached_to():
+    """Unattached objects report to the detached bus; attach() and detach() move them"""
+    bus = AlertBus(debounce=0.0)
+    failsafe = FailsafeBlock()
+    bus.subscribe(failsafe_interlock(failsafe))
+    sensor = ContactSensor("Portal1_Contact", True)
+    sensor.update(False)
+    assert ("Portal1_Contact", "floor_contact_lost") in DETACHED_ALERTS.active() and not failsafe.engaged
+    sensor.attach(alerts=bus)
+    sensor.update(True)
+    portal = Portal(name="portal1").attach(alerts=bus)
+    portal.floor_sensor(contact=False)
+    assert failsafe.engaged and bus.active() == [("portal1", "floor_contact_lost")]
+    try:
+        reset_failsafe(failsafe, bus)
+        assert False, "reset with a raised condition"
+    except ValueError:
+        assert failsafe.engaged
+    portal.floor_sensor(contact=True)
+    reset_failsafe(failsafe, bus)
+    assert not failsafe.engaged
+    portal.detach()
+    portal.floor_sensor(contact=False)
+    assert bus.active() == [] and not failsafe.engaged
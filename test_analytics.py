@@ -0,0 +1,83 @@
+"""
+Tests for online run analytics
+"""
+
+import numpy as np
+from dualportal import DualPortal
+from logger import SimulationLogger
+from analytics import RunAnalytics
+from safetyrules import DEFAULT_RULES, SAFETY_RULES, compile_rules
+
+def _log(logger, n):
+    dp = DualPortal()
+    dp.initialize_run()
+    rng = np.random.default_rng(1)
+    for i in range(n):
+        dp.portal1.update_energy(dt=0.1)
+        dp.portal2.stability = float(rng.uniform(0.8, 1.0))
+        dp.form_bridge(t=0.1)
+        transfer = i % 4 == 0
+        logger.log_event("Transfer" if transfer else "Tick", f"run_{i % 3}", dp.portal1, dp.portal2,
+                         dp.bridge_strength, dp.transfer_payload() if transfer else None)
+    logger.log_event("Scan Error", "unknown", None, None, 0.0)
+
+def test_live_aggregates_match_full_scan():
+    """Per-event updates match statistics recomputed from all records"""
+    logger = SimulationLogger()
+    analytics = RunAnalytics(logger)
+    _log(logger, 300)
+    records = [r for r in logger.records if r["run_id"] == "run_1"]
+    summary = analytics.query("run_1")
+    strengths = np.array([r["bridge_strength"] for r in records])
+    assert summary["records"] == len(records) == sum(b["records"] for b in summary["histogram"]["buckets"])
+    assert np.isclose(summary["metrics"]["bridge_strength"]["mean"], strengths.mean())
+    assert np.isclose(summary["metrics"]["bridge_strength"]["variance"], strengths.var(ddof=1))
+    assert summary["metrics"]["portal2_stab"]["min"] == min(r["portal2_stab"] for r in records)
+    transfers = [r["transfer_result"] for r in records if r["transfer_result"] is not None]
+    assert summary["transfer_successes"] == sum(transfers) and summary["transfers"] == len(transfers)
+    assert summary["stability_excursions"] == sum(r["portal2_stab"] < 0.9 for r in records)
+    assert analytics.query()["metrics"]["portal1_freq"]["count"] == 300
+
+def test_catch_up_matches_live_updates():
+    """Aggregates folded in from existing rows equal the incrementally maintained ones"""
+    logger = SimulationLogger()
+    live = RunAnalytics(logger)
+    _log(logger, 200)
+    late = RunAnalytics(logger)
+    assert late.run_overview() == live.run_overview()
+    a, b = late.query("run_2"), live.query("run_2")
+    for name, stats in a["metrics"].items():
+        assert np.allclose([stats[k] for k in ("mean", "variance", "min", "max")],
+                           [b["metrics"][name][k] for k in ("mean", "variance", "min", "max")])
+    assert a["events"] == b["events"] and a["histogram"] == b["histogram"]
+    logger.clear()
+    assert live.query()["records"] == 0
+
+def test_excursions_follow_the_bridge_rules(monkeypatch):
+    """Stability excursions track the bridge degradation rule rather than a fixed floor"""
+    harsher = [dict(spec, when={"any": [["stability1", "<", 0.95], ["stability2", "<", 0.95]]})
+               if spec["name"] == "bridge_degraded" else spec for spec in DEFAULT_RULES]
+    monkeypatch.setattr(SAFETY_RULES, "stages", compile_rules(harsher))
+    logger = SimulationLogger()
+    analytics = RunAnalytics(logger)
+    _log(logger, 120)
+    records = [r for r in logger.records if r["run_id"] == "run_2"]
+    expected = sum(min(r["portal1_stab"], r["portal2_stab"]) < 0.95 for r in records)
+    assert analytics.query("run_2")["stability_excursions"] == expected
+    assert RunAnalytics(logger).query("run_2")["stability_excursions"] == expected
+
+def test_per_run_aggregates_are_capped_lru():
+    """Only the most recently logged runs keep per-run aggregates"""
+    logger = SimulationLogger()
+    analytics = RunAnalytics(logger, max_runs=3)
+    _log(logger, 30)                                   # run_0..2 interleaved, then "unknown"
+    assert list(analytics.runs) == ["run_1", "run_2", "unknown"] and analytics.evicted_runs == 1
+    assert analytics.query("run_0") is None
+    assert analytics.query()["records"] == 31
+    dp = DualPortal()
+    dp.initialize_run()
+    for i in range(500):
+        logger.log_event("Tick", f"burst_{i}", dp.portal1, dp.portal2, 0.0)
+    assert len(analytics.runs) == 3 and analytics.evicted_runs == 501
+    late = RunAnalytics(logger, max_runs=3)
+    assert list(late.run_overview()) == list(analytics.run_overview())
@@ -0,0 +1,98 @@
+"""
+Tests for the Merkle audit trail
+"""
+
+import json
+
+import numpy as np
+from logger import SimulationLogger, RecordTable
+from audit import AuditTrail, MerkleLog, verify_bundle, verify_consistency, leaf_hash
+
+def test_proofs_verify_against_checkpoints(tmp_path):
+    """Inclusion and consistency proofs verify for exported records and reject tampering"""
+    logger = SimulationLogger()
+    trail = AuditTrail(logger, str(tmp_path / "checkpoints.jsonl"), checkpoint_every=16)
+    for i in range(100):
+        logger.log_event("Tick", "run_1", None, None, i / 100, i % 2 == 0, f"step {i}")
+    assert [c["size"] for c in trail.checkpoints] == [16, 32, 48, 64, 80, 96]
+    exported = json.loads(json.dumps(logger.records[:]))
+    for index in (0, 15, 47, 99):
+        bundle = trail.inclusion(index, 96 if index < 96 else None)
+        bundle["record"] = exported[index]
+        assert verify_bundle(bundle)
+    first, last = trail.checkpoints[0], trail.checkpoints[-1]
+    proof = trail.consistency(first["size"], last["size"])
+    assert verify_consistency(first["size"], last["size"], bytes.fromhex(first["root"]),
+                              bytes.fromhex(last["root"]), [bytes.fromhex(p) for p in proof["proof"]])
+    bundle["record"]["bridge_strength"] = 0.5
+    assert not verify_bundle(bundle)
+
+def test_lazy_catch_up_matches_incremental_tree():
+    """A trail attached to an existing log hashes it on demand to the same root"""
+    logger = SimulationLogger()
+    live = AuditTrail(logger)
+    for i in range(37):
+        logger.log_event("Tick", "run_1", None, None, i)
+    late = AuditTrail(logger)
+    logger.log_event("Late", "run_1", None, None, 1.0)
+    assert late.summary()["root"] == live.summary()["root"]
+    tree = MerkleLog()
+    for record in logger.records:
+        tree.append(leaf_hash(record))
+    assert tree.root().hex() == live.summary()["root"]
+
+def _restarted(logger):
+    """A fresh logger over the retained records only, as a snapshot restore builds it."""
+    start, segments, strings, extras = logger.table.segments()
+    restored = SimulationLogger()
+    restored.use_table(RecordTable.from_segments(np.concatenate(segments), strings, start, extras))
+    return restored
+
+def test_checkpoints_survive_compaction_and_restart(tmp_path):
+    """Compaction seals the frontier; a restarted trail resumes the tree and still verifies old checkpoints"""
+    path = str(tmp_path / "checkpoints.jsonl")
+    logger = SimulationLogger()
+    trail = AuditTrail(logger, path, checkpoint_every=16)
+    for i in range(100):
+        logger.log_event("Tick", "run_1", None, None, i / 100)
+    logger.table.compact(40)
+    for i in range(20):
+        logger.log_event("Tock", "run_2", None, None, i / 20)
+    expected = trail.summary()
+
+    logger = _restarted(logger)
+    trail = AuditTrail(logger, path, checkpoint_every=16)
+    assert trail.verify_checkpoints() == []
+    summary = trail.summary()
+    assert (summary["epoch"], summary["root"], summary["floor"]) == (expected["epoch"], expected["root"], 40)
+    for i in range(30):
+        logger.log_event("Tick", "run_3", None, None, i / 30)
+    logger.table.compact(130)
+
+    logger = _restarted(logger)
+    trail = AuditTrail(logger, path, checkpoint_every=16)
+    assert trail.verify_checkpoints() == [] and trail.summary()["floor"] == 130
+    assert [c["size"] for c in trail.checkpoints] == list(range(16, 150, 16))
+    with open(path) as f:
+        entries = [json.loads(line) for line in f]
+    entries[0]["root"] = entries[1]["root"]             # Tamper with a checkpoint long compacted away
+    with open(path, "w") as f:
+        f.write("".join(json.dumps(e) + "\n" for e in entries))
+    assert AuditTrail(_restarted(logger), path).verify_checkpoints() == [16]
+
+def test_memory_stays_flat_across_compactions(tmp_path):
+    """Each seal prunes the tree and checkpoints, so steady logging plus compaction holds steady memory"""
+    logger = SimulationLogger()
+    trail = AuditTrail(logger, str(tmp_path / "checkpoints.jsonl"), checkpoint_every=16)
+    held = []
+    for round in range(12):
+        for i in range(100):
+            logger.log_event("Tick", f"run_{round}", None, None, i / 100)
+        logger.table.compact(len(logger.table) - 20)
+        held.append((trail.tree.nodes_held, len(trail.checkpoints), len(trail.frontiers)))
+    assert max(n for n, _, _ in held[2:]) <= 2 * min(n for n, _, _ in held[2:]) < 200
+    assert all(c <= 2 and f == 1 for _, c, f in held)
+    assert trail.verify_checkpoints() == [] and trail.summary()["floor"] == 1180
+    logger.log_event("Tock", "run_12", None, None, 0.5)
+    bundle = trail.inclusion(len(logger.table) - 1)
+    assert verify_bundle(bundle)
@@ -0,0 +1,86 @@
+"""
+Tests for copy-on-write session branches
+"""
+
+from alerts import ALERTS, AlertBus
+from branches import BranchManager, session_metrics
+from dualportal import DualPortal
+from hardware import TemperatureSensor, TeslaBattery, FailsafeBlock
+from logger import SimulationLogger
+from revision import REVISION, RevisionCounter
+from scheduler import transfer_cost
+
+def _session(records=1000):
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=1.0)
+    dp.portal2.update_energy(dt=1.0)
+    dp.form_bridge(t=1.0)
+    hardware = {"temp_sensor_1": TemperatureSensor("Portal1_Temp", -196.0),
+                "battery": TeslaBattery(), "failsafe": FailsafeBlock()}
+    logger = SimulationLogger()
+    for i in range(records):
+        logger.log_event("Tick", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength)
+    return dp, hardware, logger
+
+def test_branches_share_history_and_run_independently():
+    """Forks reference the parent's records; branch and live appends stay separate"""
+    dp, hardware, logger = _session()
+    live = session_metrics(dp, hardware)
+    manager = BranchManager()
+    a = manager.fork(dp, hardware, logger, "a")
+    b = manager.fork(dp, hardware, logger, "b")
+    assert a.logger.table.segments()[1][0].base is logger.table.segments()[1][0].base   # Not copied
+    a.apply("set_detune", detune=0.5)
+    a.apply("form_bridge", t=1.0)
+    assert a.apply("transfer_payload")["energy_used"] == transfer_cost(a.dual_portal, 1, manager.transfer_seconds)
+    logger.log_event("Live", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength)
+    assert session_metrics(dp, hardware) == live and b.metrics() == live
+    assert len(a.logger.records) == 1003 and len(b.logger.records) == 1000 and len(logger.records) == 1001
+    assert a.logger.records[999] == logger.records[999] and a.logger.records[-1]["event"] == "Branch Transfer"
+    assert a.transfers() == {"transfers": 1, "transfer_successes": 1}
+    assert a.metrics()["battery_charge_pct"] < live["battery_charge_pct"]
+    c = manager.fork_branch(a.id, "c")
+    assert c.parent == a.id and c.metrics()["detune"] == 0.5 and len(c.logger.records) == 1003
+    comparison = manager.compare([a.id, b.id], baseline=live)
+    assert comparison["branches"][0]["delta"]["detune"] == 0.5 - dp.detune
+    manager.discard(b.id)
+    assert list(manager.branches) == [a.id, c.id]
+
+def test_branch_safety_events_stay_in_the_branch():
+    """A what-if floor excursion engages only the branch's failsafe and revision"""
+    dp, hardware, logger = _session(10)
+    branch = BranchManager().fork(dp, hardware, logger)
+    published, revision = ALERTS.counts["published"], REVISION.value
+    branch.apply("floor_sensor", portal=1, temp=-150.0)
+    assert REVISION.value == revision and ALERTS.counts["published"] == published
+    assert branch.hardware["failsafe"].engaged and not hardware["failsafe"].engaged
+    assert not branch.dual_portal.portal1.safety_status and dp.portal1.safety_status
+    assert branch.summary()["alerts"] == [{"source": "portal1", "kind": "floor_temp_high"}]
+    assert branch.revision.value > 0
+
+def test_branches_report_history_pinned_past_compaction():
+    """Rows compacted from the live logger stay pinned by the branches forked before it"""
+    dp, hardware, logger = _session(100)
+    manager = BranchManager(transfer_seconds=2.0)
+    early = manager.fork(dp, hardware, logger)
+    logger.table.compact(60)
+    late = manager.fork(dp, hardware, logger)
+    assert early.pinned_records(logger.table) == 60 and late.pinned_records(logger.table) == 0
+    assert manager.pinned_records(logger.table) == 60 and len(early.logger.records) == 100
+    manager.discard(early.id)
+    assert manager.pinned_records(logger.table) == 0
+
+def test_pooled_reset_keeps_session_bindings():
+    """Resetting to fresh construction state keeps a pair attached where it was"""
+    dp, _, _ = _session(0)
+    counter = RevisionCounter()
+    bus = AlertBus(debounce=0.0)
+    dp.attach(counter, bus)
+    dp.reset(freq1=31.0)
+    revision, published = REVISION.value, ALERTS.counts["published"]
+    dp.portal1.floor_sensor(temp=-150.0)
+    dp.bridge_strength = 0.5
+    assert REVISION.value == revision and ALERTS.counts["published"] == published
+    assert counter.value > 0 and bus.active() == [("portal1", "floor_temp_high")]
+    assert dp.portal1.freq == 31.0 and dp.run_id is None
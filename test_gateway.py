@@ -0,0 +1,94 @@
+"""
+Tests for the hardware gateway client and stand-in server
+"""
+
+import asyncio
+import pytest
+from alerts import AlertBus, failsafe_interlock, reset_failsafe
+from gateway import GatewayServer, GatewayClient, GatewayError, HardwareMirror, default_devices
+from revision import RevisionCounter
+
+def test_batched_reads_share_pooled_connections():
+    """Concurrent batched reads reuse at most pool_size connections and mirror changes"""
+    async def scenario():
+        server = await GatewayServer(latency=0.01).start()
+        client = GatewayClient(port=server.port, pool_size=2)
+        try:
+            results = await asyncio.gather(*(client.read_many(list(server.devices)) for _ in range(10)))
+            assert all(r["battery"]["charge_pct"] == 100.0 for r in results)
+            assert client.stats["connects"] == 2 and server.requests == 10
+            assert await client.call("failsafe", "test") is None
+            hardware = default_devices()
+            await HardwareMirror(client, hardware).poll()
+            assert hardware["failsafe"].engaged
+        finally:
+            await client.close()
+            await server.stop()
+    asyncio.run(scenario())
+
+def test_timeouts_retry_reads_but_not_commands():
+    """Slow reads are retried then fail; a timed-out command is not resent"""
+    async def scenario():
+        server = await GatewayServer(latency=0.2).start()
+        client = GatewayClient(port=server.port, timeout=0.05, retries=2, backoff=0.0)
+        try:
+            with pytest.raises(GatewayError):
+                await client.read_many(["temp_sensor_1"])
+            assert client.stats["retries"] == 2 and client.stats["timeouts"] == 3
+            with pytest.raises(GatewayError):
+                await client.call("battery", "supply_power", 1000.0)
+            assert client.stats["timeouts"] == 4
+            server.latency = 0.0
+            assert (await client.read_many(["contact_sensor_1"]))["contact_sensor_1"] is True
+        finally:
+            await client.close()
+            await server.stop()
+    asyncio.run(scenario())
+
+def test_mirrored_battery_failsafe_raises_the_alert_and_interlock():
+    """A low-battery reading from the gateway alerts, engages the failsafe and blocks its reset"""
+    async def scenario():
+        devices = default_devices()
+        devices["battery"].set_state(1.0, 5.0)
+        server = await GatewayServer(devices).start()
+        client = GatewayClient(port=server.port)
+        hardware, bus = default_devices(), AlertBus(debounce=0.0)
+        for name in ("temp_sensor_1", "temp_sensor_2", "contact_sensor_1", "contact_sensor_2", "battery"):
+            hardware[name].attach(RevisionCounter(), bus)
+        bus.subscribe(failsafe_interlock(hardware["failsafe"]), channel="failsafe")
+        try:
+            await HardwareMirror(client, hardware).poll()
+            assert ("battery", "battery_failsafe") in bus.active()
+            assert hardware["battery"].failsafe_engaged and hardware["failsafe"].engaged
+            with pytest.raises(ValueError):
+                reset_failsafe(hardware["failsafe"], bus)
+            devices["battery"].set_state(13.5, 100.0)
+            await HardwareMirror(client, hardware).poll()
+            assert bus.active() == [] and hardware["failsafe"].engaged    # Latched until reset
+            reset_failsafe(hardware["failsafe"], bus)
+            assert not hardware["failsafe"].engaged
+        finally:
+            await client.close()
+            await server.stop()
+    asyncio.run(scenario())
+
+def test_mirror_applies_readings_under_the_session_lock():
+    """A poll reads immediately but waits for the lock before touching local hardware"""
+    async def scenario():
+        devices = default_devices()
+        devices["contact_sensor_1"].update(False)
+        server = await GatewayServer(devices).start()
+        client = GatewayClient(port=server.port)
+        hardware, lock = default_devices(), asyncio.Lock()
+        mirror = HardwareMirror(client, hardware, lock=lock)
+        try:
+            async with lock:
+                poll = asyncio.create_task(mirror.poll())
+                await asyncio.sleep(0.2)
+                assert not poll.done() and hardware["contact_sensor_1"].contact is True
+            await poll
+            assert hardware["contact_sensor_1"].contact is False and mirror.polls == 1
+        finally:
+            await client.close()
+            await server.stop()
+    asyncio.run(scenario())
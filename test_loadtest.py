@@ -0,0 +1,18 @@
+"""
+Tests for load test accounting and saturation detection
+"""
+
+from loadtest import StageRecorder, saturated
+
+def test_late_and_dropped_ticks_trip_saturation():
+    """Tick gaps beyond one interval count as late/dropped and break the objectives"""
+    recorder = StageRecorder()
+    for gap in [None, 1.0, 1.02, 1.9, 3.1] + [1.0] * 15:
+        recorder.tick("/ws", gap)
+    recorder.latencies["GET /api/status"] = [0.01] * 99 + [0.5]
+    stage = recorder.report(seconds=20)
+    assert stage["websockets"]["/ws"]["late"] == 2 and stage["websockets"]["/ws"]["dropped"] == 3
+    assert saturated(stage, max_late_pct=20.0) == []
+    assert saturated(stage) == ["/ws 10.5% late ticks"]
+    recorder.latencies["GET /api/status"] += [0.5] * 10
+    assert saturated(recorder.report(seconds=20), max_late_pct=20.0) == ["GET /api/status p95 500 ms"]
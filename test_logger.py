@@ -0,0 +1,108 @@
+"""
+Tests for the compact SimulationLogger record table
+"""
+
+import csv
+import gzip
+import io
+import json
+from logger import SimulationLogger, make_log_entry, RECORD_DTYPE, LOG_FIELDS, EXTRA_DEDUPE, iter_export
+from dualportal import DualPortal
+
+def _logged_run():
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=1.0)
+    dp.portal2.update_energy(dt=1.0)
+    dp.form_bridge(t=1.0)
+    logger = SimulationLogger()
+    logger.log_event("Start Run", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, None, "Run initialized")
+    logger.log_event("Transfer Attempt", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, dp.transfer_payload())
+    return dp, logger
+
+def test_records_view_matches_log_entries():
+    """records behaves like the former list of make_log_entry dicts"""
+    dp, logger = _logged_run()
+    expected = make_log_entry(logger.records[0]["timestamp"], "Start Run", dp.run_id,
+                              dp.portal1, dp.portal2, dp.bridge_strength, None, "Run initialized")
+    assert len(logger.records) == 2
+    assert logger.records[0] == expected
+    assert logger.records[-1]["transfer_result"] is True
+    assert logger.records[-1]["extra"] == ""
+    assert [r["event"] for r in logger.records] == ["Start Run", "Transfer Attempt"]
+    assert logger.records[-10:] == list(logger.records)
+    json.dumps(logger.records[:])
+
+def test_append_dict_and_clear():
+    """Legacy dict appends round-trip, and clear empties the table and string pool"""
+    dp, logger = _logged_run()
+    entry = dict(logger.records[1], event="Manual")
+    logger.records.append(entry)
+    assert logger.records[2] == entry
+    logger.clear()
+    assert not logger.records
+    assert len(logger.table._strings) == 1 and logger.table.extras_since(0) == [""]
+
+def test_strings_are_interned_and_rows_compact():
+    """Repeated run ids and events share one string entry; rows stay fixed-width"""
+    dp, logger = _logged_run()
+    for _ in range(5000):
+        logger.log_event("Bridge Update", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, None, "Bridge formed")
+    assert len(logger.table._strings) == 5   # None, 3 events, run id
+    assert logger.table.extras_since(0) == ["", "Run initialized", "Bridge formed"]
+    assert logger.table.nbytes() == len(logger.records) * RECORD_DTYPE.itemsize < 100 * len(logger.records)
+
+def test_unique_extras_stay_out_of_the_string_table():
+    """Per-call messages go to the extra pool, which forks share until they add their own"""
+    dp, logger = _logged_run()
+    for i in range(EXTRA_DEDUPE + 10):
+        logger.log_event("Tick", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, None, f"step {i}")
+    logger.log_event("Tick", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, None, f"step {EXTRA_DEDUPE + 9}")
+    table = logger.table
+    assert len(table._strings) == 5 and len(table.extras_since(0)) == EXTRA_DEDUPE + 12
+    assert logger.records[-1]["extra"] == logger.records[-2]["extra"] == f"step {EXTRA_DEDUPE + 9}"
+    fork = table.fork()
+    assert fork.segments()[3] is table.segments()[3]
+    fork.append_values(0, "Tick", dp.run_id, None, None, 0.0, None, "branch only")
+    assert fork.row(len(fork) - 1)["extra"] == "branch only" and "branch only" not in table.extras_since(0)
+    assert fork.row(len(table) - 1)["extra"] == logger.records[-1]["extra"]
+
+def test_compact_drops_unused_pool_entries():
+    """Compaction keeps only the strings and messages retained rows use; forks keep the old pools"""
+    logger = SimulationLogger()
+    for i in range(10):
+        logger.log_event("Tick", f"run_{i}", None, None, 0.0, None, f"step {i}")
+    fork = logger.table.fork()
+    kept = logger.records[8:]
+    assert logger.table.compact(8) == 8
+    assert logger.table.strings_since(0) == [None, "Tick", "run_8", "run_9"]
+    assert logger.table.extras_since(0) == ["", "step 8", "step 9"]
+    assert logger.records[:] == kept and logger.table.lookup("run_3") == -1
+    logger.log_event("Tick", "run_3", None, None, 0.0, None, "step 8")
+    assert logger.records[-1]["run_id"] == "run_3" and logger.records[-1]["extra"] == "step 8"
+    assert fork.row(3)["run_id"] == "run_3" and fork.row(9)["extra"] == "step 9"
+
+def test_missing_portals_are_logged_as_null():
+    """Error paths that log without portals produce JSON-safe nulls"""
+    logger = SimulationLogger()
+    logger.log_event("Portal Scan Error", "unknown", None, None, 0.0, None, "boom")
+    assert logger.records[0]["portal1_freq"] is None
+    json.dumps(logger.records[:], allow_nan=False)
+
+def test_streamed_exports_match_records():
+    """Chunked CSV/NDJSON exports equal the materialized records, with run and time filters"""
+    dp, logger = _logged_run()
+    for i in range(250):
+        logger.log_event("Tick", f"run_{i % 2}", dp.portal1 if i % 3 else None, dp.portal2, dp.bridge_strength)
+    logger.records.append(dict(logger.records[0], timestamp="2030-01-01T00:00:00"))
+    expected = io.StringIO()
+    writer = csv.DictWriter(expected, LOG_FIELDS)
+    writer.writeheader()
+    writer.writerows(logger.records)
+    assert "".join(iter_export(logger.table, "csv", chunk_rows=64)) == expected.getvalue()
+    lines = gzip.decompress(b"".join(logger.stream("ndjson", compress=True))).decode().splitlines()
+    assert [json.loads(line) for line in lines] == logger.records[:]
+    run_1 = [json.loads(line) for line in "".join(logger.stream("ndjson", run_id="run_1")).splitlines()]
+    assert len(run_1) == 125 and {r["run_id"] for r in run_1} == {"run_1"}
+    last = logger.table.column("timestamp")[-1]
+    assert "".join(logger.stream("ndjson", start_us=int(last))).count("\n") == 1
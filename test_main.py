@@ -0,0 +1,187 @@
+"""
+Tests for the FastAPI endpoints (driven in-process, without the startup background loops)
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from dualportal import DualPortal
+from hardware import TemperatureSensor
+from logger import SimulationLogger
+from profiles import ProfileStore
+from resultcache import ResultCache
+from revision import REVISION
+from snapshot import SessionStore
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "session_store", SessionStore(str(tmp_path / "snapshots")))
+    monkeypatch.setitem(main.simulation_state, "config", ProfileStore(str(tmp_path / "profiles.json")).active)
+    monkeypatch.setitem(main.simulation_state, "logger", SimulationLogger())
+    monkeypatch.setitem(main.simulation_state, "dual_portal", None)
+    monkeypatch.setattr(main.scheduler, "logger", main.simulation_state["logger"])
+    monkeypatch.setattr(main, "session_lock", asyncio.Lock())     # Fresh per test: each test has its own loop
+    monkeypatch.setattr(main.scheduler, "lock", main.session_lock)
+    return TestClient(main.app)
+
+def test_status_etag_and_long_poll(client):
+    """Unchanged live state revalidates with 304; only live objects move the revision"""
+    client.post("/api/initialize")
+    first = client.get("/api/status")
+    etag = first.headers["etag"]
+    assert first.json()["revision"] == REVISION.value
+    assert client.get("/api/status", headers={"If-None-Match": etag}).status_code == 304
+    pooled, replayed = DualPortal(), DualPortal()           # Not attached to the live session
+    pooled.reset(freq1=31.0)
+    replayed.portal1.update_energy(dt=5.0)
+    assert client.get("/api/status", headers={"If-None-Match": etag}).status_code == 304
+    start = time.perf_counter()
+    waited = client.get("/api/status", params={"wait_for_revision": REVISION.value, "timeout": 0.2})
+    assert waited.headers["etag"] == etag and time.perf_counter() - start >= 0.2
+    client.post("/api/update_energy", params={"dt": 1.0})
+    changed = client.get("/api/status", params={"wait_for_revision": first.json()["revision"], "timeout": 5})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert changed.json()["portal1"]["energy"] > first.json()["portal1"]["energy"]
+    released = main.simulation_state["dual_portal"]
+    client.post("/api/initialize")                          # The previous pair goes back to the pool
+    revision = REVISION.value
+    released.portal1.energy = 1.0
+    assert REVISION.value == revision
+    safety = client.get("/api/safety_status")
+    assert client.get("/api/safety_status", headers={"If-None-Match": safety.headers["etag"]}).status_code == 304
+
+def test_transfer_budget_and_portal_validation(client, monkeypatch):
+    """Transfers draw a per-transfer cost however much energy accumulated; bad portals are refused"""
+    battery = main.simulation_state["hardware"]["battery"]
+    monkeypatch.setattr(battery, "charge_pct", 100.0)
+    monkeypatch.setattr(battery, "failsafe_engaged", False)
+    client.post("/api/initialize")
+    client.post("/api/form_bridge", params={"t": 600.0})
+    for _ in range(8):
+        result = client.post("/api/transfer_payload").json()
+        assert result["energy_used"] == (main.simulation_state["dual_portal"].portal1.power if result["transfer_result"] else 0.0)
+    assert battery.charge_pct > 97.0
+    assert client.post("/api/transfer_payload", params={"portal": 3}).json()["status"] == "error"
+
+def test_batch_rolls_back_and_excludes_other_writers(client):
+    """A failed atomic batch restores portal, bridge and hardware state; writers wait for the lock"""
+    client.post("/api/initialize")
+    dp = main.simulation_state["dual_portal"]
+    battery = main.simulation_state["hardware"]["battery"]
+    before = (dp.portal1.energy, dp.portal2.freq, dp.bridge_strength, battery.charge_pct)
+    result = client.post("/api/batch", json={"operations": [
+        {"op": "update_energy", "params": {"dt": 600.0}},
+        {"op": "form_bridge", "params": {"t": 1.0}},
+        {"op": "update_parameters", "params": {"frequency2": 31.0}},
+        {"op": "transfer_payload"},
+        {"op": "update_parameters", "params": {"power1": 1.0}}]}).json()
+    assert result["failed_at"] == 4 and result["rolled_back"]
+    assert result["results"][3]["result"]["transfer_result"]
+    assert main.simulation_state["dual_portal"] is dp
+    assert (dp.portal1.energy, dp.portal2.freq, dp.bridge_strength, battery.charge_pct) == before
+    result = client.post("/api/batch", json={"operations": [
+        {"op": "initialize"}, {"op": "bogus"}]}).json()
+    assert result["rolled_back"] and main.simulation_state["dual_portal"] is dp
+
+    async def contend():
+        async with main.session_lock:                       # As a running batch holds it
+            writer = asyncio.create_task(main.update_energy(dt=5.0))
+            await asyncio.sleep(0.05)
+            assert not writer.done() and dp.portal1.energy == before[0]
+        assert (await writer)["status"] == "success"
+    asyncio.run(contend())
+    assert dp.portal1.energy > before[0]
+
+def test_failsafe_interlock_follows_only_the_live_session(client, monkeypatch):
+    """Detached portals and sensors never trip the live failsafe; it latches until an explicit reset"""
+    failsafe = main.simulation_state["hardware"]["failsafe"]
+    monkeypatch.setattr(failsafe, "engaged", False)
+    client.post("/api/initialize")
+    DualPortal().portal1.floor_sensor(temp=-150.0)          # Pooled/replay/sweep copies
+    TemperatureSensor("Sweep_Temp").update(-150.0)
+    assert not failsafe.engaged and client.get("/api/alerts").json()["alerts"]["active"] == []
+    live = main.simulation_state["dual_portal"].portal1
+    live.floor_sensor(temp=-150.0)
+    assert failsafe.engaged
+    refused = client.post("/api/failsafe/reset").json()
+    assert refused["status"] == "error" and "portal1: floor_temp_high" in refused["message"] and failsafe.engaged
+    live.floor_sensor(temp=-196.0)
+    assert failsafe.engaged                                 # Clearing the condition does not release it
+    assert client.post("/api/failsafe/reset").json() == {"status": "success", "failsafe_engaged": False}
+
+def test_sensitivity_clamps_samples_and_workers(client, monkeypatch, tmp_path):
+    """Oversized requests are clamped before they reach the analysis or the cache key"""
+    monkeypatch.setattr(main, "result_cache", ResultCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(main, "SENSITIVITY_MAX_SAMPLES", 64)
+    params = {"method": "morris", "samples": 10**9, "workers": 10**6, "seed": 3}
+    first = client.post("/api/sensitivity", params=params).json()
+    assert first["trajectories"] == 64 and first["workers"] == main.SENSITIVITY_MAX_WORKERS
+    assert not first["cached"]
+    again = client.post("/api/sensitivity", params=dict(params, samples=64, workers=-5)).json()
+    assert again["cached"] and again["workers"] == 1 and again["mu_star"] == first["mu_star"]
+
+def test_plot_size_and_limit_are_clamped(client, monkeypatch):
+    """Oversized charts and zero/negative limits render as the clamped request"""
+    monkeypatch.setattr(main, "plot_renderer", main.PlotRenderer(workers=0))
+    logger = main.simulation_state["logger"]
+    for i in range(5):
+        logger.log_event("form_bridge", "run_1", None, None, 0.1 * i)
+    huge = client.get("/api/plots/bridge_history", params={"width": 1e6, "height": -3, "limit": -5})
+    clamped = client.get("/api/plots/bridge_history", params={"width": main.PLOT_MAX_INCHES, "height": 1, "limit": 1})
+    assert huge.status_code == 200 and huge.content.startswith(b"\x89PNG")
+    assert huge.headers["content-location"] == clamped.headers["content-location"]
+    assert clamped.headers["x-plot-cache"] == "hit"
+
+def test_state_publish_loop_survives_errors(monkeypatch, capsys):
+    """A failing publication is logged and the loop keeps publishing later revisions"""
+    calls = []
+
+    class Flaky:
+        def publish(self, dp, hardware, revision):
+            calls.append(revision)
+            if len(calls) == 1:
+                raise RuntimeError("block unmapped")
+
+    monkeypatch.setattr(main, "STATE_SHM_HEARTBEAT", 0.01)
+
+    async def scenario():
+        task = asyncio.create_task(main.publish_state_loop(Flaky()))
+        while len(calls) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+    asyncio.run(asyncio.wait_for(scenario(), 5.0))
+    assert "block unmapped" in capsys.readouterr().out
+
+def test_profile_watch_loop_survives_reload_errors(monkeypatch, capsys):
+    """An unexpected reload failure is logged and the watcher keeps polling"""
+    polls = []
+
+    class Broken:
+        def reload_if_changed(self):
+            polls.append(1)
+            raise TypeError("unexpected profile shape")
+
+    monkeypatch.setattr(main, "profile_store", Broken())
+    monkeypatch.setattr(main, "CONFIG_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(main, "session_lock", asyncio.Lock())
+
+    async def scenario():
+        task = asyncio.create_task(main.profile_watch_loop())
+        while len(polls) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+    asyncio.run(asyncio.wait_for(scenario(), 5.0))
+    assert "unexpected profile shape" in capsys.readouterr().out
+
+def test_load_payload_defaults_and_validation(client):
+    """An empty body keeps the 0.1 m³ / 75 kg payload; one given size derives the other; bad sizes fail"""
+    client.post("/api/initialize")
+    empty = client.post("/api/load_payload", json={}).json()
+    assert empty["payload"] == {"type": "Gold", "volume": 0.1, "mass": 75.0}
+    derived = client.post("/api/load_payload", json={"payload_type": "Water", "payload_mass": 50.0}).json()
+    assert derived["payload"]["volume"] == 0.05
+    assert client.post("/api/load_payload", json={"payload_volume": -1}).json()["status"] == "error"
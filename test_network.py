@@ -0,0 +1,65 @@
+"""
+Tests for the batched bridge formula and multi-portal network routing
+"""
+
+import numpy as np
+from dualportal import DualPortal, bridge_strength
+from network import PortalNetwork
+from safetyrules import DEFAULT_RULES, SAFETY_RULES, compile_rules
+
+def test_batched_formula_matches_form_bridge():
+    """bridge_strength reproduces DualPortal.form_bridge across stability/safety regimes"""
+    for stab1, stab2, safe2 in [(1.0, 1.0, True), (0.85, 1.0, True), (0.95, 0.8, True), (1.0, 1.0, False)]:
+        dp = DualPortal()
+        dp.initialize_run()
+        dp.portal1.update_energy(dt=3.0)
+        dp.portal2.update_energy(dt=2.0)
+        dp.portal1.stability, dp.portal2.stability, dp.portal2.safety_status = stab1, stab2, safe2
+        dp.form_bridge(t=1.0)
+        batched = bridge_strength(dp.portal1.energy, dp.portal2.energy, stab1, stab2, True, safe2, dp.detune)
+        assert np.isclose(batched, dp.bridge_strength)
+
+def test_incremental_updates_match_full_recompute():
+    """Updating one portal only rescoring its links gives the same strengths as a full pass"""
+    rng = np.random.default_rng(0)
+    net = PortalNetwork()
+    net.add_portals(200, freq=32.0 + rng.uniform(-0.2, 0.2, 200), energy=rng.uniform(1e4, 3e4, 200))
+    net.add_links(rng.integers(0, 100, 400), rng.integers(100, 200, 400))
+    before = net.recomputed_links
+    net.update_portals(5, stability=0.5)
+    net.update_portals([7, 150], energy=5000.0, safety=False)
+    assert net.recomputed_links - before < len(net.src) / 10
+    incremental = net.strength.copy()
+    net.recompute_all()
+    assert np.array_equal(incremental, net.strength)
+
+def test_routing_prefers_strong_multi_hop_paths():
+    """Transfers route around weak links and fail when no transfer-grade path exists"""
+    net = PortalNetwork()
+    net.add_portals(4, energy=27000.0)
+    net.add_links([0, 1, 2, 0], [1, 2, 3, 3])
+    net.update_portals(3, freq=38.0)           # 6 Hz detune on the direct link 0 -> 3
+    net.update_portals(2, freq=35.0)           # 3 Hz steps via 1 and 2 stay transfer-grade
+    result = net.transfer(0, 3)
+    assert result["success"] and result["path"] == [0, 1, 2, 3]
+    assert all(s >= 0.9 for s in result["hop_strengths"])
+    net.update_portals(1, safety=False)
+    net.update_portals(3, freq=32.0)
+    assert net.transfer(0, 3)["path"] == [0, 3]
+    net.update_portals(3, safety=False)
+    assert not net.transfer(0, 3)["success"]
+
+def test_routing_follows_the_transfer_rules(monkeypatch):
+    """Transfer-grade links are whatever the transfer rule stage allows, not a local copy"""
+    net = PortalNetwork()
+    net.add_portals(3, energy=27000.0)
+    net.add_links([0, 1, 0], [1, 2, 2])
+    net.update_portals(1, freq=35.0)
+    net.update_portals(2, freq=38.0)           # Direct 6 Hz link is below transfer grade
+    assert net.transfer(0, 2)["path"] == [0, 1, 2]
+    relaxed = [dict(spec, when=["strength", ">=", 0.0]) if spec["name"] == "transfer_acceptable" else spec
+               for spec in DEFAULT_RULES]
+    monkeypatch.setattr(SAFETY_RULES, "stages", compile_rules(relaxed))
+    net.update_portals(1, safety=False)
+    result = net.transfer(0, 2)
+    assert result["success"] and result["path"] == [0, 2]
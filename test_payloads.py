@@ -0,0 +1,54 @@
+"""
+Tests for the material payload library
+"""
+
+import numpy as np
+import pytest
+
+from portal import Portal
+from payloads import MaterialLibrary, PAYLOADS, manifest_totals
+
+def test_vectorized_tuning_matches_portal_sense_payload():
+    """Manifest tuning agrees with per-portal tuning and derives volume from density"""
+    names = ["Gold", "Human", "Polymer", "Gold"]
+    volume = np.array([0.2, np.nan, 0.05, np.nan])
+    mass = np.array([60.0, 75.0, np.nan, 19.3])
+    tuning = PAYLOADS.tune(names, volume, mass)
+    assert np.isclose(tuning["volume"][1], 75.0 / 985.0) and np.isclose(tuning["volume"][3], 0.001)
+    assert np.isclose(tuning["mass"][2], 0.05 * 950.0)
+    for i, name in enumerate(names):
+        portal = Portal()
+        portal.sense_payload(volume=tuning["volume"][i], mass=tuning["mass"][i], material=name)
+        assert np.isclose(portal.freq, tuning["freq"][i])
+    assert np.isclose(tuning["heat_load"][1], 100.0) and tuning["heat_load"][0] == 0.0
+    totals = manifest_totals(tuning)
+    assert totals["materials"] == {"Human": 1, "Gold": 2, "Polymer": 1}
+    assert np.isclose(totals["total_energy_required"], tuning["energy_required"].sum())
+
+def test_library_registration_and_unknown_materials():
+    """Materials can be added or replaced; unknown names are rejected"""
+    library = MaterialLibrary({"Human": (985.0, 1.0, 1.0, 1.0, 3500.0)})
+    assert library.register("Osmium", 22590.0, 0.9) == 1
+    assert library.register("Osmium", 22590.0, 0.8) == 1
+    assert library.tune_one("Osmium", volume=1.0)["freq"] == pytest.approx(32.0 * 0.8)
+    with pytest.raises(ValueError):
+        library.tune(["Human", "Unobtanium"])
+
+def test_tuning_rejects_bad_inputs_and_reports_energy_in_joules():
+    """Non-positive sizes and out-of-range codes are refused; energy scales with hold time"""
+    for volume, mass in ((0.0, None), (-0.1, None), (None, -5.0), ([0.1, np.inf], None)):
+        with pytest.raises(ValueError):
+            PAYLOADS.tune(["Gold", "Gold"], volume, mass)
+    for codes in ([-1], [len(PAYLOADS.names)]):
+        with pytest.raises(ValueError):
+            PAYLOADS.tune(np.array(codes))
+    assert PAYLOADS.tune(np.array([0, 1]))["code"].tolist() == [0, 1]
+    one = PAYLOADS.tune_one("Human", mass=75.0)
+    assert one["energy_required"] == pytest.approx(13500.0)
+    assert PAYLOADS.tune_one("Human", mass=75.0, transfer_seconds=60.0)["energy_required"] == pytest.approx(60 * 13500.0)
+
+def test_manifest_totals_use_the_tuning_library():
+    """Counts are named from the library that produced the codes, not the global one"""
+    library = MaterialLibrary({"Osmium": (22590.0, 0.9, 1.4, 0.0, 130.0), "Gold": (19300.0, 0.92, 1.35, 0.0, 129.0)})
+    totals = manifest_totals(library.tune(["Osmium", "Gold", "Osmium"], mass=10.0), library)
+    assert totals["materials"] == {"Osmium": 2, "Gold": 1} and totals["total_mass"] == 30.0
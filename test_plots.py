@@ -0,0 +1,45 @@
+"""
+Tests for server-side plot rendering
+"""
+
+import asyncio
+
+from dualportal import DualPortal
+from logger import SimulationLogger
+from plots import PlotRenderer, history_data, heatmap_data
+
+def test_renders_are_cached_by_content_and_coalesced():
+    """Identical chart inputs render once; new records change the key"""
+    dp = DualPortal()
+    dp.initialize_run()
+    logger = SimulationLogger()
+    for step in range(20):
+        dp.portal1.update_energy(dt=0.5)
+        dp.portal2.update_energy(dt=0.5)
+        dp.form_bridge(t=step)
+        logger.log_event("form_bridge", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength)
+
+    async def scenario():
+        renderer = PlotRenderer(workers=0, max_entries=2)
+        first, second = await asyncio.gather(renderer.render("bridge_history", "png", history_data(logger.table)),
+                                             renderer.render("bridge_history", "png", history_data(logger.table)))
+        assert first[0].startswith(b"\x89PNG") and first[0] == second[0] and first[2] == second[2]
+        assert renderer.stats["renders"] == 1 and renderer.stats["coalesced"] == 1
+        svg = await renderer.render("sweep_heatmap", "svg", heatmap_data(dp))
+        assert svg[1] == "image/svg+xml" and b"<svg" in svg[0]
+        logger.log_event("transfer_payload", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, True)
+        assert renderer.prepare("bridge_history", "png", history_data(logger.table)) != first[2]
+        await renderer.render("bridge_history", "png", history_data(logger.table))
+        assert renderer.get(first[2]) is None and renderer.stats["evictions"] == 1
+
+    asyncio.run(scenario())
+
+def test_unknown_run_filter_does_not_intern():
+    """Filtering by a run id that was never logged selects nothing and leaves the string table alone"""
+    logger = SimulationLogger()
+    logger.log_event("form_bridge", "run_1", None, None, 0.5)
+    strings = len(logger.table.strings_since(0))
+    for probe in ("run_404", "run_405"):
+        assert len(history_data(logger.table, probe)["bridge_strength"]) == 0
+    assert len(logger.table.strings_since(0)) == strings and logger.table.lookup("run_404") == -1
+    assert history_data(logger.table, "run_1")["bridge_strength"].tolist() == [0.5]
@@ -0,0 +1,24 @@
+"""
+Tests for pooled DualPortal reuse
+"""
+
+from dualportal import DualPortal
+from pool import DualPortalPool
+from snapshot import dual_portal_state
+
+def test_recycled_pair_matches_fresh_construction():
+    """A released pair comes back indistinguishable from a new DualPortal"""
+    pool = DualPortalPool(size=1)
+    assert pool.warm() == 1
+    dp = pool.acquire(freq1=32.0, detune=0.08, power=13500.0)
+    dp.initialize_run(payload_volume=0.3, payload_mass=120, floor_temp1=-150.0, floor_contact2=False)
+    dp.portal1.update_energy(dt=5.0)
+    dp.form_bridge(t=5.0)
+    old_log = dp.status_log
+    pool.release(dp)
+    pool.release(dp)
+    again = pool.acquire(freq1=30.0, detune=0.1, power=10000.0)
+    assert again is dp and old_log and again.status_log is not old_log
+    assert dual_portal_state(again) == dual_portal_state(DualPortal(freq1=30.0, detune=0.1, power=10000.0))
+    assert pool.summary()["hits"] == 2 and pool.summary()["released"] == 1
+    assert pool.acquire() is not dp and pool.stats["misses"] == 1
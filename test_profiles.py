@@ -0,0 +1,64 @@
+"""
+Tests for compiled config profiles and batch validation
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from config import SimulationConfig
+from dualportal import DualPortal
+from profiles import ProfileStore, ConfigError, compile_profiles, validate_batch
+
+def test_profiles_compile_inherit_and_hot_reload(tmp_path):
+    """Profiles are immutable, inherit from a base, apply at call time and reload on change"""
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({"profiles": {"lab": {"detune_default": 0.12},
+                                             "cold": {"base": "lab", "damping_min": 0.03}}}))
+    store = ProfileStore(str(path), active="cold")
+    try:
+        assert store.active.detune_default == 0.12 and store.active["damping_min"] == 0.03
+        assert store.profiles["default"]["detune_default"] == 0.08
+        with pytest.raises(AttributeError):
+            store.active.detune_default = 1.0
+        assert DualPortal().detune == 0.12 and DualPortal().portal1.damping == 0.03
+        path.write_text(json.dumps({"profiles": {"cold": {"detune_default": 0.2}}}))
+        os.utime(path, ns=(0, 1))
+        assert store.reload_if_changed() and DualPortal().detune == 0.2
+        path.write_text("{broken")
+        assert not store.reload_if_changed() and store.last_error and store.active.detune_default == 0.2
+    finally:
+        store.activate("default")
+    assert SimulationConfig["detune_default"] == 0.08
+    with pytest.raises(ConfigError):
+        compile_profiles({"bad": {"resonance_frequency": 500.0}})
+    with pytest.raises(ConfigError):
+        compile_profiles({"bad": {"failsafe_blocks": "two"}})
+
+def test_validate_batch_returns_per_row_masks():
+    """Bounds and the damping band are checked per row in one pass"""
+    valid, violations, fields = validate_batch({
+        "resonance_frequency": np.array([32.0, 0.5, 50.0, np.nan]),
+        "damping_min": np.array([0.02, 0.02, 0.2, 0.02]),
+        "damping_max": np.array([0.12, 0.12, 0.1, 0.12])})
+    assert valid.tolist() == [True, False, False, False]
+    assert violations[:, fields.index("resonance_frequency")].tolist() == [False, True, False, True]
+    assert violations[2, fields.index("damping_min")] and violations[2, fields.index("damping_max")]
+
+def test_malformed_profile_files_keep_the_last_good_profiles(tmp_path):
+    """Wrongly shaped JSON is reported as a reload error instead of raising out of the watcher"""
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({"profiles": {"lab": {"detune_default": 0.12}}}))
+    store = ProfileStore(str(path), active="lab")
+    try:
+        for stamp, document in enumerate([[1, 2], {"profiles": {"lab": 5}}, {"profiles": [1]}, None,
+                                          {"profiles": {"lab": {"base": ["default"]}}},
+                                          {"profiles": {"lab": {"detune_default": {"x": 1}}}}], start=1):
+            path.write_text(json.dumps(document))
+            os.utime(path, ns=(stamp, stamp))
+            assert not store.reload_if_changed() and store.last_error, document
+            assert store.active.detune_default == 0.12
+    finally:
+        store.activate("default")
@@ -0,0 +1,59 @@
+"""
+Tests for the WebSocket wire protocol codecs and encoding negotiation
+"""
+
+import json
+import struct
+from types import SimpleNamespace
+
+import msgpack
+from dualportal import DualPortal
+from protocol import (PACKED_MAGIC, PACKED_SNAPSHOT, PORTAL_FLOAT_FIELDS, BRIDGE_FLOAT_FIELDS,
+                      JSONCodec, MsgpackCodec, PackedCodec, build_snapshot, negotiate, unpack_snapshot)
+
+def _dual_portal():
+    dp = DualPortal(detune=0.2)
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=2.0)
+    dp.portal2.update_energy(dt=2.0)
+    dp.form_bridge(t=2.0)
+    dp.portal2.floor_contact = False
+    return dp
+
+def _websocket(query=None, protocols=None):
+    headers = {"sec-websocket-protocol": protocols} if protocols is not None else {}
+    return SimpleNamespace(query_params=query or {}, headers=headers)
+
+def test_codecs_round_trip_the_snapshot():
+    """JSON, MessagePack and packed frames all decode back to the same snapshot"""
+    dp = _dual_portal()
+    expected = build_snapshot(dp, include_log=False)
+    assert json.loads(JSONCodec().encode_snapshot(dp))["portal1"]["energy"] == dp.portal1.energy
+    assert msgpack.unpackb(MsgpackCodec().encode_snapshot(dp))["detune"] == 0.2
+    frame = PackedCodec().encode_snapshot(dp)
+    assert len(frame) == PACKED_SNAPSHOT.size == struct.calcsize("<4sHH16s" + "d" * 17 + "?" * 4)
+    assert frame[:4] == PACKED_MAGIC and struct.unpack_from("<HH", frame, 4) == (1, 1)
+    assert frame[8:24].rstrip(b"\x00").decode() == dp.run_id[:16]
+    decoded = unpack_snapshot(frame)
+    for name in ("portal1", "portal2"):
+        assert decoded[name] == expected[name]
+    assert [decoded[f] for f in BRIDGE_FLOAT_FIELDS] == [expected[f] for f in BRIDGE_FLOAT_FIELDS]
+    assert decoded["portal2"]["floor_contact"] is False and len(PORTAL_FLOAT_FIELDS) == 7
+    assert unpack_snapshot(PackedCodec().encode_snapshot(None))["status"] == "disconnected"
+    assert msgpack.unpackb(PackedCodec().encode({"type": "heartbeat"})) == {"type": "heartbeat"}
+    try:
+        unpack_snapshot(b"XXXX" + frame[4:])
+        assert False, "bad magic accepted"
+    except ValueError:
+        pass
+
+def test_negotiation_prefers_query_then_subprotocol():
+    """The query parameter wins, then the first usable stargate.* subprotocol, else JSON"""
+    codec, proto = negotiate(_websocket({"encoding": "packed"}, "stargate.msgpack"))
+    assert codec.name == "packed" and proto is None
+    codec, proto = negotiate(_websocket(protocols="chat, stargate.bogus, stargate.msgpack, stargate.packed"))
+    assert codec.name == "msgpack" and proto == "stargate.msgpack"
+    codec, proto = negotiate(_websocket({"encoding": "xml"}, "stargate.xml"))
+    assert codec.name == "json" and proto is None and not codec.binary
+    codec, proto = negotiate(_websocket())
+    assert codec.name == "json" and proto is None
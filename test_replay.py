@@ -0,0 +1,46 @@
+"""
+Tests for trace-driven sensor replay
+"""
+
+import os
+
+import numpy as np
+from dualportal import DualPortal
+from hardware import TemperatureSensor, ContactSensor, TeslaBattery, FailsafeBlock
+from replay import CHANNELS, TraceWriter, TraceReplayer, default_bindings, iter_trace
+
+def _hardware():
+    return {"temp_sensor_1": TemperatureSensor("Portal1_Temp", -196.0),
+            "temp_sensor_2": TemperatureSensor("Portal2_Temp", -196.0),
+            "contact_sensor_1": ContactSensor("Portal1_Contact", True),
+            "contact_sensor_2": ContactSensor("Portal2_Contact", True),
+            "battery": TeslaBattery(), "failsafe": FailsafeBlock()}
+
+def _replay(path, rate, excursions=((10.0, 20.0),)):
+    """Portal 2 floor over threshold (with sensor noise) during each excursion, sampled at `rate` Hz."""
+    t = np.arange(0, int(40 * rate)) / rate
+    rows = np.full((len(t), len(CHANNELS) + 1), np.nan)
+    rows[:, 0] = t
+    rows[:, 1] = -196.0
+    rows[:, 2] = -196.0
+    for start, end in excursions:
+        hot = (t >= start) & (t < end)
+        rows[hot, 2] = -150.0 + 0.01 * np.sin(t[hot] * 7.0)
+    with TraceWriter(path) as writer:
+        writer.write_array(rows)
+    hardware = _hardware()
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    replayer = TraceReplayer(iter_trace(path), default_bindings(hardware), hardware, dp)
+    assert replayer.run() == len(t)
+    return dp
+
+def test_floor_penalty_does_not_depend_on_sample_rate(tmp_path):
+    """The same physical excursion costs the same stability at 2 Hz and at 200 Hz"""
+    slow = _replay(os.path.join(tmp_path, "slow.sgt"), 2)
+    fast = _replay(os.path.join(tmp_path, "fast.sgt"), 200)
+    assert slow.portal2.stability == fast.portal2.stability == 0.7
+    assert not fast.portal2.safety_status and fast.portal1.stability == 1.0
+    assert fast.portal2.floor_temp == -196.0                 # Still tracks the latest reading
+    twice = _replay(os.path.join(tmp_path, "twice.sgt"), 50, ((5.0, 10.0), (20.0, 25.0)))
+    assert abs(twice.portal2.stability - 0.49) < 1e-12
@@ -0,0 +1,103 @@
+"""
+Tests for the content-addressed study result cache
+"""
+
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from config import SimulationConfig, load_simulation_config
+from dualportal import bridge_strength
+from profiles import ProfileStore
+from resultcache import ResultCache, cache_key
+from safetyrules import DEFAULT_RULES, SAFETY_RULES, compile_rules
+
+def test_keys_follow_config_rules_and_inputs(tmp_path):
+    """Equal inputs hash alike however they are spelled; any config, rule or input change misses"""
+    config = ProfileStore(str(tmp_path / "profiles.json")).active
+    key = cache_key("sweep", config=config, rules=DEFAULT_RULES, grid={"steps": 10, "base": 32.0}, seed=None)
+    assert key == cache_key("sweep", seed=None, grid={"base": 32.0, "steps": 10},
+                            rules=[dict(r) for r in DEFAULT_RULES], config=dict(config))
+    assert cache_key("grid", values=np.arange(3.0), seed=np.int64(1)) == cache_key("grid", values=[0.0, 1.0, 2.0], seed=1)
+    changed = dict(config, energy_rate=config["energy_rate"] + 1)
+    stricter = [dict(r, stop=not r.get("stop", False)) for r in DEFAULT_RULES]
+    keys = {key,
+            cache_key("sweep", config=changed, rules=DEFAULT_RULES, grid={"steps": 10, "base": 32.0}, seed=None),
+            cache_key("sweep", config=config, rules=stricter, grid={"steps": 10, "base": 32.0}, seed=None),
+            cache_key("sweep", config=config, rules=DEFAULT_RULES, grid={"steps": 11, "base": 32.0}, seed=None),
+            cache_key("sweep", config=config, rules=DEFAULT_RULES, grid={"steps": 10, "base": 32.0}, seed=0),
+            cache_key("study", config=config, rules=DEFAULT_RULES, grid={"steps": 10, "base": 32.0}, seed=None)}
+    assert len(keys) == 6
+    assert cache_key("cfg", config=load_simulation_config()) == cache_key("cfg", config=load_simulation_config())
+
+def test_disk_lru_eviction_survives_restart(tmp_path):
+    """Least recently used entries go first once the size bound is exceeded, also after a rescan"""
+    value = np.zeros(1000)
+    size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = ResultCache(str(tmp_path), max_bytes=3 * size)
+    for name in "abc":
+        cache.put(name * 8, value)
+    assert cache.get("a" * 8) is not None                  # "b" is now least recently used
+    cache.put("d" * 8, value)
+    assert cache.get("b" * 8) is None and cache.summary()["evictions"] == 1
+    assert not os.path.exists(cache._path("b" * 8)) and cache.total_bytes == 3 * size
+    for age, name in enumerate("cad"):                      # Access order c, a, d on disk
+        os.utime(cache._path(name * 8), (1000 + age, 1000 + age))
+    reopened = ResultCache(str(tmp_path), max_bytes=3 * size)
+    assert list(reopened._index) == ["c" * 8, "a" * 8, "d" * 8] and reopened.total_bytes == 3 * size
+    reopened.put("e" * 8, value)
+    assert reopened.get("c" * 8) is None and reopened.get("a" * 8) is not None
+
+def test_corrupt_entries_are_dropped_and_recomputed(tmp_path):
+    """Truncated or garbage files count as misses, are removed, and are recomputed on demand"""
+    cache = ResultCache(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"best": 0.97}
+
+    assert cache.get_or_compute("sweep", compute, steps=10) == ({"best": 0.97}, False)
+    key = cache_key("sweep", steps=10)
+    path = cache._path(key)
+    stale = pickle.dumps(np.float64(0.5)).replace(b"numpy", b"nompy")    # Module no longer importable
+    for damage in (b"", b"not a pickle", open(path, "rb").read()[:-3], stale):
+        with open(path, "wb") as f:
+            f.write(damage)
+        assert cache.get_or_compute("sweep", compute, steps=10) == ({"best": 0.97}, False)
+        assert cache.get_or_compute("sweep", compute, steps=10) == ({"best": 0.97}, True)
+    assert len(calls) == 5 and cache.summary()["entries"] == 1
+    with open(path + ".tmp", "wb") as f:                    # Leftover from an interrupted put
+        f.write(b"partial")
+    assert list(ResultCache(str(tmp_path))._index) == [key]
+
+def test_concurrent_threads_share_the_cache(tmp_path):
+    """Studies computed in worker threads keep the index, memo and statistics consistent"""
+    cache = ResultCache(str(tmp_path), max_bytes=20_000)
+    grid = np.linspace(13500.0, 40500.0, 200)
+
+    def study(i):
+        cache.bridge_points(grid, grid * 0.99, 1.0, 0.95, True, True, 0.01 * (i % 4))
+        return cache.get_or_compute("grid", lambda: np.full(200, float(i % 8)), seed=i % 8)[0]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(study, range(64)))
+    assert all(r[0] == i % 8 for i, r in enumerate(results))
+    summary = cache.summary()
+    assert summary["hits"] + summary["misses"] == 64 and summary["point_hits"] + summary["point_misses"] == 64 * 200
+    assert summary["memo_points"] == 4 * 200 and summary["bytes"] == sum(cache._index.values()) <= 20_000
+
+def test_point_memo_follows_config_and_rule_changes(tmp_path, monkeypatch):
+    """A profile switch or rules reload between two sweeps recomputes the points"""
+    cache = ResultCache(str(tmp_path))
+    args = (np.linspace(13500.0, 27000.0, 8), 20000.0, 0.95, 0.85, True, True, 0.3)
+    first = cache.bridge_points(*args)
+    assert np.array_equal(cache.bridge_points(*args), first) and cache.stats["point_hits"] == 8
+    monkeypatch.setitem(SimulationConfig, "resonance_frequency", 0.5)
+    assert np.array_equal(cache.bridge_points(*args), bridge_strength(*args))
+    assert not np.array_equal(bridge_strength(*args), first)
+    harsher = [dict(r, scale={"strength": 0.5}) if r["name"] == "bridge_degraded" else r for r in DEFAULT_RULES]
+    monkeypatch.setattr(SAFETY_RULES, "stages", compile_rules(harsher))
+    fresh = bridge_strength(*args)
+    assert np.array_equal(cache.bridge_points(*args), fresh) and cache.stats["point_hits"] == 8
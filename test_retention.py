@@ -0,0 +1,77 @@
+"""
+Tests for tiered log retention
+"""
+
+import tempfile
+
+import numpy as np
+from dualportal import DualPortal
+from logger import SimulationLogger
+from retention import RetentionManager
+from snapshot import SessionStore
+
+T0 = 1_699_999_980_000_000          # Epoch µs, on a minute boundary
+
+def _log(logger, seconds, per_second=4, offset=0):
+    dp = DualPortal()
+    dp.initialize_run()
+    rng = np.random.default_rng(seconds)
+    for i in range(seconds * per_second):
+        dp.portal1.stability = float(rng.uniform(0.8, 1.0))
+        logger.table.append_values(T0 + offset + i * 1_000_000 // per_second, "Tick", dp.run_id,
+                                   dp.portal1, dp.portal2, dp.bridge_strength, i % 5 == 0 or None)
+
+def test_rollups_match_raw_records():
+    """Per-second and per-minute buckets aggregate exactly the raw rows they cover"""
+    logger = SimulationLogger()
+    retention = RetentionManager(logger)
+    _log(logger, 180)
+    stab = logger.table.column("portal1_stab")
+    minutes = retention.query(resolution=60)
+    assert minutes["points"] == 3 and minutes["columns"]["records"].tolist() == [240] * 3
+    assert np.allclose(minutes["columns"]["portal1_stab_mean"], stab.reshape(3, 240).mean(axis=1))
+    assert np.allclose(minutes["columns"]["portal1_stab_min"], stab.reshape(3, 240).min(axis=1))
+    seconds = retention.query(resolution=1)
+    assert seconds["points"] == 180
+    assert np.allclose(seconds["columns"]["portal1_stab_max"], stab.reshape(180, 4).max(axis=1))
+    assert retention.query()["tier"] == "raw"
+    assert retention.query(max_points=100)["tier"] == "60s"
+
+def test_compaction_bounds_raw_records_and_keeps_trends():
+    """Compaction drops aged raw rows; queries over them fall back to the rollups"""
+    logger = SimulationLogger()
+    retention = RetentionManager(logger, raw_seconds=60)
+    _log(logger, 180)
+    before = retention.query(resolution=60)["columns"]["portal1_stab_mean"].copy()
+    now = T0 + 180 * 1_000_000
+    assert retention.compact(now) == 480
+    assert logger.table.start == 480 and len(logger.records) == 240
+    assert logger.records[0]["timestamp"] == logger.table.row(480)["timestamp"]
+    full = retention.query(T0, now)
+    assert full["tier"] != "raw"
+    assert np.allclose(retention.query(resolution=60)["columns"]["portal1_stab_mean"], before)
+    assert retention.query(now - 30 * 1_000_000, now)["tier"] == "raw"
+
+def test_compacted_session_survives_snapshot_restore():
+    """The record file is rewritten with retained rows and rollups reload alongside it"""
+    directory = tempfile.mkdtemp()
+    logger = SimulationLogger()
+    retention = RetentionManager(logger, raw_seconds=60, directory=directory)
+    state = {"dual_portal": None, "hardware": {}, "logger": logger}
+    store = SessionStore(directory)
+    _log(logger, 120)
+    store.save(state)
+    retention.compact(T0 + 120 * 1_000_000)
+    _log(logger, 10, offset=120 * 1_000_000)
+    store.save(state)
+    retention.save()
+
+    woken = {"dual_portal": None, "hardware": {}, "logger": SimulationLogger()}
+    restored = RetentionManager(woken["logger"], raw_seconds=60, directory=directory)
+    assert SessionStore(directory).restore(woken)
+    assert restored.load()
+    table = woken["logger"].table
+    assert table.start == 240 and len(table) == 520
+    assert woken["logger"].records[-1] == logger.records[-1]
+    a, b = restored.query(resolution=1)["columns"], retention.query(resolution=1)["columns"]
+    assert np.array_equal(a["records"], b["records"]) and np.allclose(a["bridge_strength_mean"], b["bridge_strength_mean"])
@@ -0,0 +1,93 @@
+"""
+Tests for the declarative safety rule engine
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from config import SimulationConfig
+from dualportal import DualPortal
+from portal import Portal
+from safetyrules import SAFETY_RULES, DEFAULT_RULES, SafetyRules, RuleError
+
+def test_vectorized_rules_match_portal_objects():
+    """Evaluating thousands of portals at once agrees with the per-portal methods"""
+    rng = np.random.default_rng(3)
+    n = 400
+    temp = rng.normal(-196.0, 0.6, n)
+    contact = rng.random(n) > 0.1
+    floor = SAFETY_RULES.evaluate("floor", floor_temp=temp, floor_contact=contact, stability=1.0, safety=True)
+    names = SAFETY_RULES.rule_names("floor")
+    for i in range(0, n, 7):
+        portal = Portal()
+        portal.floor_sensor(temp=float(temp[i]), contact=bool(contact[i]))
+        assert portal.stability == floor["stability"][i] and portal.safety_status == floor["safety"][i]
+        expected = "floor_temp_high" if temp[i] > SimulationConfig["floor_temp_threshold"] else \
+            "floor_contact_lost" if not contact[i] else None
+        assert (names[floor["rule"][i]] if floor["rule"][i] >= 0 else None) == expected
+    strength = np.linspace(0.85, 1.0, 31)
+    transfer = SAFETY_RULES.evaluate("transfer", strength=strength)
+    dp = DualPortal()
+    for s, allowed in zip(strength, transfer["allowed"]):
+        dp.bridge_strength = float(s)
+        assert dp.transfer_payload() == allowed == (s >= 0.90)
+    assert dp.status_log[-1] == "[SUCCESS] Payload transferred—maximum bridge stability."
+
+def test_first_match_stops_later_rules():
+    """A stop rule shadows later rules for the rows it matched"""
+    lock = SAFETY_RULES.evaluate("lock", stability=[0.9, 0.2, 0.9], safety=[True, True, False])
+    assert lock["allowed"].tolist() == [True, False, False]
+    assert lock["fired"].tolist() == [[True, False], [False, True], [False, True]]
+
+def test_rules_reload_from_file_without_code_changes():
+    """Editing the rule file changes behaviour; a broken edit keeps the last good rules"""
+    path = os.path.join(tempfile.mkdtemp(), "rules.json")
+    rules = SafetyRules(path)
+    assert rules.check("lock", stability=0.35, safety=True)[0]["allowed"]
+    stricter = [dict(r, when={"all": [["safety", "==", True], ["stability", ">", 0.5]]}) if r["name"] == "lock_ready" else r
+                for r in DEFAULT_RULES]
+    with open(path, "w") as f:
+        json.dump({"rules": stricter}, f)
+    assert rules.reload_if_changed()
+    assert not rules.check("lock", stability=0.35, safety=True)[0]["allowed"]
+    with open(path, "w") as f:
+        json.dump({"rules": [{"name": "bad", "stage": "lock", "when": ["temperature", ">", 1]}]}, f)
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1))
+    assert not rules.reload_if_changed() and "temperature" in rules.last_error
+    assert not rules.check("lock", stability=0.35, safety=True)[0]["allowed"]
+    try:
+        SafetyRules(specs=[{"name": "x", "stage": "floor", "when": ["floor_temp", "~", 0]}])
+        assert False, "unknown operator accepted"
+    except RuleError:
+        pass
+
+def test_effects_and_templates_are_checked_at_compile_time():
+    """Set values must match the field type and message/alert templates must render"""
+    base = {"name": "x", "stage": "floor", "when": ["floor_temp", ">", 0]}
+    for bad in ({"set": {"safety": "no"}}, {"set": {"safety": 0}}, {"set": {"stability": True}},
+                {"set": {"stability": "0.5"}}, {"message": "{floor_tmp:.2f}"}, {"message": "{}"},
+                {"message": "{floor_contact:.2q}"}, {"alert": "{source.name} hot"}, {"alert": 3}):
+        try:
+            SafetyRules(specs=[dict(base, **bad)])
+            assert False, f"{bad} accepted"
+        except RuleError:
+            pass
+    rules = SafetyRules(specs=[dict(base, set={"stability": 1}, alert="{source} at {floor_temp:.1f}")])
+    values, fired = rules.check("floor", floor_temp=5.0, floor_contact=True, stability=0.5, safety=True)
+    assert values["stability"] == 1.0 and isinstance(values["stability"], float)
+
+def test_scalar_check_matches_array_check():
+    """Plain Python values take the scalar path with the same results as NumPy inputs"""
+    for temp in (-196.0, -190.0):
+        for contact in (True, False):
+            args = {"floor_temp": temp, "floor_contact": contact, "stability": 0.9, "safety": True}
+            scalar = SAFETY_RULES.check("floor", **args)
+            vector = SAFETY_RULES.check("floor", **{k: np.asarray(v) for k, v in args.items()})
+            assert scalar[0] == vector[0]
+            assert [(r.name, m) for r, m in scalar[1]] == [(r.name, m) for r, m in vector[1]]
+    for strength in (0.5, 0.92, 0.99):
+        assert SAFETY_RULES.check("transfer", strength=strength)[0] == SAFETY_RULES.check("transfer", strength=np.asarray(strength))[0]
+    assert SAFETY_RULES.check("lock", stability=0.2, safety=True)[0] == {"stability": 0.2, "safety": True, "allowed": False}
@@ -0,0 +1,61 @@
+"""
+Tests for the transfer scheduler's energy budget
+"""
+
+from dualportal import DualPortal
+from hardware import TeslaBattery
+from scheduler import TransferScheduler, transfer_cost
+
+def _bridge(dt=600.0):
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.1, payload_mass=75)
+    dp.portal1.update_energy(dt=dt)
+    dp.portal2.update_energy(dt=dt)
+    dp.form_bridge(t=dt)
+    return dp
+
+def test_successful_transfers_draw_a_per_transfer_cost():
+    """Cost is portal power × hold time, independent of accumulated energy; failures are free"""
+    dp, battery = _bridge(), TeslaBattery()
+    scheduler = TransferScheduler(lambda: dp, battery, transfer_seconds=2.0)
+    expected = 100.0 - 6 * 2.0 * dp.portal1.power / 3.6e6 / 13.5 * 100.0
+    for _ in range(6):
+        job = scheduler.submit()
+        scheduler.run_window()
+        assert job.status == "done" and job.result["transfer_result"]
+        assert job.result["energy_used"] == transfer_cost(dp, seconds=2.0) == 2.0 * dp.portal1.power
+    assert abs(battery.charge_pct - expected) < 1e-9
+    dp.bridge_strength = 0.5
+    job = scheduler.submit(portal=2)
+    scheduler.run_window()
+    assert job.result["transfer_result"] is False and job.result["energy_used"] == 0.0
+    assert abs(battery.charge_pct - expected) < 1e-9
+    try:
+        scheduler.submit(portal=3)
+        assert False, "portal 3 accepted"
+    except ValueError:
+        pass
+
+def test_short_budget_defers_rejects_and_recharges():
+    """Jobs wait for the charger up to max_wait; max_wait=0 rejects at once with retry_after"""
+    clock = [0.0]
+    dp = _bridge()
+    battery = TeslaBattery(charge_pct=10.05)
+    scheduler = TransferScheduler(lambda: dp, battery, transfer_seconds=10.0, recharge_w=13500.0,
+                                  max_wait=60.0, clock=lambda: clock[0])
+    now = scheduler.submit(max_wait=0.0)
+    later = scheduler.submit()
+    scheduler.run_window()
+    assert now.status == "rejected" and 0 < now.result["retry_after"] <= 10.0
+    assert later.status == "queued" and scheduler.metrics()["queued"] == 1
+    clock[0] += now.result["retry_after"] + 0.001
+    scheduler.run_window()
+    assert later.status == "done" and later.queue_wait > 0
+    battery.charge_pct, battery.failsafe_engaged = 5.0, True
+    stuck = TransferScheduler(lambda: dp, battery, max_wait=30.0, clock=lambda: clock[0])
+    job = stuck.submit()
+    stuck.run_window()
+    assert job.status == "queued"
+    clock[0] += 31.0
+    stuck.run_window()
+    assert job.status == "rejected" and job.result["retry_after"] is None
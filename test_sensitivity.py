@@ -0,0 +1,42 @@
+"""
+Tests for sensitivity and uncertainty analysis
+"""
+
+import numpy as np
+
+import sensitivity
+from dualportal import DualPortal
+from sensitivity import PARAMETERS, evaluate, model, local_sensitivities, sobol_indices, morris_screening
+
+def test_model_matches_dual_portal_run():
+    """The vectorized pipeline reproduces form_bridge, including a hot floor"""
+    for temp in (-196.0, -150.0):
+        dp = DualPortal(detune=0.4)
+        dp.initialize_run(payload_volume=0.2, floor_temp2=temp)
+        dp.portal1.update_energy(dt=2.0)
+        dp.portal2.update_energy(dt=1.0)
+        dp.form_bridge(t=2.0)
+        point = [0.4, 1.0, 1.0, 27000.0, 13500.0, 0.2, -196.0, temp]
+        assert np.isclose(model([point], list(PARAMETERS))[0], dp.bridge_strength)
+
+def test_indices_rank_floor_temperature_and_ignore_payload_volume():
+    """Global and local analyses agree on which inputs matter"""
+    sobol = sobol_indices(samples=2048, seed=1)
+    assert sobol["evaluations"] == 2048 * (len(PARAMETERS) + 2)
+    assert {r["parameter"] for r in sobol["ranking"][:2]} == {"floor_temp1", "floor_temp2"}
+    assert abs(sobol["total"]["payload_volume"]) < 1e-9
+    morris = morris_screening(trajectories=100, seed=1, workers=2)
+    assert {r["parameter"] for r in morris["ranking"][:2]} == {"floor_temp1", "floor_temp2"}
+    local = local_sensitivities(parameters=["energy1", "energy2", "detune"])
+    assert np.isclose(local["elasticity"]["energy1"], 0.5, atol=1e-3)
+    assert local["ranking"][-1]["parameter"] == "detune"
+
+def test_process_pool_path_matches_serial(monkeypatch):
+    """Chunks evaluated in worker processes reassemble into the serial result"""
+    X = np.random.default_rng(2).uniform(0.0, 1.0, (5000, 2)) * [2.0, 27000.0] + [0.0, 13500.0]
+    names = ["detune", "energy1"]
+    assert np.array_equal(evaluate(X, names, workers=2, min_chunk=1000), model(X, names))
+    monkeypatch.setattr(sensitivity, "MIN_CHUNK", 100)
+    serial = morris_screening(trajectories=100, seed=4)
+    pooled = morris_screening(trajectories=100, seed=4, workers=3)
+    assert pooled["evaluations"] >= 2 * 100 * 3 and pooled["mu_star"] == serial["mu_star"]
@@ -0,0 +1,143 @@
+"""
+Tests for session snapshot and restore
+"""
+
+import json
+import os
+import pickle
+
+import numpy as np
+from dualportal import DualPortal
+from hardware import TeslaBattery, FailsafeBlock
+from logger import SimulationLogger, RECORD_DTYPE
+from snapshot import LEGACY_FILES, SessionStore
+
+def _state():
+    return {"dual_portal": None, "logger": None, "running": False,
+            "hardware": {"battery": TeslaBattery(), "failsafe": FailsafeBlock()}}
+
+def test_round_trip_with_incremental_records(tmp_path):
+    """A restored session matches the saved one and keeps appending to the same files"""
+    state = _state()
+    dp = DualPortal()
+    dp.initialize_run(payload_volume=0.2, payload_mass=90)
+    dp.portal1.update_energy(dt=2.0)
+    dp.portal2.update_energy(dt=2.0)
+    dp.form_bridge(t=2.0)
+    state["dual_portal"], state["logger"] = dp, SimulationLogger()
+    state["hardware"]["battery"].supply_power(50000)
+    for i in range(100):
+        state["logger"].log_event("Tick", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength)
+    store = SessionStore(str(tmp_path))
+    assert store.save(state) == 100
+    state["logger"].log_event("Transfer", dp.run_id, dp.portal1, dp.portal2, dp.bridge_strength, True, "done")
+    assert store.save(state) == 1
+
+    woken = _state()
+    second = SessionStore(str(tmp_path))
+    assert second.restore_once(woken) and not second.restore_once(woken)
+    restored = woken["dual_portal"]
+    assert restored.run_id == dp.run_id and restored.bridge_strength == dp.bridge_strength
+    assert restored.portal1.payload_volume == 0.2 and restored.portal2.status_log == dp.portal2.status_log
+    assert woken["hardware"]["battery"].status() == state["hardware"]["battery"].status()
+    assert woken["logger"].records[:] == state["logger"].records[:]
+
+    woken["logger"].log_event("After Wake", dp.run_id, restored.portal1, restored.portal2, 0.5)
+    assert second.save(woken) == 1
+    third = _state()
+    SessionStore(str(tmp_path)).restore(third)
+    assert [r["event"] for r in third["logger"].records[-2:]] == ["Transfer", "After Wake"]
+
+def test_clear_rewrites_record_files(tmp_path):
+    """Clearing the logger restarts the persisted record file instead of appending"""
+    state = _state()
+    state["logger"] = SimulationLogger()
+    state["logger"].log_event("Old", "run_1", None, None, 0.0)
+    store = SessionStore(str(tmp_path))
+    store.save(state)
+    state["logger"].clear()
+    state["logger"].log_event("New", "run_2", None, None, 0.0)
+    store.save(state)
+    woken = _state()
+    SessionStore(str(tmp_path)).restore(woken)
+    assert [r["event"] for r in woken["logger"].records] == ["New"]
+
+def test_interrupted_compacting_save_keeps_the_last_snapshot(tmp_path, monkeypatch):
+    """Retained rows go to a new file generation; the old one survives until the core file moves on"""
+    state = _state()
+    state["logger"] = SimulationLogger()
+    for i in range(10):
+        state["logger"].log_event("Tick", f"run_{i}", None, None, 0.0, None, f"step {i}")
+    crashed = SessionStore(str(tmp_path))
+    crashed.save(state)
+    saved = state["logger"].records[:]
+    state["logger"].table.compact(8)
+
+    def power_lost(src, dst):
+        raise OSError("power lost")
+    monkeypatch.setattr(os, "replace", power_lost)
+    try:
+        crashed.save(state)
+        assert False, "save survived the crash"
+    except OSError:
+        pass
+    monkeypatch.undo()
+
+    woken = _state()
+    store = SessionStore(str(tmp_path))
+    assert store.restore(woken) and woken["logger"].records[:] == saved
+    assert sorted(os.listdir(tmp_path)) == ["extras.1.jsonl", "records.1.bin", "session.bin", "session.bin.tmp",
+                                            "strings.1.jsonl"]
+    woken["logger"].table.compact(8)
+    store.save(woken)
+    assert [name for name in os.listdir(tmp_path) if name.startswith("records")] == [store.files["records"]]
+    third = _state()
+    SessionStore(str(tmp_path)).restore(third)
+    table = third["logger"].table
+    assert table.start == 8 and third["logger"].records[:] == saved[8:]
+    assert table.strings_since(0) == [None, "Tick", "run_8", "run_9"] and table.extras_since(0) == ["", "step 8", "step 9"]
+
+def test_version_1_snapshot_is_migrated(tmp_path):
+    """A pre-extras, pre-names snapshot restores through the migration chain"""
+    state = _state()
+    dp = DualPortal()
+    state["dual_portal"], state["logger"] = dp, SimulationLogger()
+    state["logger"].log_event("Tick", dp.run_id, dp.portal1, dp.portal2, 0.5, None, "first")
+    state["logger"].log_event("Tick", dp.run_id, dp.portal1, dp.portal2, 0.5)
+    store = SessionStore(str(tmp_path))
+    store.save(state)
+    # Rewrite it as version 1 wrote it: fixed file names, extra codes index the string table, unnamed portals
+    with open(store.core_path, "rb") as f:
+        core = pickle.load(f)
+    meta = core["logger"]
+    legacy = {kind: str(tmp_path / name) for kind, name in LEGACY_FILES.items()}
+    for kind, name in meta.pop("files").items():
+        os.replace(str(tmp_path / name), legacy[kind])
+    strings = SessionStore._read_lines(legacy["strings"], meta["strings"])
+    records = np.fromfile(legacy["records"], dtype=RECORD_DTYPE)
+    records["extra"] += len(strings)
+    records.tofile(legacy["records"])
+    with open(legacy["strings"], "a") as f:
+        f.write("".join(json.dumps(s) + "\n" for s in state["logger"].table.extras_since(0)))
+    os.remove(legacy["extras"])
+    core["version"] = 1
+    meta["strings"] += meta.pop("extras")
+    del meta["start"]
+    for name in ("portal1", "portal2"):
+        del core["dual_portal"][name]["name"]
+    with open(store.core_path, "wb") as f:
+        pickle.dump(core, f)
+
+    woken = _state()
+    assert SessionStore(str(tmp_path)).restore(woken)
+    assert woken["logger"].records[:] == state["logger"].records[:]
+    assert woken["dual_portal"].portal2.name == "portal2"
+    woken["dual_portal"].portal1.floor_sensor(temp=-196.0)
+    core["version"] = 99
+    with open(store.core_path, "wb") as f:
+        pickle.dump(core, f)
+    try:
+        SessionStore(str(tmp_path)).restore(_state())
+        assert False, "unknown version restored"
+    except ValueError:
+        pass
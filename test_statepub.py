@@ -0,0 +1,76 @@
+"""
+Tests for shared-memory state publication
+"""
+
+import os
+import subprocess
+import sys
+from multiprocessing import shared_memory
+
+from dualportal import DualPortal
+from hardware import TemperatureSensor, ContactSensor, TeslaBattery, FailsafeBlock
+from statepub import StatePublisher, StateReader, snapshot_dict
+
+def _hardware():
+    return {"temp_sensor_1": TemperatureSensor("Portal1_Temp", -196.0),
+            "temp_sensor_2": TemperatureSensor("Portal2_Temp", -150.0),
+            "contact_sensor_1": ContactSensor("Portal1_Contact", True),
+            "contact_sensor_2": ContactSensor("Portal2_Contact", False),
+            "battery": TeslaBattery(), "failsafe": FailsafeBlock()}
+
+def test_reader_sees_consistent_published_state():
+    """Readers map the block zero-copy, get consistent snapshots and never unlink it"""
+    hardware = _hardware()
+    publisher = StatePublisher(f"sg_test_{os.getpid()}")
+    try:
+        reader = StateReader(publisher.name)
+        assert reader.read()[1] == 0 and not reader.state["initialized"]
+        dp = DualPortal(detune=0.2)
+        dp.initialize_run()
+        dp.portal1.update_energy(dt=2.0)
+        seq = publisher.publish(dp, hardware, revision=7)
+        snapshot, read_seq = reader.read()
+        assert read_seq == seq == 2 and reader.state["portals"]["energy"][0] == 27000.0
+        state = snapshot_dict(snapshot)
+        assert state["revision"] == 7 and state["run_id"] == dp.run_id and state["detune"] == 0.2
+        assert state["sensor_temp"] == [-196.0, -150.0] and state["sensor_contact"] == [True, False]
+        assert reader.wait(seq, timeout=0.01) is None
+        code = (f"from statepub import StateReader; r = StateReader({publisher.name!r}); "
+                "print(int(r.read()[0]['revision'])); r.close()")
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        assert out.stdout.strip() == "7" and not out.stderr
+        assert StateReader(publisher.name).seq == 2           # Still attached after the reader exited
+        reader.close()
+    finally:
+        publisher.close()
+
+def test_publisher_takes_over_only_blocks_of_exited_owners():
+    """A live owner's block is refused, an exited owner's is reused, a foreign block is left alone"""
+    name = f"sg_owner_{os.getpid()}"
+    first = StatePublisher(name)
+    try:
+        try:
+            StatePublisher(name)
+            assert False, "took over a live publisher's block"
+        except FileExistsError as e:
+            assert str(os.getpid()) in str(e)
+        assert first.publish(None, _hardware()) == 2
+        exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                                capture_output=True, text=True)
+        first._header["owner_pid"] = int(exited.stdout)       # As if its server had crashed
+        first.close(unlink=False)
+        second = StatePublisher(name)
+        assert second.seq == 0 and int(second._header["owner_pid"]) == os.getpid()
+        second.close()
+    finally:
+        first.close()
+    foreign = shared_memory.SharedMemory(name=name, create=True, size=128)
+    try:
+        StatePublisher(name)
+        assert False, "overwrote a block it did not write"
+    except FileExistsError:
+        pass
+    finally:
+        foreign.close()
+        foreign.unlink()
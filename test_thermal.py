@@ -0,0 +1,40 @@
+"""
+Tests for the LN2 floor slab thermal model
+"""
+
+import time
+from thermal import FloorSlab
+from hardware import TemperatureSensor
+from portal import Portal
+
+def test_idle_slab_stays_below_threshold():
+    """An unloaded slab held by the LN2 bath never crosses the safety threshold"""
+    slab = FloorSlab(nx=50, ny=50)
+    sensor = TemperatureSensor("LN2Floor")
+    slab.attach_sensor(sensor, 1.0, 1.0)
+    slab.step(300.0)
+    assert sensor.read() < -195.8
+    assert slab.predict_crossing(3600.0) is None
+
+def test_payload_heat_trips_floor_sensor():
+    """Payload heat load is predicted to cross the threshold and trips Portal.floor_sensor"""
+    slab = FloorSlab(nx=50, ny=50)
+    sensor = TemperatureSensor("LN2Floor")
+    slab.attach_sensor(sensor, 1.0, 1.0)
+    slab.apply_payload()
+    crossing = slab.predict_crossing(3600.0)
+    assert crossing is not None
+    assert slab.time == 0.0
+    slab.step(crossing + slab.stable_dt())
+    portal = Portal()
+    slab.feed(portal)
+    assert not portal.safety_status
+    assert sensor.status == "OK"  # Still cryogenic, only above the LN2 threshold
+
+def test_full_grid_faster_than_real_time():
+    """One simulated hour on a 200x200 grid completes far faster than real time"""
+    slab = FloorSlab()
+    slab.apply_payload()
+    start = time.perf_counter()
+    slab.step(3600.0)
+    assert time.perf_counter() - start < 36.0
@@ -0,0 +1,189 @@
+"""
+Version 2.2 — LN2 Floor Thermal Model Module
+Dual Portal Stargate Simulation System
+
+Defines the FloorSlab class, a 2-D finite-difference heat-transfer model of a portal's
+floor slab. The slab is cooled from below by the LN2 bath, warmed from above by site
+ambient air (EnvironmentMonitor) and by the payload heat load on its footprint. The
+grid is advanced with a vectorized explicit NumPy stencil; attached temperature sensors
+sample the grid and feed Portal.floor_sensor, and forward prediction reports when a
+sensor will cross the LN2 safety threshold ahead of a run.
+"""
+
+import numpy as np
+from config import SimulationConfig
+
+LN2_BATH_TEMP = -196.0        # °C, sub-cooled LN2 bath under the slab
+SLAB_SIZE = 2.0               # m, square slab edge length
+SLAB_THICKNESS = 0.05         # m
+SLAB_CONDUCTIVITY = 16.0      # W/(m·K), stainless steel
+SLAB_DENSITY = 8000.0         # kg/m³
+SLAB_HEAT_CAPACITY = 500.0    # J/(kg·K)
+LN2_FILM_COEFF = 300.0        # W/(m²·K), underside coolant film coefficient
+AMBIENT_FILM_COEFF = 10.0     # W/(m²·K), top-surface natural convection
+BODY_HEAT_LOAD = 100.0        # W, default heat released by a human payload
+
+class FloorSlab:
+    """
+    Finite-difference thermal model of one portal floor slab on an ny x nx grid.
+    Edges are insulated; cooling and ambient exchange act through the slab faces.
+    """
+    def __init__(self, nx=200, ny=200, size=SLAB_SIZE, thickness=SLAB_THICKNESS,
+                 conductivity=SLAB_CONDUCTIVITY, density=SLAB_DENSITY,
+                 heat_capacity=SLAB_HEAT_CAPACITY, coolant_temp=LN2_BATH_TEMP,
+                 coolant_coeff=LN2_FILM_COEFF, ambient_coeff=AMBIENT_FILM_COEFF,
+                 ambient_temp=-196.0, initial_temp=None):
+        self.nx = nx
+        self.ny = ny
+        self.dx = size / nx                     # Grid spacing (m)
+        self.thickness = thickness
+        self.diffusivity = conductivity / (density * heat_capacity)   # m²/s
+        self.areal_heat_capacity = density * heat_capacity * thickness  # J/(m²·K)
+        self.coolant_temp = coolant_temp
+        self.coolant_coeff = coolant_coeff
+        self.ambient_coeff = ambient_coeff
+        self.ambient_temp = ambient_temp
+        initial = coolant_temp if initial_temp is None else initial_temp
+        self.temp = np.full((ny, nx), float(initial))   # Cell temperatures (°C)
+        self.heat_load = np.zeros((ny, nx))              # Applied heat flux (W/m²)
+        self.time = 0.0                                  # Simulated seconds
+        self.sensors = []                                # (sensor, iy, ix)
+
+    def set_ambient(self, env):
+        """
+        Takes the site ambient temperature from an EnvironmentMonitor reading.
+        """
+        self.ambient_temp = env.read_all()["temp"]
+
+    def apply_payload(self, power=BODY_HEAT_LOAD, center=None, radius=0.18):
+        """
+        Spreads a payload heat load (W) uniformly over a circular footprint (m).
+        Footprint defaults to the slab centre.
+        """
+        cx, cy = center if center is not None else (self.nx * self.dx / 2, self.ny * self.dx / 2)
+        x = (np.arange(self.nx) + 0.5) * self.dx
+        y = (np.arange(self.ny) + 0.5) * self.dx
+        mask = (x[None, :] - cx) ** 2 + (y[:, None] - cy) ** 2 <= radius ** 2
+        cells = np.count_nonzero(mask)
+        if cells:
+            self.heat_load[mask] += power / (cells * self.dx ** 2)
+
+    def clear_payload(self):
+        """
+        Removes all applied heat loads.
+        """
+        self.heat_load.fill(0.0)
+
+    def stable_dt(self):
+        """
+        Largest explicit time step (s) satisfying the diffusion and face-exchange limits.
+        """
+        rate = (4.0 * self.diffusivity / self.dx ** 2
+                + (self.coolant_coeff + self.ambient_coeff) / self.areal_heat_capacity)
+        return 0.95 / rate
+
+    def _advance(self, temp, seconds):
+        """
+        Advances a temperature field in place by `seconds` using sub-stepped FTCS updates.
+        """
+        if seconds <= 0:
+            return temp
+        steps = int(np.ceil(seconds / self.stable_dt()))
+        h = seconds / steps
+        k_diff = self.diffusivity * h / self.dx ** 2
+        k_face = h / self.areal_heat_capacity
+        source = self.heat_load * k_face
+        padded = np.empty((self.ny + 2, self.nx + 2))
+        for _ in range(steps):
+            padded[1:-1, 1:-1] = temp
+            padded[0, 1:-1] = temp[0]               # Insulated (zero-flux) edges
+            padded[-1, 1:-1] = temp[-1]
+            padded[1:-1, 0] = temp[:, 0]
+            padded[1:-1, -1] = temp[:, -1]
+            lap = (padded[:-2, 1:-1] + padded[2:, 1:-1]
+                   + padded[1:-1, :-2] + padded[1:-1, 2:] - 4.0 * temp)
+            temp += (k_diff * lap + source
+                     - k_face * self.coolant_coeff * (temp - self.coolant_temp)
+                     - k_face * self.ambient_coeff * (temp - self.ambient_temp))
+        return temp
+
+    def step(self, seconds=1.0):
+        """
+        Advances the slab by `seconds` of simulated time and refreshes attached sensors.
+        """
+        self._advance(self.temp, seconds)
+        self.time += seconds
+        return self.sample()
+
+    def attach_sensor(self, sensor, x, y):
+        """
+        Attaches a TemperatureSensor at slab position (x, y) in metres.
+        """
+        ix = min(self.nx - 1, max(0, int(x / self.dx)))
+        iy = min(self.ny - 1, max(0, int(y / self.dx)))
+        self.sensors.append((sensor, iy, ix))
+        sensor.update(float(self.temp[iy, ix]))
+
+    def sample(self):
+        """
+        Updates every attached sensor from the grid and returns their readings.
+        """
+        readings = []
+        for sensor, iy, ix in self.sensors:
+            value = float(self.temp[iy, ix])
+            sensor.update(value)
+            readings.append(value)
+        return readings
+
+    def feed(self, portal, contact=None):
+        """
+        Pushes the warmest attached sensor reading into Portal.floor_sensor.
+        """
+        readings = self.sample()
+        temp = max(readings) if readings else float(self.temp.max())
+        portal.floor_sensor(temp=temp, contact=contact)
+        return temp
+
+    def predict_crossing(self, horizon, interval=None, threshold=None):
+        """
+        Simulates ahead on a copy of the grid and returns the simulated seconds until an
+        attached sensor (or any cell, if none are attached) exceeds `threshold`,
+        or None if no crossing occurs within `horizon` seconds.
+        """
+        interval = interval or self.stable_dt()
+        threshold = SimulationConfig["floor_temp_threshold"] if threshold is None else threshold
+        temp = self.temp.copy()
+        rows = np.array([s[1] for s in self.sensors], dtype=int)
+        cols = np.array([s[2] for s in self.sensors], dtype=int)
+        elapsed = 0.0
+        while elapsed < horizon:
+            h = min(interval, horizon - elapsed)
+            self._advance(temp, h)
+            elapsed += h
+            hottest = temp[rows, cols].max() if self.sensors else temp.max()
+            if hottest > threshold:
+                return elapsed
+        return None
+
+if __name__ == "__main__":
+    import time
+    from hardware import TemperatureSensor, EnvironmentMonitor
+    from portal import Portal
+
+    slab = FloorSlab()
+    slab.set_ambient(EnvironmentMonitor())
+    sensor = TemperatureSensor("LN2Floor", -196.0)
+    slab.attach_sensor(sensor, 1.0, 1.0)
+    print("Idle slab crossing within 1 h:", slab.predict_crossing(3600.0))
+    slab.apply_payload()
+    print("Loaded slab crossing in:", slab.predict_crossing(3600.0), "s")
+
+    start = time.perf_counter()
+    slab.step(600.0)
+    wall = time.perf_counter() - start
+    print(f"Simulated 600 s on {slab.ny}x{slab.nx} grid in {wall:.3f} s ({600.0 / wall:.0f}x real time)")
+    print("Sensor reading:", sensor.read())
+
+    portal = Portal()
+    slab.feed(portal)
+    print("Portal safety:", portal.safety_status, "stability:", portal.stability)